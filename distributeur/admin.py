@@ -6,5 +6,14 @@ admin.site.register(Category)
 admin.site.register(Supplier)
 admin.site.register(ProductFormat)
 admin.site.register(Product)
+admin.site.register(ProductStock)
 admin.site.register(Order)
 admin.site.register(OrderItem)
+admin.site.register(CatalogVersion)
+admin.site.register(StockMovement)
+admin.site.register(StockSnapshot)
+admin.site.register(StockReservation)
+admin.site.register(LowStockEvent)
+admin.site.register(Job)
+admin.site.register(DailySales)
+admin.site.register(ChangeLog)
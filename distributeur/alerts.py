@@ -0,0 +1,44 @@
+# alerts.py
+from django.db.models import BooleanField, Case, Value, When
+
+from .models import LowStockEvent
+
+
+def low_stock_case(flags):
+    """
+    Expression CASE donnant le nouvel indicateur ``low_stock`` de chaque
+    produit, à combiner avec l'UPDATE qui modifie son stock
+
+    Args:
+        flags (dict): {product_id: bool}
+    """
+    return Case(
+        *[When(pk=pk, then=Value(flag)) for pk, flag in flags.items()],
+        output_field=BooleanField(),
+    )
+
+
+def record_crossings(changes):
+    """
+    Journalise les franchissements du seuil ``min_stock`` en une seule insertion
+
+    Args:
+        changes: Itérable de ``(product_id, était_bas, est_bas, stock, min_stock)`` ;
+            seules les lignes dont l'indicateur change produisent un événement
+
+    Returns:
+        list: Les ``LowStockEvent`` créés
+    """
+    events = [
+        LowStockEvent(
+            product_id=pk,
+            direction=LowStockEvent.BELOW if now_low else LowStockEvent.RECOVERED,
+            stock=stock,
+            min_stock=min_stock,
+        )
+        for pk, was_low, now_low, stock, min_stock in changes
+        if was_low != now_low
+    ]
+    if events:
+        LowStockEvent.objects.bulk_create(events)
+    return events
@@ -0,0 +1,229 @@
+# analytics.py
+import operator
+from datetime import timedelta
+from functools import reduce
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import DailySales, OrderItem
+
+CANCELLED = 'cancelled'
+ROLLUP_BATCH_SIZE = 300
+REBUILD_BATCH_SIZE = 1000
+DEFAULT_RANGE_DAYS = 30
+
+# Regroupements du endpoint : nom -> expression (None : colonne de même nom)
+GROUPINGS = {
+    'day': None,
+    'week': TruncWeek('day'),
+    'month': TruncMonth('day'),
+    'product': None,
+    'product_format': None,
+    'supplier': F('product__supplier'),
+    'category': F('product__category'),
+}
+FILTERS = {
+    'product': 'product_id',
+    'product_format': 'product_format_id',
+    'supplier': 'product__supplier_id',
+    'category': 'product__category_id',
+}
+
+
+def sales_day(moment):
+    """Jour de vente d'une commande, dans le fuseau courant (comme ``TruncDate``)"""
+    return timezone.localdate(moment)
+
+
+def _increment(field, batch, position, output_field):
+    return F(field) + Case(
+        *[
+            When(day=day, product_id=product_id, product_format_id=format_id, then=Value(values[position]))
+            for (day, product_id, format_id), values in batch
+        ],
+        default=Value(0),
+        output_field=output_field,
+    )
+
+
+def record(lines, sign=1):
+    """
+    Ajoute (ou retire, ``sign=-1``) des lignes de commande aux ventes journalières
+
+    Les clés absentes sont créées à zéro par un INSERT ignorant les conflits,
+    puis les compteurs sont incrémentés par un UPDATE (CASE) : deux requêtes
+    par lot, sûres face aux commandes concurrentes.
+
+    Args:
+        lines: Itérable de ``(jour, product_id, product_format_id, quantité, prix unitaire)``
+        sign (int): 1 à la création d'une commande, -1 à son annulation
+    """
+    totals = {}
+    for day, product_id, format_id, quantity, unit_price in lines:
+        key = (day, product_id, format_id)
+        count, units, revenue = totals.get(key, (0, 0, 0))
+        totals[key] = (count + sign, units + sign * quantity, revenue + sign * quantity * unit_price)
+
+    items = list(totals.items())
+    for start in range(0, len(items), ROLLUP_BATCH_SIZE):
+        batch = items[start:start + ROLLUP_BATCH_SIZE]
+        DailySales.objects.bulk_create(
+            [
+                DailySales(day=day, product_id=product_id, product_format_id=format_id)
+                for (day, product_id, format_id), _ in batch
+            ],
+            ignore_conflicts=True,
+        )
+        DailySales.objects.filter(reduce(operator.or_, (
+            Q(day=day, product_id=product_id, product_format_id=format_id)
+            for (day, product_id, format_id), _ in batch
+        ))).update(
+            lines=_increment('lines', batch, 0, IntegerField()),
+            units=_increment('units', batch, 1, IntegerField()),
+            revenue=_increment('revenue', batch, 2, DailySales._meta.get_field('revenue')),
+        )
+    return len(totals)
+
+
+def record_orders(order_ids, sign=1):
+    """
+    Reporte (ou retire) toutes les lignes de commandes existantes
+
+    Pour les changements de statut en masse : une lecture des articles, puis
+    ``record``.
+    """
+    items = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values_list('order__created_at', 'product_id', 'product_format_id', 'quantity', 'unit_price')
+    )
+    lines = [
+        (sales_day(created_at), product_id, format_id, quantity, unit_price)
+        for created_at, product_id, format_id, quantity, unit_price in items
+    ]
+    return record(lines, sign=sign)
+
+
+def retract_orders(order_ids):
+    """Retire des ventes journalières des commandes qui viennent d'être annulées"""
+    return record_orders(order_ids, sign=-1)
+
+
+@transaction.atomic
+def rebuild(since=None, until=None, batch_size=REBUILD_BATCH_SIZE):
+    """
+    Recalcule les ventes journalières depuis les articles de commande
+
+    Les jours de la période sont effacés puis réinsérés depuis une
+    agrégation GROUP BY (jour, produit, format), par lots de ``bulk_create``.
+    Les commandes annulées sont exclues.
+
+    Args:
+        since (date): Premier jour recalculé (inclus), tous si None
+        until (date): Dernier jour recalculé (inclus), tous si None
+
+    Returns:
+        dict: Lignes supprimées et insérées
+    """
+    rollups = DailySales.objects.all()
+    items = (
+        OrderItem.objects.exclude(order__status=CANCELLED)
+        .annotate(sales_day=TruncDate('order__created_at'))
+    )
+    if since is not None:
+        rollups = rollups.filter(day__gte=since)
+        items = items.filter(sales_day__gte=since)
+    if until is not None:
+        rollups = rollups.filter(day__lte=until)
+        items = items.filter(sales_day__lte=until)
+
+    deleted, _ = rollups.delete()
+    rows = (
+        items.values('sales_day', 'product_id', 'product_format_id')
+        .annotate(
+            line_count=Count('id'),
+            unit_count=Sum('quantity'),
+            amount=Sum(F('quantity') * F('unit_price'), output_field=DecimalField()),
+        )
+        .order_by()
+    )
+    created = 0
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(DailySales(
+            day=row['sales_day'],
+            product_id=row['product_id'],
+            product_format_id=row['product_format_id'],
+            lines=row['line_count'],
+            units=row['unit_count'],
+            revenue=row['amount'],
+        ))
+        if len(batch) >= batch_size:
+            DailySales.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        DailySales.objects.bulk_create(batch)
+        created += len(batch)
+    return {'deleted': deleted, 'created': created}
+
+
+def _parse_day(value, name):
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f"'{name}' doit être une date AAAA-MM-JJ")
+    return day
+
+
+def sales(since=None, until=None, group_by='day', **filters):
+    """
+    Ventes agrégées sur une période, lues dans ``DailySales``
+
+    Args:
+        since (str): Premier jour (inclus), 30 jours avant ``until`` par défaut
+        until (str): Dernier jour (inclus), aujourd'hui par défaut
+        group_by (str): Regroupements séparés par des virgules, parmi ``GROUPINGS``
+        **filters: Identifiants ``product``, ``product_format``, ``supplier``, ``category``
+
+    Returns:
+        tuple: (période, regroupements, lignes groupées, totaux de la période)
+
+    Raises:
+        ValueError: Si un paramètre est invalide
+    """
+    until = _parse_day(until, 'until') if until else timezone.localdate()
+    since = _parse_day(since, 'since') if since else until - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    if since > until:
+        raise ValueError("'since' doit précéder 'until'")
+
+    groups = [name.strip() for name in (group_by or '').split(',') if name.strip()]
+    unknown = [name for name in groups if name not in GROUPINGS]
+    if not groups or unknown or len(set(groups)) != len(groups):
+        raise ValueError(f"'group_by' accepte : {', '.join(GROUPINGS)}")
+
+    rollups = DailySales.objects.filter(day__gte=since, day__lte=until)
+    for name, value in filters.items():
+        if value in (None, ''):
+            continue
+        try:
+            rollups = rollups.filter(**{FILTERS[name]: int(value)})
+        except (KeyError, ValueError):
+            raise ValueError(f"'{name}' doit être un identifiant entier")
+
+    measures = {
+        'total_lines': Sum('lines'),
+        'total_units': Sum('units'),
+        'total_revenue': Sum('revenue'),
+    }
+    plain = [name for name in groups if GROUPINGS[name] is None]
+    computed = {name: GROUPINGS[name] for name in groups if GROUPINGS[name] is not None}
+    rows = (
+        rollups.values(*plain, **computed)
+        .annotate(**measures)
+        .order_by(*groups)
+    )
+    totals = rollups.aggregate(**measures)
+    return (since, until), groups, rows, totals
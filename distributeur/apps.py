@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class DistributeurConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'distributeur'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import perf, signals, tasks  # noqa: F401
+        connection_created.connect(perf.install, dispatch_uid='distributeur_perf')
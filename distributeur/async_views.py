@@ -0,0 +1,272 @@
+# async_views.py
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .cache import add_validators, catalog_cache, catalog_etag, catalog_versions
+from .fieldsets import FIELDS_PARAM, Fieldset, FlatRows, parse_paths
+from .models import Category, Order, OrderItem, Product, Supplier
+from .pagination import max_page_size
+from .routers import read_replica
+from .serializers import CategorySerializer, OrderSerializer, ProductSerializer, SupplierSerializer
+from .sync import ORDER_ITEM_COLUMNS
+from .views import CategoryViewSet, ProductViewSet, SupplierViewSet
+
+AFTER_PARAM = 'after'
+PAGE_SIZE_PARAM = 'page_size'
+# Ressource : (modèle, sérialiseur dont les colonnes sont émises, filtres exacts acceptés)
+CATALOG = {
+    'products': (Product, ProductSerializer, ProductViewSet.filterset_fields),
+    'categories': (Category, CategorySerializer, CategoryViewSet.filterset_fields),
+    'suppliers': (Supplier, SupplierSerializer, SupplierViewSet.filterset_fields),
+}
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _json(data, status=200):
+    # Encodeur de DRF : dates et décimaux rendus comme par les viewsets
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def _error(message, status):
+    return _json({'error': message}, status=status)
+
+
+def _page_params(request):
+    """
+    Returns:
+        tuple: (identifiant de la dernière ligne lue ou None, taille de page)
+
+    Raises:
+        BadRequest: Paramètre non entier ou hors bornes
+    """
+    try:
+        after = request.GET.get(AFTER_PARAM)
+        after = int(after) if after not in (None, '') else None
+        size = int(request.GET.get(PAGE_SIZE_PARAM) or api_settings.PAGE_SIZE)
+    except ValueError:
+        raise BadRequest(f"'{AFTER_PARAM}' et '{PAGE_SIZE_PARAM}' doivent être des entiers")
+    if size < 1 or (after is not None and after < 0):
+        raise BadRequest(f"'{AFTER_PARAM}' et '{PAGE_SIZE_PARAM}' doivent être positifs")
+    return after, min(size, max_page_size())
+
+
+def _next_url(request, last_id):
+    params = request.GET.copy()
+    params[AFTER_PARAM] = last_id
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+
+
+async def _page(request, flat, rows, after_filter):
+    """
+    Une page de lignes par clé (``?after=<id>``), lue avec ``aiterator``
+
+    Une ligne de plus que la page est lue pour savoir s'il en reste ;
+    ``after_filter`` est une coroutine donnant la condition qui suit ``after``.
+
+    Returns:
+        tuple: (``{'next', 'results'}``, lignes lues, colonnes du tri incluses)
+    """
+    after, size = _page_params(request)
+    if after is not None:
+        rows = rows.filter(await after_filter(after))
+    page = [row async for row in rows[:size + 1].aiterator()]
+    more = len(page) > size
+    page = page[:size]
+    data = {
+        'next': _next_url(request, page[-1]['id']) if more else None,
+        'results': await flat.arender(page),
+    }
+    return data, page
+
+
+async def _catalog_data(request, resource, pk):
+    model, serializer_class, filters = CATALOG[resource]
+    flat = FlatRows(serializer_class(), Fieldset(parse_paths(request.GET.get(FIELDS_PARAM))), model, request)
+    if pk is not None:
+        try:
+            row = await flat.values(model.objects.all()).aget(pk=pk)
+        except model.DoesNotExist:
+            return None
+        return (await flat.arender([row]))[0]
+
+    queryset = model.objects.order_by('id')
+    try:
+        queryset = queryset.filter(**{name: request.GET[name] for name in filters if name in request.GET})
+    except (ValueError, ValidationError):
+        raise BadRequest('Filtre invalide')
+    data, _ = await _page(request, flat, flat.values(queryset, ['id']), _after_id)
+    return data
+
+
+async def _after_id(after):
+    return Q(id__gt=after)
+
+
+def _cache_lookup(resource, url, pk):
+    key = catalog_cache.make_key(resource, url, pk)
+    return key, catalog_cache.get(key)
+
+
+async def _catalog_response(request, resource, pk=None):
+    """
+    Liste ou détail d'une ressource du catalogue, au format ``?flat=1`` des
+    viewsets, avec les mêmes validateurs (``ETag``, ``Last-Modified``) et le
+    même cache
+
+    Le tampon de version et le cache, synchrones, passent par ``sync_to_async`` ;
+    les lignes sont lues par l'ORM asynchrone.
+    """
+    version, updated_at = await sync_to_async(catalog_versions.current)(resource)
+    etag = catalog_etag(resource, request, version)
+    last_modified = int(updated_at.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return add_validators(response, etag, last_modified)
+
+    key, data = await sync_to_async(_cache_lookup)(resource, request.build_absolute_uri(), pk)
+    if data is None:
+        try:
+            data = await _catalog_data(request, resource, pk)
+        except BadRequest as e:
+            return _error(str(e), 400)
+        if data is None:
+            return _error('Objet introuvable', 404)
+        await sync_to_async(catalog_cache.set)(key, data)
+    return add_validators(_json(data), etag, last_modified)
+
+
+@read_replica
+@require_safe
+async def product_list(request):
+    """Produits par identifiant croissant ; ``?after=``, ``?page_size=``, ``?fields=`` et filtres du viewset"""
+    return await _catalog_response(request, 'products')
+
+
+@read_replica
+@require_safe
+async def product_detail(request, pk):
+    return await _catalog_response(request, 'products', pk)
+
+
+@read_replica
+@require_safe
+async def category_list(request):
+    return await _catalog_response(request, 'categories')
+
+
+@read_replica
+@require_safe
+async def category_detail(request, pk):
+    return await _catalog_response(request, 'categories', pk)
+
+
+@read_replica
+@require_safe
+async def supplier_list(request):
+    return await _catalog_response(request, 'suppliers')
+
+
+@read_replica
+@require_safe
+async def supplier_detail(request, pk):
+    return await _catalog_response(request, 'suppliers', pk)
+
+
+async def _order_items(order_ids):
+    items = {pk: [] for pk in order_ids}
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .order_by('id')
+        .values(*ORDER_ITEM_COLUMNS)
+    )
+    async for row in rows.aiterator():
+        row['unit_price'] = str(row['unit_price'])
+        items[row['order']].append(row)
+    return items
+
+
+def _orders_after(user):
+    """
+    Condition de page des commandes de ``user``, plus récentes d'abord, sur
+    l'index (user, created_at, id) : la date de la dernière commande lue est
+    relue parmi les siennes
+
+    Raises:
+        BadRequest: Commande ``after`` inconnue ou d'un autre utilisateur
+    """
+    async def after_filter(after):
+        anchor = await Order.objects.filter(user=user, pk=after).values_list('created_at', flat=True).afirst()
+        if anchor is None:
+            raise BadRequest(f"'{AFTER_PARAM}' : commande introuvable")
+        return Q(created_at__lt=anchor) | Q(created_at=anchor, id__lt=after)
+    return after_filter
+
+
+def _authenticate(request):
+    """
+    Utilisateur identifié par les authentifications des viewsets
+    (``DEFAULT_AUTHENTICATION_CLASSES`` : jeton, session)
+
+    Raises:
+        AuthenticationFailed: Identifiants fournis mais refusés
+    """
+    authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    return Request(request, authenticators=authenticators).user
+
+
+async def _orders(request, pk):
+    try:
+        user = await sync_to_async(_authenticate)(request)
+    except APIException as e:
+        return _error(str(e.detail), e.status_code)
+    if not user.is_authenticated:
+        return _error('Authentification requise', 403)
+
+    fieldset = Fieldset(parse_paths(request.GET.get(FIELDS_PARAM)))
+    flat = FlatRows(OrderSerializer(), fieldset, Order, request)
+    queryset = Order.objects.filter(user=user)
+    if pk is not None:
+        try:
+            page = [await flat.values(queryset, ['id']).aget(pk=pk)]
+        except Order.DoesNotExist:
+            return _error('Objet introuvable', 404)
+        results = await flat.arender(page)
+        data = results[0]
+    else:
+        rows = flat.values(queryset.order_by('-created_at', '-id'), ['id', 'created_at'])
+        try:
+            data, page = await _page(request, flat, rows, _orders_after(user))
+        except BadRequest as e:
+            return _error(str(e), 400)
+        results = data['results']
+
+    if fieldset.includes('items'):
+        items = await _order_items([row['id'] for row in page])
+        for row, result in zip(page, results):
+            result['items'] = items[row['id']]
+    return _json(data)
+
+
+@require_safe
+async def order_list(request):
+    """
+    Commandes de l'utilisateur authentifié (jeton ou session), articles inclus, au
+    format de ``/api/sync/`` ; ``?after=``, ``?page_size=`` et ``?fields=``
+    """
+    return await _orders(request, None)
+
+
+@require_safe
+async def order_detail(request, pk):
+    return await _orders(request, pk)
@@ -0,0 +1,257 @@
+# cache.py
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .models import CatalogVersion
+
+
+class CatalogCache:
+    """
+    Cache de lecture des réponses du catalogue (listes et détails)
+
+    Chaque clé embarque des numéros de génération : une époque commune à
+    toute la ressource, plus un numéro pour les listes ou pour chaque objet.
+    Invalider revient à incrémenter ces numéros ; les entrées périmées ne
+    sont plus jamais lues et expirent d'elles-mêmes. L'époque sert aux
+    écritures en masse, qui invalident toute la ressource d'un coup.
+
+    Les compteurs ``hits``, ``misses`` et ``invalidations`` (numéros de
+    génération incrémentés) sont tenus par processus.
+    """
+    prefix = 'catalog'
+
+    def __init__(self):
+        self._stats = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def alias(self):
+        return getattr(settings, 'DISTRIBUTEUR_CATALOG_CACHE_ALIAS', 'default')
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'DISTRIBUTEUR_CATALOG_CACHE_TIMEOUT', 300)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _epoch_key(self, resource):
+        return f'{self.prefix}:{resource}:epoch'
+
+    def _generation_key(self, resource, pk=None):
+        if pk is None:
+            return f'{self.prefix}:{resource}:gen'
+        return f'{self.prefix}:{resource}:{pk}:gen'
+
+    def _generations(self, keys):
+        generations = self.cache.get_many(keys)
+        for key in keys:
+            if generations.get(key) is None:
+                # Valeur initiale horodatée : si la génération a été évincée, on ne
+                # retombe pas sur des entrées écrites sous un ancien numéro
+                self.cache.add(key, time.time_ns(), None)
+                generations[key] = self.cache.get(key)
+        return [generations[key] for key in keys]
+
+    def make_key(self, resource, url, pk=None):
+        """
+        Construit la clé d'une réponse
+
+        Args:
+            resource (str): Nom de la ressource (``products``, ``categories``...)
+            url (str): URL absolue de la requête, paramètres inclus
+            pk: Identifiant de l'objet pour un détail, None pour une liste
+        """
+        epoch, generation = self._generations([
+            self._epoch_key(resource), self._generation_key(resource, pk)
+        ])
+        digest = hashlib.md5(url.encode()).hexdigest()
+        scope = 'list' if pk is None else pk
+        return f'{self.prefix}:{resource}:{scope}:{epoch}.{generation}:{digest}'
+
+    def get(self, key):
+        data = self.cache.get(key)
+        self._count('hits' if data is not None else 'misses')
+        return data
+
+    def set(self, key, data):
+        self.cache.set(key, data, self.timeout)
+
+    def invalidate(self, resource, pks=()):
+        """
+        Invalide les listes d'une ressource et le détail des objets donnés
+
+        Args:
+            pks: Identifiants modifiés, ou None pour invalider toute la ressource
+        """
+        if pks is None:
+            keys = [self._epoch_key(resource)]
+        else:
+            keys = [self._generation_key(resource)]
+            keys.extend(self._generation_key(resource, pk) for pk in pks)
+        for key in keys:
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                # Génération absente : aucune entrée n'a été écrite sous cette clé
+                pass
+        self._count('invalidations', len(keys))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats.get('hits', 0) + stats.get('misses', 0)
+        return {
+            'backend': self.alias,
+            'hits': stats.get('hits', 0),
+            'misses': stats.get('misses', 0),
+            'invalidations': stats.get('invalidations', 0),
+            'hit_ratio': round(stats.get('hits', 0) / lookups, 4) if lookups else None,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+
+
+catalog_cache = CatalogCache()
+
+
+class CatalogVersions:
+    """
+    Tampons de version par ressource du catalogue
+
+    La table ``CatalogVersion`` fait foi ; le tampon courant est recopié dans
+    le cache du catalogue pour qu'une requête conditionnelle ne touche pas
+    la base.
+    """
+
+    def _key(self, resource):
+        return f'{catalog_cache.prefix}:{resource}:version'
+
+    def current(self, resource):
+        """
+        Returns:
+            tuple: (version, date de dernière modification)
+        """
+        key = self._key(resource)
+        stamp = catalog_cache.cache.get(key)
+        if stamp is None:
+            row = CatalogVersion.objects.filter(resource=resource).values_list(
+                'version', 'updated_at'
+            ).first()
+            if row is None:
+                version = CatalogVersion.objects.get_or_create(resource=resource)[0]
+                row = (version.version, version.updated_at)
+            stamp = tuple(row)
+            catalog_cache.cache.set(key, stamp, catalog_cache.timeout)
+        return stamp
+
+    def bump(self, resource):
+        now = timezone.now()
+        updated = CatalogVersion.objects.filter(resource=resource).update(
+            version=F('version') + 1, updated_at=now
+        )
+        if not updated:
+            CatalogVersion.objects.get_or_create(resource=resource, defaults={'updated_at': now})
+        # Relu depuis la base à la prochaine requête
+        catalog_cache.cache.delete(self._key(resource))
+
+
+catalog_versions = CatalogVersions()
+
+
+class CachedCatalogMixin:
+    """
+    Sert ``list`` et ``retrieve`` depuis le cache du catalogue
+
+    Les données sérialisées sont mises en cache, pas la réponse rendue :
+    la négociation de contenu reste faite à chaque requête.
+    """
+    cache_resource = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, None, super().list, args, kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        return self.cached_response(request, pk, super().retrieve, args, kwargs)
+
+    def cached_response(self, request, object_pk, view, args, kwargs):
+        use_offset = getattr(self.paginator, 'use_offset', None)
+        if use_offset is not None and use_offset(request):
+            # Mode offset réservé au personnel : la réponse dépend de l'utilisateur
+            return view(request, *args, **kwargs)
+
+        key = catalog_cache.make_key(
+            self.cache_resource, request.build_absolute_uri(), object_pk
+        )
+        data = catalog_cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200:
+            catalog_cache.set(key, response.data)
+        return response
+
+
+class ConditionalCatalogMixin:
+    """
+    Ajoute ``ETag`` et ``Last-Modified`` à ``list`` et ``retrieve``
+
+    ``If-None-Match`` et ``If-Modified-Since`` sont évalués à partir du seul
+    tampon de version de la ressource : un 304 est renvoyé sans exécuter
+    le queryset ni le sérialiseur.
+    """
+    cache_resource = None
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, args, kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, args, kwargs)
+
+    def get_etag(self, request, version):
+        return catalog_etag(self.cache_resource, request, version)
+
+    def conditional_response(self, request, view, args, kwargs):
+        version, updated_at = catalog_versions.current(self.cache_resource)
+        etag = self.get_etag(request, version)
+        last_modified = int(updated_at.timestamp())
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = view(request, *args, **kwargs)
+        return add_validators(response, etag, last_modified)
+
+
+def catalog_etag(resource, request, version):
+    # La représentation dépend aussi de l'URL (filtres, page) et du format demandé
+    variant = f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+    digest = hashlib.md5(variant.encode()).hexdigest()[:12]
+    return f'W/"{resource}-{version}-{digest}"'
+
+
+def add_validators(response, etag, last_modified):
+    """``ETag`` et ``Last-Modified`` sur une réponse 200 ou 304, à revalider à chaque usage"""
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, no_cache=True)
+    return response
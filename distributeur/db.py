@@ -0,0 +1,126 @@
+# db.py
+import functools
+import logging
+import random
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import OperationalError, connection, connections
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+# Messages de SQLite quand le verrou d'écriture n'a pas pu être obtenu
+LOCK_MESSAGES = ('database is locked', 'database table is locked', 'database is busy')
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+class DatabaseBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Base de données occupée, réessayez dans un instant."
+    default_code = 'database_busy'
+
+
+def is_lock_error(error):
+    return isinstance(error, OperationalError) and any(
+        message in str(error) for message in LOCK_MESSAGES
+    )
+
+
+def _count(name):
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def stats():
+    """Essais rejoués et abandonnés depuis le démarrage du processus"""
+    with _stats_lock:
+        return {'retries': _stats['retries'], 'exhausted': _stats['exhausted']}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+def backoff(attempt, base_delay, max_delay):
+    """Attente avant l'essai ``attempt`` (1, 2...) : exponentielle, tirée au hasard sous le plafond"""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+
+def retry_on_lock(func=None, *, attempts=None, base_delay=None, max_delay=None):
+    """
+    Rejoue une écriture refusée par le verrou de SQLite
+
+    L'attente entre deux essais est aléatoire (jitter) pour que les
+    écrivains refusés ensemble ne reviennent pas ensemble. Le rejeu n'a lieu
+    qu'hors de toute transaction : à l'intérieur d'un bloc atomic, l'erreur
+    remonte au bloc englobant, seul à pouvoir recommencer. Une fois les
+    essais épuisés, ``DatabaseBusy`` (503) est levée.
+
+    Utilisable avec ou sans arguments : ``@retry_on_lock`` ou
+    ``@retry_on_lock(attempts=2)``.
+    """
+    if func is None:
+        return functools.partial(
+            retry_on_lock, attempts=attempts, base_delay=base_delay, max_delay=max_delay
+        )
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        total = attempts or getattr(settings, 'DISTRIBUTEUR_LOCK_RETRIES', 4)
+        delay = base_delay or getattr(settings, 'DISTRIBUTEUR_LOCK_RETRY_DELAY', 0.05)
+        ceiling = max_delay or getattr(settings, 'DISTRIBUTEUR_LOCK_RETRY_MAX_DELAY', 1.0)
+        attempt = 1
+        while True:
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if not is_lock_error(e) or connection.in_atomic_block:
+                    raise
+                if attempt >= total:
+                    _count('exhausted')
+                    logger.warning('%s : verrou SQLite non obtenu après %s essais', func.__qualname__, attempt)
+                    raise DatabaseBusy() from e
+            _count('retries')
+            time.sleep(backoff(attempt, delay, ceiling))
+            attempt += 1
+
+    return wrapper
+
+
+def sync_replicas(aliases=None, pages=-1):
+    """
+    Recopie la base principale SQLite dans ses répliques (API de sauvegarde
+    en ligne de SQLite) : les écritures concurrentes restent possibles et
+    les lecteurs de la réplique voient l'ancienne ou la nouvelle copie,
+    jamais un mélange
+
+    Args:
+        aliases: Alias à recopier, ``DISTRIBUTEUR_READ_REPLICAS`` par défaut
+        pages (int): Pages copiées par étape (-1 : tout en une étape)
+
+    Returns:
+        dict: {alias: durée de la copie en secondes}
+    """
+    if aliases is None:
+        aliases = getattr(settings, 'DISTRIBUTEUR_READ_REPLICAS', [])
+    source = connections['default']
+    if source.vendor != 'sqlite':
+        raise ValueError('La copie des répliques ne prend en charge que SQLite')
+    source.ensure_connection()
+    durations = {}
+    for alias in aliases:
+        target = connections[alias]
+        if alias == 'default' or target.vendor != 'sqlite':
+            raise ValueError(f"{alias!r} n'est pas une réplique SQLite")
+        target.ensure_connection()
+        start = time.perf_counter()
+        source.connection.backup(target.connection, pages=pages)
+        durations[alias] = round(time.perf_counter() - start, 3)
+    return durations
@@ -0,0 +1,123 @@
+# exports.py
+import csv
+import json
+from datetime import datetime, time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Order, OrderItem
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+EXPORT_CHUNK_SIZE = 2000
+
+# Colonnes plates : (nom exporté, chemin ORM)
+EXPORT_COLUMNS = [
+    ('order_id', 'order_id'),
+    ('created_at', 'order__created_at'),
+    ('updated_at', 'order__updated_at'),
+    ('status', 'order__status'),
+    ('user_id', 'order__user_id'),
+    ('username', 'order__user__username'),
+    ('total_amount', 'order__total_amount'),
+    ('item_id', 'id'),
+    ('product_id', 'product_id'),
+    ('product_name', 'product__name'),
+    ('product_format_id', 'product_format_id'),
+    ('product_format_name', 'product_format__name'),
+    ('product_format_volume', 'product_format__volume'),
+    ('quantity', 'quantity'),
+    ('unit_price', 'unit_price'),
+]
+
+
+def _parse_bound(value, end=False):
+    """Interprète une borne de date (``AAAA-MM-JJ``) ou de date-heure ISO 8601"""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Date invalide : {value}')
+        parsed = datetime.combine(day, time.max if end else time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def filter_orders(queryset, since=None, until=None, status=None, user=None):
+    """
+    Restreint les commandes à exporter
+
+    Args:
+        since (str): Date de création minimale (incluse)
+        until (str): Date de création maximale (incluse)
+        status (str): Statut de commande
+        user: Identifiant ou nom d'utilisateur
+
+    Raises:
+        ValueError: Si un filtre est invalide
+    """
+    if since:
+        queryset = queryset.filter(created_at__gte=_parse_bound(since))
+    if until:
+        queryset = queryset.filter(created_at__lte=_parse_bound(until, end=True))
+    if status:
+        if status not in dict(Order.STATUS_CHOICES):
+            raise ValueError(f'Statut inconnu : {status}')
+        queryset = queryset.filter(status=status)
+    if user:
+        user = str(user)
+        queryset = queryset.filter(user_id=int(user)) if user.isdigit() else queryset.filter(user__username=user)
+    return queryset
+
+
+def export_rows(orders, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Itère sur les articles des commandes données, une ligne plate par article
+
+    Une seule requête avec jointures, lue par blocs via ``iterator()`` :
+    la mémoire consommée ne dépend pas du volume exporté.
+    """
+    names = [name for name, _ in EXPORT_COLUMNS]
+    rows = (
+        OrderItem.objects
+        .filter(order__in=orders.values('pk'))
+        .order_by('order_id', 'id')
+        .values_list(*[path for _, path in EXPORT_COLUMNS])
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        yield dict(zip(names, row))
+
+
+def render_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    """Tampon minimal : ``csv.writer`` renvoie directement la ligne écrite"""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow([
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in row.values()
+        ])
+
+
+def render(rows, output):
+    """
+    Returns:
+        generator: Morceaux de texte au format demandé (``ndjson`` ou ``csv``)
+    """
+    if output not in EXPORT_FORMATS:
+        raise ValueError(f"Format d'export inconnu : {output}")
+    return render_csv(rows) if output == 'csv' else render_ndjson(rows)
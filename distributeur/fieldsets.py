@@ -0,0 +1,366 @@
+# fieldsets.py
+from functools import partial
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from . import perf
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+FLAT_PARAM = 'flat'
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def parse_paths(value):
+    """
+    Transforme ``id,items.product.name`` en arbre
+    ``{'id': {}, 'items': {'product': {'name': {}}}}``
+
+    Returns:
+        dict: L'arbre des chemins, ou None si le paramètre est absent
+    """
+    if value is None:
+        return None
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in (part.strip() for part in path.split('.')):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+class Fieldset:
+    """
+    Sélection demandée par ``?fields=`` et ``?expand=``, à un niveau d'imbrication
+
+    Sans ``fields``, tous les champs sont émis ; sans ``expand``, les
+    relations gardent leur imbrication habituelle. Dès que ``expand`` est
+    présent, seules les relations citées sont imbriquées, les autres sont
+    rendues par leur identifiant. Un sous-champ demandé (``items.quantity``)
+    vaut imbrication de la relation.
+    """
+
+    def __init__(self, fields=None, expand=None):
+        self.fields = fields
+        self.expand = expand
+
+    @classmethod
+    def from_request(cls, request):
+        # Les écritures valident et renvoient toujours la représentation complète
+        if request is None or request.method not in SAFE_METHODS:
+            return cls()
+        params = request.query_params
+        return cls(parse_paths(params.get(FIELDS_PARAM)), parse_paths(params.get(EXPAND_PARAM)))
+
+    @property
+    def is_default(self):
+        return self.fields is None and self.expand is None
+
+    def includes(self, name):
+        return self.fields is None or name in self.fields
+
+    def expands(self, name):
+        if self.fields is not None and self.fields.get(name):
+            return True
+        return self.expand is None or name in self.expand
+
+    def child(self, name):
+        fields = (self.fields.get(name) or None) if self.fields is not None else None
+        expand = self.expand.get(name, {}) if self.expand is not None else None
+        return Fieldset(fields, expand)
+
+    def at(self, path):
+        fieldset = self
+        for name in path:
+            fieldset = fieldset.child(name)
+        return fieldset
+
+
+def flat_requested(request):
+    return request.query_params.get(FLAT_PARAM, '').lower() in TRUE_VALUES
+
+
+def _nested(field):
+    """Sérialiseur imbriqué porté par un champ (liste ou objet), sinon None"""
+    if isinstance(field, serializers.ListSerializer):
+        return field.child
+    if isinstance(field, serializers.BaseSerializer):
+        return field
+    return None
+
+
+class SparseFieldsMixin:
+    """
+    Restreint les champs d'un sérialiseur selon ``?fields=`` et ``?expand=``
+
+    Le chemin du sérialiseur dans l'arbre imbriqué est retrouvé par ses
+    parents ; les relations non imbriquées deviennent des
+    ``PrimaryKeyRelatedField``. ``column_dependencies`` déclare les colonnes
+    lues par les champs calculés.
+    """
+    column_dependencies = {}
+
+    def get_fieldset(self):
+        path = []
+        node = self
+        while node.parent is not None:
+            if node.field_name:
+                path.insert(0, node.field_name)
+            node = node.parent
+        return Fieldset.from_request(self.context.get('request')).at(path)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.get_fieldset()
+        if fieldset.is_default:
+            return fields
+        for name in list(fields):
+            if not fieldset.includes(name):
+                del fields[name]
+            elif _nested(fields[name]) is not None and not fieldset.expands(name):
+                options = {'read_only': True}
+                if isinstance(fields[name], serializers.ListSerializer):
+                    options['many'] = True
+                if fields[name].source not in (None, name):
+                    options['source'] = fields[name].source
+                fields[name] = serializers.PrimaryKeyRelatedField(**options)
+        return fields
+
+    def to_representation(self, instance):
+        # Durée mesurée au premier niveau seulement (objet ou éléments de la liste)
+        parent = self.parent
+        if parent is not None and not (parent.parent is None and isinstance(parent, serializers.ListSerializer)):
+            return super().to_representation(instance)
+        with perf.span('serialize'):
+            return super().to_representation(instance)
+
+
+def queryset_for(serializer, fieldset, queryset, extra_columns=()):
+    """
+    Adapte un queryset à la représentation demandée : colonnes chargées
+    (``only``), relations jointes et préchargées
+
+    Sans ``?fields=`` toutes les colonnes sont chargées ; sans ``?expand=``
+    les relations imbriquées par défaut sont toutes jointes ou préchargées.
+
+    Args:
+        serializer: Sérialiseur non lié, dont tous les champs sont déclarés
+        extra_columns: Colonnes toujours chargées (tri de la pagination...)
+    """
+    columns, joins, prefetches = _plan(serializer, fieldset, queryset.model)
+    if joins:
+        queryset = queryset.select_related(*joins)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    if fieldset.fields is not None:
+        queryset = queryset.only(*columns, *extra_columns)
+    return queryset
+
+
+def _plan(serializer, fieldset, model):
+    """
+    Colonnes, jointures et préchargements nécessaires à une représentation
+
+    Returns:
+        tuple: (colonnes, chemins ``select_related``, ``Prefetch``)
+    """
+    columns = {model._meta.pk.name}
+    joins = []
+    prefetches = []
+    dependencies = getattr(serializer, 'column_dependencies', {})
+    for name, field in serializer.get_fields().items():
+        if not fieldset.includes(name):
+            continue
+        if name in dependencies:
+            columns.update(dependencies[name])
+            continue
+        source = field.source if field.source not in (None, '*') else name
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            continue
+        nested = _nested(field)
+        expanded = nested is not None and fieldset.expands(name)
+
+        if not model_field.is_relation:
+            columns.add(source)
+        elif model_field.many_to_one or (model_field.one_to_one and model_field.concrete):
+            columns.add(source)
+            if expanded:
+                child_columns, child_joins, child_prefetches = _plan(
+                    nested, fieldset.child(name), model_field.related_model
+                )
+                joins.append(source)
+                joins.extend(f'{source}__{join}' for join in child_joins)
+                columns.update(f'{source}__{column}' for column in child_columns)
+                for prefetch in child_prefetches:
+                    prefetch.add_prefix(source)
+                    prefetches.append(prefetch)
+        else:
+            related = model_field.related_model.objects.all()
+            # Le préchargement d'une relation inverse rattache les lignes par leur clé étrangère
+            back = (model_field.field.name,) if model_field.one_to_many else ()
+            if expanded:
+                related = queryset_for(nested, fieldset.child(name), related, back)
+            else:
+                related = related.only(related.model._meta.pk.name, *back)
+            prefetches.append(Prefetch(source, queryset=related))
+    return columns, joins, prefetches
+
+
+class FlatRows:
+    """
+    Mode ``?flat=1`` des listes : lignes lues par ``values()`` et émises
+    sans passer par les champs DRF
+
+    Seules les colonnes du modèle sont rendues, les clés étrangères par leur
+    identifiant et les relations plusieurs-à-plusieurs par la liste de leurs
+    identifiants (une requête sur la table de liaison par page). Les champs
+    calculés et les relations inverses sont omis.
+    """
+
+    def __init__(self, serializer, fieldset, model, request):
+        self.request = request
+        self.pk = model._meta.pk.name
+        self.columns = []
+        self.many = []
+        self.converters = {}
+        for name, field in serializer.get_fields().items():
+            if not fieldset.includes(name) or field.source not in (None, name):
+                continue
+            try:
+                model_field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if model_field.many_to_many and model_field.concrete:
+                self.many.append(model_field)
+            elif model_field.concrete:
+                self.columns.append(name)
+                if isinstance(field, serializers.DecimalField):
+                    self.converters[name] = self.decimal
+                elif isinstance(field, serializers.FileField):
+                    self.converters[name] = partial(self.file_url, model_field.storage)
+
+    def decimal(self, value):
+        # Même représentation que DecimalField (COERCE_DECIMAL_TO_STRING)
+        return str(value) if value is not None else None
+
+    def file_url(self, storage, name):
+        if not name:
+            return None
+        url = storage.url(name)
+        return self.request.build_absolute_uri(url) if self.request is not None else url
+
+    def values(self, queryset, extra_columns=()):
+        """Queryset de dictionnaires à paginer (colonnes du tri incluses)"""
+        self.extra = [column for column in extra_columns if column not in self.columns]
+        if self.many and self.pk not in self.columns + self.extra:
+            self.extra.append(self.pk)
+        return (
+            queryset.select_related(None).prefetch_related(None)
+            .values(*self.columns, *self.extra)
+        )
+
+    def _links(self, model_field, pks):
+        through = model_field.remote_field.through
+        source, target = model_field.m2m_field_name(), model_field.m2m_reverse_field_name()
+        return (
+            through.objects.filter(**{f'{source}__in': pks})
+            .order_by(target)
+            .values_list(source, target)
+        )
+
+    def related_ids(self, model_field, pks):
+        ids = {pk: [] for pk in pks}
+        for pk, related_pk in self._links(model_field, pks):
+            ids[pk].append(related_pk)
+        return ids
+
+    async def arelated_ids(self, model_field, pks):
+        ids = {pk: [] for pk in pks}
+        async for pk, related_pk in self._links(model_field, pks):
+            ids[pk].append(related_pk)
+        return ids
+
+    def render(self, rows):
+        """
+        Convertit une page de lignes et y ajoute les relations multiples
+
+        Les lignes de la page sont copiées : la pagination par curseur relit
+        ensuite les colonnes du tri.
+        """
+        rows = list(rows)
+        with perf.span('serialize'):
+            return self._render(rows)
+
+    async def arender(self, rows):
+        """``render`` pour les vues asynchrones : les relations multiples sont lues par l'ORM asynchrone"""
+        with perf.span('serialize'):
+            pks = [row[self.pk] for row in rows] if self.many else []
+            related = {
+                model_field.name: await self.arelated_ids(model_field, pks)
+                for model_field in self.many
+            } if pks else {}
+            return self._build(rows, related)
+
+    def _render(self, rows):
+        pks = [row[self.pk] for row in rows] if self.many else []
+        related = {
+            model_field.name: self.related_ids(model_field, pks)
+            for model_field in self.many
+        } if pks else {}
+        return self._build(rows, related)
+
+    def _build(self, rows, related):
+        rendered = []
+        for row in rows:
+            data = {name: row[name] for name in self.columns}
+            for name, convert in self.converters.items():
+                data[name] = convert(data[name])
+            for name, ids in related.items():
+                data[name] = ids[row[self.pk]]
+            rendered.append(data)
+        return rendered
+
+
+class SparseFieldsetMixin:
+    """
+    Ajuste le queryset d'un viewset à ``?fields=``/``?expand=`` et sert le
+    mode ``?flat=1`` des listes
+
+    Les viewsets appellent ``sparse_queryset`` dans ``get_queryset`` ; les
+    colonnes du tri de la pagination sont toujours chargées.
+    """
+
+    def get_fieldset(self):
+        return Fieldset.from_request(self.request)
+
+    def ordering_columns(self):
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        return [column.lstrip('-') for column in ordering]
+
+    def sparse_queryset(self, queryset):
+        return queryset_for(
+            self.get_serializer_class()(),
+            self.get_fieldset(),
+            queryset,
+            self.ordering_columns(),
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not flat_requested(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        flat = FlatRows(self.get_serializer_class()(), self.get_fieldset(), queryset.model, request)
+        rows = flat.values(queryset, self.ordering_columns())
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(flat.render(page))
+        return Response(flat.render(rows))
@@ -0,0 +1,258 @@
+# images.py
+import hashlib
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+VARIANT_ROOT = 'product_images/variants'
+# Nom : (largeur, hauteur, recadrage) ; sans recadrage l'image tient dans le cadre
+VARIANTS = {
+    'thumbnail': (200, 200, True),
+    'card': (600, 600, False),
+    'full': (1600, 1600, False),
+}
+# Format Pillow : (extension, qualité)
+OUTPUT_FORMATS = {
+    'WEBP': ('webp', 80),
+    'JPEG': ('jpg', 85),
+}
+
+BACKFILL_CHUNK_SIZE = 64
+
+_executor = None
+
+
+def image_workers():
+    """Processus de génération ; 0 pour générer dans le processus courant"""
+    return getattr(settings, 'DISTRIBUTEUR_IMAGE_WORKERS', 2)
+
+
+def digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def variant_path(image_digest, variant, extension):
+    """Chemin adressé par contenu : deux images identiques partagent leurs déclinaisons"""
+    return f'{VARIANT_ROOT}/{image_digest[:2]}/{image_digest}/{variant}.{extension}'
+
+
+def variant_paths(image_digest):
+    return {
+        (variant, extension): variant_path(image_digest, variant, extension)
+        for variant in VARIANTS
+        for extension, _ in OUTPUT_FORMATS.values()
+    }
+
+
+def variant_urls(image_digest):
+    """
+    Returns:
+        dict: ``{variant: {extension: url}}``
+    """
+    urls = {}
+    for (variant, extension), path in variant_paths(image_digest).items():
+        urls.setdefault(variant, {})[extension] = default_storage.url(path)
+    return urls
+
+
+def render_variants(data):
+    """
+    Génère toutes les déclinaisons d'une image
+
+    Sans accès à Django ni à la base : exécutée dans les processus du pool.
+
+    Returns:
+        dict: ``{(variant, extension): octets}``
+    """
+    from PIL import Image, ImageOps
+
+    rendered = {}
+    with Image.open(io.BytesIO(data)) as source:
+        source = ImageOps.exif_transpose(source)
+        opaque = source.convert('RGB')
+        for variant, (width, height, crop) in VARIANTS.items():
+            if crop:
+                image = ImageOps.fit(opaque, (width, height), Image.LANCZOS)
+            else:
+                image = opaque.copy()
+                image.thumbnail((width, height), Image.LANCZOS)
+            for image_format, (extension, quality) in OUTPUT_FORMATS.items():
+                output = io.BytesIO()
+                image.save(output, format=image_format, quality=quality, optimize=True)
+                rendered[(variant, extension)] = output.getvalue()
+    return rendered
+
+
+def _missing(image_digest):
+    return {
+        key: path for key, path in variant_paths(image_digest).items()
+        if not default_storage.exists(path)
+    }
+
+
+def _store(image_digest, rendered):
+    for key, path in _missing(image_digest).items():
+        default_storage.save(path, ContentFile(rendered[key]))
+
+
+def _mark_ready(product_id, image_name, image_digest, invalidate=True):
+    """Enregistre l'empreinte si l'image n'a pas été remplacée entre-temps"""
+    from . import sync
+    from .signals import invalidate_catalog
+
+    updated = Product.objects.filter(pk=product_id, image=image_name).update(image_digest=image_digest)
+    if updated:
+        sync.record('products', [product_id])
+    if updated and invalidate:
+        invalidate_catalog('products', [product_id])
+    return bool(updated)
+
+
+def _read(product):
+    with product.image.open('rb') as source:
+        return source.read()
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=image_workers())
+    return _executor
+
+
+def process(product):
+    """
+    Génère (si besoin) les déclinaisons de l'image d'un produit, dans le
+    processus courant
+
+    Returns:
+        str: Empreinte de l'image, ou None si le produit n'a pas d'image
+    """
+    if not product.image:
+        return None
+    data = _read(product)
+    image_digest = digest(data)
+    if _missing(image_digest):
+        _store(image_digest, render_variants(data))
+    _mark_ready(product.pk, product.image.name, image_digest)
+    return image_digest
+
+
+def schedule(product_id):
+    """
+    Lance la génération des déclinaisons sans bloquer la requête
+
+    L'image est lue et hachée ici ; si ses déclinaisons existent déjà
+    (même contenu), seule l'empreinte est enregistrée. Sinon le rendu part
+    dans le pool de processus et le résultat est écrit à sa fin.
+    """
+    product = Product.objects.only('id', 'image').filter(pk=product_id).first()
+    if product is None or not product.image:
+        return
+    if not image_workers():
+        try:
+            process(product)
+        except Exception:
+            logger.exception("Déclinaisons de l'image du produit %s non générées", product.pk)
+        return
+
+    data = _read(product)
+    image_digest = digest(data)
+    if not _missing(image_digest):
+        _mark_ready(product.pk, product.image.name, image_digest)
+        return
+
+    def done(future):
+        try:
+            _store(image_digest, future.result())
+            _mark_ready(product.pk, product.image.name, image_digest)
+        except Exception:
+            logger.exception("Déclinaisons de l'image du produit %s non générées", product.pk)
+        finally:
+            close_old_connections()
+
+    _pool().submit(render_variants, data).add_done_callback(done)
+
+
+def _backfill_chunk(products, executor, report):
+    owners = {}
+    sources = {}
+    for product in products:
+        report['products'] += 1
+        try:
+            data = _read(product)
+        except OSError:
+            report['failed'] += 1
+            continue
+        image_digest = digest(data)
+        owners.setdefault(image_digest, []).append(product)
+        if image_digest not in sources and _missing(image_digest):
+            sources[image_digest] = data
+    report['deduplicated'] += sum(len(owned) for owned in owners.values()) - len(sources)
+
+    futures = {}
+    if executor is not None:
+        futures = {key: executor.submit(render_variants, data) for key, data in sources.items()}
+    for image_digest, data in sources.items():
+        try:
+            rendered = futures[image_digest].result() if futures else render_variants(data)
+            _store(image_digest, rendered)
+        except Exception:
+            logger.exception("Déclinaisons de l'image %s non générées", image_digest)
+            report['failed'] += len(owners.pop(image_digest))
+            continue
+        report['rendered'] += 1
+
+    for image_digest, owned in owners.items():
+        for product in owned:
+            _mark_ready(product.pk, product.image.name, image_digest, invalidate=False)
+
+
+def backfill(products, workers=None, force=False, chunk_size=BACKFILL_CHUNK_SIZE):
+    """
+    Génère en parallèle les déclinaisons d'images existantes
+
+    Les produits sont traités par paquets pour borner la mémoire ; au sein
+    d'un paquet, chaque contenu distinct n'est rendu qu'une fois.
+
+    Args:
+        products: QuerySet des produits à traiter
+        workers (int): Taille du pool (``DISTRIBUTEUR_IMAGE_WORKERS`` par défaut)
+        force (bool): Retraiter aussi les produits ayant déjà une empreinte
+
+    Returns:
+        dict: Produits traités, images rendues, doublons, erreurs
+    """
+    from .signals import invalidate_catalog
+
+    workers = workers if workers is not None else image_workers()
+    report = {'products': 0, 'rendered': 0, 'deduplicated': 0, 'failed': 0}
+    products = products.exclude(image='').exclude(image__isnull=True)
+    if not force:
+        products = products.filter(image_digest='')
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers else None
+    try:
+        chunk = []
+        for product in products.only('id', 'image').iterator():
+            chunk.append(product)
+            if len(chunk) >= chunk_size:
+                _backfill_chunk(chunk, executor, report)
+                chunk = []
+        if chunk:
+            _backfill_chunk(chunk, executor, report)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    if report['products']:
+        invalidate_catalog('products', None)
+    return report
@@ -0,0 +1,298 @@
+# imports.py
+import csv
+import io
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from . import alerts, inventory, search, sync
+from .models import Category, Supplier, ProductFormat, Product
+from .services import adjust_stock, retire_skus
+from .signals import invalidate_catalog
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+IMPORT_BATCH_SIZE = 1000
+PRODUCT_UPDATE_FIELDS = ['name', 'category', 'price', 'min_stock']
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def read_rows(stream, input_format):
+    """
+    Lit un fichier de catalogue ligne à ligne, sans le charger en mémoire
+
+    Args:
+        stream: Flux texte
+        input_format (str): ``csv`` (avec en-tête) ou ``ndjson`` (un objet JSON par ligne)
+
+    Yields:
+        tuple: (numéro de ligne, dict) ; le dict vaut None si la ligne est illisible
+    """
+    if input_format not in IMPORT_FORMATS:
+        raise ValueError(f"Format d'import inconnu : {input_format}")
+    if input_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_no, row if isinstance(row, dict) else None
+
+
+def open_upload(uploaded_file):
+    """Flux texte sur un fichier téléversé (UTF-8, BOM toléré)"""
+    return io.TextIOWrapper(uploaded_file.file, encoding='utf-8-sig', newline='')
+
+
+def _parse_formats(value):
+    """
+    Formats d'une ligne : ``"Canette:33cl;Bouteille:1L"`` en CSV, ou liste de
+    chaînes / d'objets ``{"name", "volume"}`` en NDJSON
+    """
+    if value in (None, ''):
+        return None
+    if isinstance(value, str):
+        value = [part for part in value.split(';') if part.strip()]
+    formats = []
+    for entry in value:
+        if isinstance(entry, dict):
+            name, volume = entry.get('name'), entry.get('volume')
+        else:
+            name, _, volume = str(entry).partition(':')
+        if not name or not volume:
+            raise ImportRowError(f'Format invalide : {entry}')
+        formats.append((name.strip(), volume.strip()))
+    return formats
+
+
+def _text(row, field, required=True):
+    value = row.get(field)
+    value = str(value).strip() if value is not None else ''
+    if required and not value:
+        raise ImportRowError(f"Champ '{field}' requis")
+    return value or None
+
+
+def _number(row, field, cast, default=None):
+    value = row.get(field)
+    if value in (None, ''):
+        if default is None:
+            raise ImportRowError(f"Champ '{field}' requis")
+        return default
+    try:
+        number = cast(str(value).strip())
+    except (ValueError, InvalidOperation):
+        raise ImportRowError(f"Champ '{field}' invalide : {value}")
+    if number < 0:
+        raise ImportRowError(f"Champ '{field}' négatif : {value}")
+    return number
+
+
+class CatalogImporter:
+    """
+    Importe des produits par lots, en upsert sur (fournisseur, référence)
+
+    Fournisseurs, catégories et formats sont résolus par nom via des tables
+    en mémoire chargées une seule fois ; les entrées inconnues sont créées à
+    la volée. Chaque lot coûte un nombre fixe de requêtes : lecture des clés
+    existantes, ``bulk_create(update_conflicts=True)``, relecture des
+    identifiants, puis remplacement des liens de formats.
+
+    Colonnes : reference, name, supplier, price (requis), category, stock,
+    min_stock, formats (optionnels). Le stock est celui du premier format de
+    la ligne, ou du format unique du produit ; il est appliqué par
+    ``services.adjust_stock`` et laissé inchangé si la colonne est vide.
+    """
+
+    def __init__(self, batch_size=IMPORT_BATCH_SIZE, max_errors=1000):
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.suppliers = dict(Supplier.objects.values_list('name', 'id'))
+        self.categories = {}
+        for pk, name in Category.objects.order_by('-id').values_list('id', 'name'):
+            self.categories[name] = pk
+        self.formats = {}
+        for pk, name, volume in ProductFormat.objects.order_by('-id').values_list('id', 'name', 'volume'):
+            self.formats[(name, volume)] = pk
+        self.report = {
+            'rows': 0,
+            'created': 0,
+            'updated': 0,
+            'failed': 0,
+            'errors': [],
+        }
+
+    def _error(self, line_no, message):
+        self.report['failed'] += 1
+        if len(self.report['errors']) < self.max_errors:
+            self.report['errors'].append({'line': line_no, 'error': message})
+
+    def _supplier_id(self, name):
+        if name not in self.suppliers:
+            self.suppliers[name] = Supplier.objects.get_or_create(name=name)[0].pk
+        return self.suppliers[name]
+
+    def _category_id(self, name):
+        if name is None:
+            return None
+        if name not in self.categories:
+            self.categories[name] = Category.objects.create(name=name).pk
+        return self.categories[name]
+
+    def _resolve_formats(self, keys, price):
+        missing = [key for key in dict.fromkeys(keys) if key not in self.formats]
+        if missing:
+            created = ProductFormat.objects.bulk_create(
+                ProductFormat(name=name, volume=volume, price=price)
+                for name, volume in missing
+            )
+            for key, product_format in zip(missing, created):
+                self.formats[key] = product_format.pk
+            sync.record('formats', [product_format.pk for product_format in created])
+        return [self.formats[key] for key in keys]
+
+    def _build(self, row):
+        if row is None:
+            raise ImportRowError('Ligne illisible')
+        price = _number(row, 'price', Decimal)
+        product = Product(
+            reference=_text(row, 'reference'),
+            name=_text(row, 'name'),
+            supplier_id=self._supplier_id(_text(row, 'supplier')),
+            category_id=self._category_id(_text(row, 'category', required=False)),
+            price=price,
+            min_stock=_number(row, 'min_stock', int, default=50),
+            # Indicateur de départ d'un produit créé, recalculé par _flush
+            low_stock=False,
+        )
+        stock = _number(row, 'stock', int) if row.get('stock') not in (None, '') else None
+        formats = _parse_formats(row.get('formats'))
+        if formats is not None:
+            formats = self._resolve_formats(formats, price)
+        return product, formats, stock
+
+    @transaction.atomic
+    def _flush(self, batch):
+        """Écrit un lot de ``(produit, formats, stock, ligne)`` dédoublonné par clé"""
+        keys = {(product.supplier_id, product.reference) for product, *_ in batch}
+        supplier_ids = {supplier_id for supplier_id, _ in keys}
+        references = {reference for _, reference in keys}
+
+        def existing():
+            rows = Product.objects.filter(
+                supplier_id__in=supplier_ids, reference__in=references
+            ).values_list('supplier_id', 'reference', 'id', 'stock', 'min_stock', 'low_stock')
+            return {
+                (supplier_id, reference): (pk, stock, min_stock, low_stock)
+                for supplier_id, reference, pk, stock, min_stock, low_stock in rows
+                if (supplier_id, reference) in keys
+            }
+
+        before = existing()
+        Product.objects.bulk_create(
+            [product for product, *_ in batch],
+            update_conflicts=True,
+            unique_fields=['supplier', 'reference'],
+            update_fields=PRODUCT_UPDATE_FIELDS,
+        )
+        after = existing()
+        ids = {key: pk for key, (pk, *_) in after.items()}
+        self.report['created'] += len(after) - len(before)
+        self.report['updated'] += len(before)
+
+        links = {
+            ids[(product.supplier_id, product.reference)]: formats
+            for product, formats, _, _ in batch
+            if formats is not None
+        }
+        if links:
+            Through = Product.formats.through
+            Through.objects.filter(product_id__in=links.keys()).delete()
+            Through.objects.bulk_create(
+                [
+                    Through(product_id=product_id, productformat_id=format_id)
+                    for product_id, formats in links.items()
+                    for format_id in dict.fromkeys(formats)
+                ],
+                ignore_conflicts=True,
+            )
+            # Déclinaisons des formats retirés : stock sorti des totaux
+            retire_skus(links)
+            inventory.create_skus(
+                (product_id, format_id)
+                for product_id, formats in links.items()
+                for format_id in formats
+            )
+
+        stocked = [
+            (line_no, {
+                'id': ids[(product.supplier_id, product.reference)],
+                'product_format_id': formats[0] if formats else None,
+                'stock': stock,
+            })
+            for product, formats, stock, line_no in batch
+            if stock is not None
+        ]
+        adjusted = set()
+        for (line_no, row), result in zip(stocked, adjust_stock([row for _, row in stocked])):
+            if result['status'] == 'updated':
+                adjusted.add(row['id'])
+            else:
+                self._error(line_no, f"Stock non appliqué : {result.get('error', 'format inconnu')}")
+
+        # Le seuil a pu changer : l'indicateur suit le stock en base. Celui des
+        # produits dont le stock vient d'être appliqué, franchissement compris,
+        # est déjà tenu par adjust_stock ; un produit créé part de False.
+        rows = [row for row in existing().values() if row[0] not in adjusted]
+        flags = {pk: stock < min_stock for pk, stock, min_stock, _ in rows}
+        stale = {pk: flags[pk] for pk, _, _, low_stock in rows if flags[pk] != low_stock}
+        if stale:
+            Product.objects.filter(pk__in=stale.keys()).update(low_stock=alerts.low_stock_case(stale))
+        alerts.record_crossings(
+            (pk, low_stock, flags[pk], stock, min_stock)
+            for pk, stock, min_stock, low_stock in rows
+        )
+        search.reindex(ids.values())
+        sync.record('products', ids.values())
+
+    def run(self, rows):
+        """
+        Args:
+            rows: Itérable de ``(numéro de ligne, dict)`` (voir ``read_rows``)
+
+        Returns:
+            dict: Rapport (lignes, créations, mises à jour, erreurs, débit)
+        """
+        started = time.perf_counter()
+        batch = {}
+        for line_no, row in rows:
+            self.report['rows'] += 1
+            try:
+                product, formats, stock = self._build(row)
+            except ImportRowError as e:
+                self._error(line_no, str(e))
+                continue
+            # Une même clé répétée dans le lot : la dernière ligne l'emporte
+            batch[(product.supplier_id, product.reference)] = (product, formats, stock, line_no)
+            if len(batch) >= self.batch_size:
+                self._flush(list(batch.values()))
+                batch = {}
+        if batch:
+            self._flush(list(batch.values()))
+
+        elapsed = time.perf_counter() - started
+        self.report['seconds'] = round(elapsed, 3)
+        self.report['rows_per_second'] = round(self.report['rows'] / elapsed, 1) if elapsed else None
+        if self.report['created'] or self.report['updated']:
+            invalidate_catalog('products', None)
+        return self.report
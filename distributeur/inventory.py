@@ -0,0 +1,150 @@
+# inventory.py
+import operator
+from functools import reduce
+
+from django.db.models import Case, F, IntegerField, Q, Sum, When
+from django.db.models.functions import Coalesce
+
+from .models import Product, ProductStock
+
+
+def sku_filter(keys):
+    """Filtre sur des déclinaisons ``(product_id, product_format_id)``"""
+    return reduce(operator.or_, (
+        Q(product_id=product_id, product_format_id=format_id)
+        for product_id, format_id in keys
+    ))
+
+
+def sku_case(values, default=None):
+    """
+    Expression CASE donnant une valeur par déclinaison, à combiner avec
+    ``F('stock')`` ou ``F('reserved')`` dans un UPDATE
+
+    Args:
+        values (dict): {(product_id, product_format_id): valeur}
+    """
+    return Case(
+        *[
+            When(product_id=product_id, product_format_id=format_id, then=value)
+            for (product_id, format_id), value in values.items()
+        ],
+        default=default,
+        output_field=IntegerField(),
+    )
+
+
+def product_totals(values):
+    """{(product_id, product_format_id): n} -> {product_id: somme}"""
+    totals = {}
+    for (product_id, _), value in values.items():
+        totals[product_id] = totals.get(product_id, 0) + value
+    return totals
+
+
+def linked_skus(product_ids):
+    """Déclinaisons des produits dont le format leur est encore lié"""
+    return ProductStock.objects.filter(
+        product_id__in=product_ids, product_format__products=F('product_id')
+    )
+
+
+def create_skus(pairs):
+    """
+    Crée les déclinaisons manquantes de couples ``(product_id, product_format_id)``
+
+    Le stock (et les réservations) d'un produit que ses déclinaisons ne
+    portent pas encore, celui d'un produit créé avant ses formats, est
+    attribué à sa première déclinaison créée, dans l'ordre de ``pairs``.
+
+    Returns:
+        list: Les déclinaisons créées
+    """
+    pairs = list(dict.fromkeys(pairs))
+    if not pairs:
+        return []
+    product_ids = {product_id for product_id, _ in pairs}
+    existing = set(
+        ProductStock.objects.filter(product_id__in=product_ids)
+        .values_list('product_id', 'product_format_id')
+    )
+    unallocated = {
+        pk: (stock - sku_stock, reserved - sku_reserved)
+        for pk, stock, sku_stock, reserved, sku_reserved in _with_sku_totals(
+            Product.objects.filter(pk__in=product_ids)
+        ).values_list('pk', 'stock', 'sku_stock', 'reserved', 'sku_reserved')
+    }
+
+    skus = []
+    for product_id, format_id in pairs:
+        if (product_id, format_id) in existing or product_id not in unallocated:
+            continue
+        stock, reserved = unallocated[product_id]
+        skus.append(ProductStock(
+            product_id=product_id,
+            product_format_id=format_id,
+            stock=max(stock, 0),
+            reserved=max(reserved, 0),
+        ))
+        unallocated[product_id] = (0, 0)
+    return ProductStock.objects.bulk_create(skus, ignore_conflicts=True)
+
+
+def availability(product_id, format_id=None):
+    """
+    Stock des déclinaisons d'un produit : une lecture sur l'index unique
+    (produit, format), restreinte au format s'il est donné
+
+    Returns:
+        list: ``{'product_format_id', 'stock', 'reserved', 'available_stock'}``
+    """
+    skus = ProductStock.objects.filter(product_id=product_id)
+    if format_id is not None:
+        skus = skus.filter(product_format_id=format_id)
+    return [
+        {
+            'product_format_id': format_id,
+            'stock': stock,
+            'reserved': reserved,
+            'available_stock': stock - reserved,
+        }
+        for format_id, stock, reserved in (
+            skus.order_by('product_format_id').values_list('product_format_id', 'stock', 'reserved')
+        )
+    ]
+
+
+def _with_sku_totals(products):
+    return products.annotate(
+        sku_stock=Coalesce(Sum('skus__stock'), 0),
+        sku_reserved=Coalesce(Sum('skus__reserved'), 0),
+    )
+
+
+def drift(product_ids=None):
+    """
+    Produits dont ``stock`` ou ``reserved`` diverge de la somme de leurs
+    déclinaisons, en une requête d'agrégat (GROUP BY ... HAVING)
+
+    Returns:
+        list: ``{'product_id', 'stock', 'sku_stock', 'reserved', 'sku_reserved'}``
+    """
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    rows = (
+        _with_sku_totals(products)
+        .exclude(stock=F('sku_stock'), reserved=F('sku_reserved'))
+        .order_by('pk')
+        .values_list('pk', 'stock', 'sku_stock', 'reserved', 'sku_reserved')
+    )
+    return [
+        {
+            'product_id': pk,
+            'stock': stock,
+            'sku_stock': sku_stock,
+            'reserved': reserved,
+            'sku_reserved': sku_reserved,
+        }
+        for pk, stock, sku_stock, reserved, sku_reserved in rows
+    ]
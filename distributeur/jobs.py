@@ -0,0 +1,209 @@
+# jobs.py
+import logging
+import os
+import socket
+import uuid
+from datetime import timedelta
+
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_LEASE = 300
+BACKOFF_BASE = 5
+BACKOFF_MAX = 3600
+
+# Nom de tâche : (fonction, traitement par lot)
+TASKS = {}
+
+
+def task(name, batch=False):
+    """
+    Enregistre une fonction comme tâche exécutable par les workers
+
+    Une tâche ``batch`` reçoit la liste des paramètres de toutes ses tâches
+    réclamées ensemble ; sinon elle est appelée une fois par tâche.
+    """
+    def register(func):
+        TASKS[name] = (func, batch)
+        return func
+    return register
+
+
+def enqueue(name, payload=None, run_at=None, max_attempts=5):
+    """Ajoute une tâche à la file, dans la transaction courante"""
+    return Job.objects.create(
+        task=name,
+        payload=payload or {},
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts,
+    )
+
+
+def default_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def backoff(attempts):
+    """Délai avant la tentative suivante : exponentiel, plafonné"""
+    return timedelta(seconds=min(BACKOFF_MAX, BACKOFF_BASE * 2 ** max(attempts - 1, 0)))
+
+
+def _due(now):
+    # Tâches prêtes, ou réclamées par un worker dont le bail a expiré
+    return Q(status=Job.QUEUED, run_at__lte=now) | Q(status=Job.RUNNING, locked_until__lt=now)
+
+
+def claim(worker_id, batch_size=DEFAULT_BATCH_SIZE, lease=DEFAULT_LEASE):
+    """
+    Réclame jusqu'à ``batch_size`` tâches prêtes pour ce worker
+
+    Avec ``SELECT ... FOR UPDATE SKIP LOCKED`` (PostgreSQL, MySQL 8), les
+    workers concurrents se répartissent les lignes sans s'attendre. Sous
+    SQLite, les candidats sont lus sans verrou puis pris par un UPDATE
+    conditionnel : les écritures y étant sérialisées, une ligne prise par un
+    autre worker ne vérifie plus la condition et n'est pas comptée deux fois.
+
+    Returns:
+        list: Tâches réclamées, marquées ``running`` avec un bail de ``lease`` secondes
+    """
+    now = timezone.now()
+    token = f'{worker_id[:80]}:{uuid.uuid4().hex[:12]}'
+    connection = connections[router.db_for_write(Job)]
+    with transaction.atomic(using=connection.alias):
+        candidates = Job.objects.filter(_due(now)).order_by('run_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            candidates = candidates.select_for_update(skip_locked=True)
+        ids = list(candidates.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return []
+        Job.objects.filter(_due(now), pk__in=ids).update(
+            status=Job.RUNNING,
+            locked_by=token,
+            locked_until=now + timedelta(seconds=lease),
+            attempts=F('attempts') + 1,
+        )
+    return list(Job.objects.filter(pk__in=ids, locked_by=token).order_by('run_at', 'id'))
+
+
+def _complete(jobs):
+    """Marque les tâches terminées, si leur bail n'a pas été repris entre-temps"""
+    for token in {job.locked_by for job in jobs}:
+        Job.objects.filter(
+            pk__in=[job.pk for job in jobs if job.locked_by == token],
+            locked_by=token,
+        ).update(
+            status=Job.DONE,
+            finished_at=timezone.now(),
+            locked_by='',
+            locked_until=None,
+            last_error='',
+        )
+
+
+def _fail(job, error, permanent=False):
+    """Replanifie la tâche avec un délai croissant, ou l'abandonne"""
+    now = timezone.now()
+    changes = {'locked_by': '', 'locked_until': None, 'last_error': error}
+    if permanent or job.attempts >= job.max_attempts:
+        changes.update(status=Job.FAILED, finished_at=now)
+    else:
+        changes.update(status=Job.QUEUED, run_at=now + backoff(job.attempts))
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(**changes)
+    return changes['status']
+
+
+def run(jobs):
+    """
+    Exécute des tâches réclamées, chacune (ou chaque lot) dans sa transaction
+
+    Returns:
+        dict: Nombre de tâches terminées, replanifiées et abandonnées
+    """
+    report = {'done': 0, 'retried': 0, 'failed': 0}
+
+    def failed(job, error, permanent=False):
+        status = _fail(job, error, permanent)
+        report['failed' if status == Job.FAILED else 'retried'] += 1
+
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job.task, []).append(job)
+
+    for name, group in groups.items():
+        if name not in TASKS:
+            for job in group:
+                failed(job, f'Tâche inconnue : {name}', permanent=True)
+            continue
+        func, batch = TASKS[name]
+        units = [group] if batch else [[job] for job in group]
+        for unit in units:
+            try:
+                with transaction.atomic():
+                    if batch:
+                        func([job.payload for job in unit])
+                    else:
+                        func(unit[0].payload)
+            except Exception as e:
+                logger.exception('Échec de la tâche %s', name)
+                for job in unit:
+                    failed(job, f'{type(e).__name__}: {e}')
+                continue
+            _complete(unit)
+            report['done'] += len(unit)
+    return report
+
+
+def work(worker_id=None, batch_size=DEFAULT_BATCH_SIZE, lease=DEFAULT_LEASE):
+    """Réclame puis exécute un lot de tâches"""
+    jobs = claim(worker_id or default_worker_id(), batch_size, lease)
+    return {'claimed': len(jobs), **run(jobs)}
+
+
+def stats(window=60):
+    """
+    Profondeur de la file et débit récent
+
+    Seules les tâches en attente ou en cours sont comptées par tâche ; les
+    tâches terminées ne le sont que sur la fenêtre ``window`` (index
+    ``status, finished_at``).
+    """
+    now = timezone.now()
+    since = now - timedelta(seconds=window)
+    depth = {}
+    active = (
+        Job.objects.filter(status__in=[Job.QUEUED, Job.RUNNING])
+        .values('task', 'status').annotate(count=Count('id'))
+        .values_list('task', 'status', 'count')
+    )
+    for name, status, count in active:
+        depth.setdefault(name, {Job.QUEUED: 0, Job.RUNNING: 0})[status] = count
+
+    oldest = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).aggregate(oldest=Min('run_at'))['oldest']
+    finished = dict(
+        Job.objects.filter(status__in=[Job.DONE, Job.FAILED], finished_at__gte=since)
+        .values('status').annotate(count=Count('id'))
+        .values_list('status', 'count')
+    )
+    done = finished.get(Job.DONE, 0)
+    return {
+        'depth': depth,
+        'queued': sum(counts[Job.QUEUED] for counts in depth.values()),
+        'running': sum(counts[Job.RUNNING] for counts in depth.values()),
+        'oldest_ready_seconds': round((now - oldest).total_seconds(), 3) if oldest else 0,
+        'window_seconds': window,
+        'done': done,
+        'failed': finished.get(Job.FAILED, 0),
+        'throughput_per_second': round(done / window, 3),
+    }
+
+
+def purge(older_than):
+    """Supprime les tâches terminées avant ``older_than`` (les échecs sont conservés)"""
+    deleted, _ = Job.objects.filter(status=Job.DONE, finished_at__lt=older_than).delete()
+    return deleted
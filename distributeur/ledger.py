@@ -0,0 +1,144 @@
+# ledger.py
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Max, Sum, When
+from django.utils import timezone
+
+from .models import Product, StockMovement, StockSnapshot
+
+
+def record(movements):
+    """
+    Ajoute des mouvements au journal en une seule insertion
+
+    Args:
+        movements (list): Instances ``StockMovement`` non enregistrées ;
+            les mouvements de quantité nulle sont ignorés
+    """
+    movements = [movement for movement in movements if movement.quantity]
+    if movements:
+        StockMovement.objects.bulk_create(movements)
+
+
+def watermark():
+    """
+    Identifiant du dernier mouvement consolidé
+
+    Chaque compactage porte au moins un instantané à ce point : le maximum
+    suffit, les produits sans mouvement gardent un identifiant plus ancien.
+    """
+    return StockSnapshot.objects.aggregate(last=Max('last_movement_id'))['last'] or 0
+
+
+def _pending(product_ids, since_id, **filters):
+    movements = StockMovement.objects.filter(id__gt=since_id, **filters)
+    if product_ids is not None:
+        movements = movements.filter(product_id__in=product_ids)
+    return dict(
+        movements.values('product_id')
+        .annotate(total=Sum('quantity'))
+        .values_list('product_id', 'total')
+    )
+
+
+def ledger_stock(product_ids=None):
+    """
+    Stock calculé depuis le journal : instantané + mouvements non consolidés
+
+    Returns:
+        dict: {product_id: stock}
+    """
+    snapshots = StockSnapshot.objects.all()
+    if product_ids is not None:
+        snapshots = snapshots.filter(product_id__in=product_ids)
+    stock = dict(snapshots.values_list('product_id', 'stock'))
+    for product_id, total in _pending(product_ids, watermark()).items():
+        stock[product_id] = stock.get(product_id, 0) + total
+    if product_ids is not None:
+        for product_id in product_ids:
+            stock.setdefault(product_id, 0)
+    return stock
+
+
+def stock_at(product_ids, when):
+    """
+    Stock des produits à une date donnée
+
+    Obtenu en retranchant du stock courant les mouvements postérieurs à
+    ``when`` (index ``product, created_at``).
+    """
+    stock = ledger_stock(product_ids)
+    later = _pending(product_ids, 0, created_at__gt=when)
+    return {product_id: value - later.get(product_id, 0) for product_id, value in stock.items()}
+
+
+@transaction.atomic
+def compact(batch_size=500):
+    """
+    Consolide les mouvements non encore appliqués dans les instantanés
+
+    Une agrégation GROUP BY, puis des UPDATE par lots (CASE) et un
+    ``bulk_create`` pour les produits sans instantané. Le journal lui-même
+    n'est jamais modifié.
+
+    Returns:
+        dict: Mouvements et produits consolidés, nouveau point de consolidation
+    """
+    # Verrouille l'instantané le plus récent : deux compactages ne peuvent pas
+    # se chevaucher, le second relit le point de consolidation après attente
+    StockSnapshot.objects.select_for_update().order_by('-last_movement_id').first()
+    since_id = watermark()
+    last_id = StockMovement.objects.aggregate(last=Max('id'))['last'] or since_id
+    if last_id <= since_id:
+        return {'movements': 0, 'products': 0, 'last_movement_id': since_id}
+
+    movements = StockMovement.objects.filter(id__gt=since_id, id__lte=last_id)
+    deltas = dict(
+        movements.values('product_id')
+        .annotate(total=Sum('quantity'))
+        .values_list('product_id', 'total')
+    )
+    now = timezone.now()
+    existing = set(
+        StockSnapshot.objects.filter(product_id__in=deltas.keys())
+        .values_list('product_id', flat=True)
+    )
+
+    items = [(product_id, total) for product_id, total in deltas.items() if product_id in existing]
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        StockSnapshot.objects.filter(product_id__in=[pk for pk, _ in batch]).update(
+            stock=Case(
+                *[When(product_id=pk, then=F('stock') + total) for pk, total in batch],
+                output_field=IntegerField(),
+            ),
+            last_movement_id=last_id,
+            taken_at=now,
+        )
+    StockSnapshot.objects.bulk_create(
+        StockSnapshot(product_id=product_id, stock=total, last_movement_id=last_id, taken_at=now)
+        for product_id, total in deltas.items()
+        if product_id not in existing
+    )
+    return {
+        'movements': movements.count(),
+        'products': len(deltas),
+        'last_movement_id': last_id,
+    }
+
+
+def drift(product_ids=None):
+    """
+    Produits dont ``Product.stock`` diverge du stock calculé par le journal
+
+    Returns:
+        list: ``{'product_id', 'stock', 'ledger_stock'}``
+    """
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    computed = ledger_stock(product_ids)
+    return [
+        {'product_id': pk, 'stock': stock, 'ledger_stock': computed.get(pk, 0)}
+        for pk, stock in products.values_list('pk', 'stock').iterator()
+        if computed.get(pk, 0) != stock
+    ]
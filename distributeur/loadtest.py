@@ -0,0 +1,346 @@
+# loadtest.py
+import asyncio
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+
+from .models import Category, Order, Product, ProductStock, Supplier
+
+# Parcours disponibles et poids par défaut
+DEFAULT_MIX = {'browse': 60, 'filter': 25, 'checkout': 10, 'cancel': 5}
+# Lectures seules, pour comparer les limites de concurrence
+READ_MIX = {'browse': 70, 'filter': 30}
+INTERFACES = ('wsgi', 'asgi')
+# Lectures du catalogue par les viewsets DRF ou par les vues asynchrones (/api/async/)
+VIEWS = ('sync', 'async')
+# Chemins comparés par ``sweep`` : (interface, vues)
+SWEEP_PATHS = (('wsgi', 'sync'), ('asgi', 'async'))
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def parse_mix(value):
+    """
+    ``browse=60,checkout=10`` -> ``{'browse': 60, 'checkout': 10}``
+
+    Raises:
+        ValueError: Parcours inconnu ou poids invalide
+    """
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Parcours inconnu : {name!r} (parmi {', '.join(DEFAULT_MIX)})")
+        mix[name] = int(weight)
+        if mix[name] < 0:
+            raise ValueError(f'Poids négatif pour {name}')
+    if not any(mix.values()):
+        raise ValueError('Au moins un parcours doit avoir un poids positif')
+    return mix
+
+
+class Catalog:
+    """Identifiants lus une fois au démarrage, pour composer les requêtes"""
+
+    def __init__(self):
+        # Seules les déclinaisons en stock sont commandées
+        skus = ProductStock.objects.filter(stock__gt=0).values_list('product_id', 'product_format_id')
+        self.formats = defaultdict(list)
+        for product_id, format_id in skus:
+            self.formats[product_id].append(format_id)
+        self.products = list(Product.objects.filter(stock__gt=0).values_list('pk', flat=True))
+        self.orderable = [pk for pk in self.products if self.formats[pk]]
+        self.categories = list(Category.objects.values_list('name', flat=True))
+        self.suppliers = list(Supplier.objects.values_list('pk', flat=True))
+        if not self.products:
+            raise ValueError('Catalogue vide : lancez seed_catalog')
+
+
+class Scenario:
+    """
+    Parcours d'un utilisateur : chaque appel à ``step`` renvoie la prochaine
+    requête ``(route, méthode, url, corps)``
+
+    ``route`` regroupe les mesures (gabarit de l'URL, sans identifiant).
+    Avec ``views='async'``, listes, détails et filtres du catalogue passent
+    par les vues asynchrones ; la recherche n'a pas d'équivalent.
+    """
+
+    def __init__(self, catalog, mix, rng, views='sync'):
+        self.catalog = catalog
+        self.names = list(mix)
+        self.weights = list(mix.values())
+        self.rng = rng
+        self.placed = []
+        self.prefix = '/api/async' if views == 'async' else '/api'
+
+    def step(self):
+        name = self.rng.choices(self.names, self.weights)[0]
+        if name == 'cancel' and not self.placed:
+            name = 'checkout'
+        return getattr(self, name)()
+
+    def browse(self):
+        rng = self.rng
+        prefix = self.prefix
+        choice = rng.random()
+        if choice < 0.5:
+            return f'GET {prefix}/products/', 'get', f'{prefix}/products/', None
+        if choice < 0.8:
+            pk = rng.choice(self.catalog.products)
+            return f'GET {prefix}/products/{{id}}/', 'get', f'{prefix}/products/{pk}/', None
+        return f'GET {prefix}/categories/', 'get', f'{prefix}/categories/', None
+
+    def filter(self):
+        rng = self.rng
+        prefix = self.prefix
+        choice = rng.random()
+        if choice < 0.4 and self.catalog.categories:
+            name = rng.choice(self.catalog.categories)
+            return (f'GET {prefix}/products/?category__name=', 'get', f'{prefix}/products/',
+                    {'category__name': name})
+        if choice < 0.7 and self.catalog.suppliers:
+            pk = rng.choice(self.catalog.suppliers)
+            return f'GET {prefix}/products/?supplier=', 'get', f'{prefix}/products/', {'supplier': pk}
+        term = f'produit {rng.randint(1, 99)}'
+        return 'GET /api/products/search/?q=', 'get', '/api/products/search/', {'q': term}
+
+    def checkout(self):
+        rng = self.rng
+        products = rng.sample(self.catalog.orderable, min(3, len(self.catalog.orderable)))
+        items = [
+            {
+                'product_id': pk,
+                'product_format_id': rng.choice(self.catalog.formats[pk]),
+                'quantity': rng.randint(1, 3),
+            }
+            for pk in products
+        ]
+        return 'POST /api/orders/', 'post', '/api/orders/', {'items': items}
+
+    def cancel(self):
+        pk = self.placed.pop(self.rng.randrange(len(self.placed)))
+        return 'POST /api/orders/{id}/cancel/', 'post', f'/api/orders/{pk}/cancel/', None
+
+    def record(self, route, response):
+        if route == 'POST /api/orders/' and response.status_code == 201:
+            self.placed.append(response.json()['id'])
+
+
+class Results:
+    def __init__(self):
+        self.timings = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def add(self, route, elapsed, status_code):
+        with self._lock:
+            self.timings[route].append(elapsed)
+            self.statuses[route][status_code] += 1
+
+    @staticmethod
+    def percentiles(timings):
+        """Percentiles en millisecondes d'une liste triée de durées (secondes)"""
+        return {
+            f'p{int(fraction * 100)}_ms': round(timings[int(fraction * (len(timings) - 1))] * 1000, 2)
+            for fraction in PERCENTILES
+        }
+
+    def report(self, elapsed):
+        routes = {}
+        for route, timings in sorted(self.timings.items()):
+            timings = sorted(timings)
+            statuses = self.statuses[route]
+            errors = sum(count for status_code, count in statuses.items() if status_code >= 400)
+            routes[route] = {
+                'requests': len(timings),
+                'throughput_rps': round(len(timings) / elapsed, 2),
+                'errors': errors,
+                'error_rate': round(errors / len(timings), 4),
+                'statuses': {str(status_code): count for status_code, count in sorted(statuses.items())},
+                'mean_ms': round(sum(timings) / len(timings) * 1000, 2),
+                **self.percentiles(timings),
+            }
+        total = sum(route['requests'] for route in routes.values())
+        errors = sum(route['errors'] for route in routes.values())
+        timings = sorted(elapsed for route in self.timings.values() for elapsed in route)
+        return {
+            'seconds': round(elapsed, 3),
+            'requests': total,
+            'throughput_rps': round(total / elapsed, 2) if elapsed else None,
+            'error_rate': round(errors / total, 4) if total else None,
+            **(self.percentiles(timings) if timings else {}),
+            'routes': routes,
+        }
+
+
+def _users(workers, username):
+    users = list(User.objects.filter(username__startswith=username).order_by('pk')[:workers])
+    if not users:
+        raise ValueError(f"Aucun utilisateur '{username}*' : lancez seed_catalog")
+    return [users[index % len(users)] for index in range(workers)]
+
+
+def _options(method, data):
+    if data is None:
+        return {}
+    return {'data': data, 'content_type': 'application/json'} if method == 'post' else {'data': data}
+
+
+def _wsgi(workers, requests, duration, scenarios, users, results):
+    deadline = time.perf_counter() + duration if duration else None
+
+    def work(index):
+        client = Client(raise_request_exception=False)
+        client.force_login(users[index])
+        scenario = scenarios[index]
+        try:
+            for _ in range(requests):
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+                route, method, url, data = scenario.step()
+                start = time.perf_counter()
+                response = getattr(client, method)(url, **_options(method, data))
+                results.add(route, time.perf_counter() - start, response.status_code)
+                scenario.record(route, response)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=work, args=(index,)) for index in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def _asgi(workers, requests, duration, scenarios, users, results):
+    async def work(index):
+        client = AsyncClient(raise_request_exception=False)
+        await client.aforce_login(users[index])
+        scenario = scenarios[index]
+        for _ in range(requests):
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            route, method, url, data = scenario.step()
+            start = time.perf_counter()
+            response = await getattr(client, method)(url, **_options(method, data))
+            results.add(route, time.perf_counter() - start, response.status_code)
+            scenario.record(route, response)
+
+    async def main():
+        await asyncio.gather(*(work(index) for index in range(workers)))
+
+    deadline = time.perf_counter() + duration if duration else None
+    asyncio.run(main())
+
+
+def run(workers=8, requests=100, duration=None, mix=None, interface='wsgi', views='sync',
+        username='client', seed=42):
+    """
+    Génère du trafic sur l'API depuis des clients en processus (WSGI par
+    threads, ou ASGI par coroutines) et mesure chaque route
+
+    Les commandes sont réellement passées (et annulées) dans la base
+    configurée. Chaque client tire ses parcours avec sa propre graine.
+
+    Args:
+        requests (int): Requêtes par client au plus
+        duration (float): Durée maximale en secondes (None : pas de limite)
+        mix (dict): Poids des parcours, ``DEFAULT_MIX`` par défaut
+        views (str): Vues du catalogue, ``sync`` (viewsets) ou ``async``
+        username (str): Préfixe des utilisateurs de ``seed_catalog``
+
+    Returns:
+        dict: Débit, taux d'erreur et latences p50/p95/p99 par route
+    """
+    if interface not in INTERFACES:
+        raise ValueError(f"Interface inconnue : {interface!r}")
+    if views not in VIEWS:
+        raise ValueError(f"Vues inconnues : {views!r}")
+    mix = mix or DEFAULT_MIX
+    catalog = Catalog()
+    users = _users(workers, username)
+    scenarios = [Scenario(catalog, mix, random.Random(seed + index), views) for index in range(workers)]
+    results = Results()
+    orders_before = Order.objects.count()
+    connection.close()
+
+    # Les clients de test se présentent comme 'testserver'
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        start = time.perf_counter()
+        (_wsgi if interface == 'wsgi' else _asgi)(workers, requests, duration, scenarios, users, results)
+        elapsed = time.perf_counter() - start
+
+    report = results.report(elapsed)
+    return {
+        'interface': interface,
+        'views': views,
+        'workers': workers,
+        'mix': mix,
+        'orders_created': Order.objects.count() - orders_before,
+        **report,
+    }
+
+
+def sweep(levels, requests=50, mix=None, paths=SWEEP_PATHS, max_error_rate=0.01, max_p99_ms=1000,
+          **options):
+    """
+    Rejoue ``run`` à des niveaux de concurrence croissants pour chaque
+    chemin (interface, vues) et en déduit sa limite de concurrence
+
+    La limite est le plus haut niveau, atteint sans interruption depuis le
+    premier, où le taux d'erreur et la latence p99 restent sous leurs
+    seuils. Les clients sont en processus : le coût des connexions réseau
+    lentes n'est pas mesuré, seulement celui du traitement côté serveur.
+
+    Args:
+        levels: Nombres de clients concurrents, par ordre croissant
+        requests (int): Requêtes par client à chaque niveau
+        mix (dict): Poids des parcours, ``READ_MIX`` par défaut
+
+    Returns:
+        dict: Par chemin (``wsgi+sync``...), mesures par niveau et limite
+    """
+    mix = mix or READ_MIX
+    report = {}
+    for interface, views in paths:
+        measures = []
+        limit = None
+        within = True
+        for workers in levels:
+            result = run(workers=workers, requests=requests, mix=mix, interface=interface,
+                         views=views, **options)
+            measure = {
+                'workers': workers,
+                'throughput_rps': result['throughput_rps'],
+                'error_rate': result['error_rate'],
+                'p50_ms': result.get('p50_ms'),
+                'p99_ms': result.get('p99_ms'),
+            }
+            measures.append(measure)
+            within = within and (
+                (measure['error_rate'] or 0) <= max_error_rate
+                and measure['p99_ms'] is not None and measure['p99_ms'] <= max_p99_ms
+            )
+            if within:
+                limit = workers
+        report[f'{interface}+{views}'] = {
+            'interface': interface,
+            'views': views,
+            'limit': limit,
+            'peak_throughput_rps': max((measure['throughput_rps'] or 0) for measure in measures),
+            'levels': measures,
+        }
+    return {
+        'mix': mix,
+        'requests_per_worker': requests,
+        'max_error_rate': max_error_rate,
+        'max_p99_ms': max_p99_ms,
+        'paths': report,
+    }
@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from distributeur import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare les limites de concurrence des lectures du catalogue : viewsets "
+        "derrière WSGI (threads) et vues asynchrones derrière ASGI (coroutines)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--levels', default='8,64,256,1024',
+            help="Nombres de clients concurrents, séparés par des virgules"
+        )
+        parser.add_argument('--requests', type=int, default=50, help="Requêtes par client à chaque niveau")
+        parser.add_argument(
+            '--mix',
+            default=','.join(f'{name}={weight}' for name, weight in loadtest.READ_MIX.items()),
+            help="Poids des parcours, ex. browse=70,filter=30"
+        )
+        parser.add_argument('--max-error-rate', type=float, default=0.01)
+        parser.add_argument('--max-p99-ms', type=float, default=1000)
+        parser.add_argument('--username', default='client', help="Préfixe des utilisateurs de seed_catalog")
+        parser.add_argument('--output', help="Écrit aussi le rapport JSON dans ce fichier")
+
+    def handle(self, *args, **options):
+        try:
+            levels = sorted({int(level) for level in options['levels'].split(',')})
+            if not levels or levels[0] < 1:
+                raise ValueError('Les niveaux doivent être des entiers positifs')
+            report = loadtest.sweep(
+                levels,
+                requests=options['requests'],
+                mix=loadtest.parse_mix(options['mix']),
+                max_error_rate=options['max_error_rate'],
+                max_p99_ms=options['max_p99_ms'],
+                username=options['username'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                stream.write(output + '\n')
+        self.stdout.write(output)
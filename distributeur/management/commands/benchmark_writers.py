@@ -0,0 +1,146 @@
+import json
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from distributeur import db
+from distributeur.models import Product, ProductFormat, ProductStock
+from distributeur.services import OrderPlacementError, place_order
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le débit de commandes (commandes/s) de N écrivains concurrents, "
+        "pour chaque profil SQLite, sur des bases temporaires"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--orders', type=int, default=50, help="Commandes par écrivain")
+        parser.add_argument('--products', type=int, default=100)
+        parser.add_argument(
+            '--profiles',
+            default=','.join(settings.SQLITE_PROFILES),
+            help="Profils de settings.SQLITE_PROFILES, séparés par des virgules"
+        )
+        parser.add_argument(
+            '--retries',
+            type=int,
+            default=None,
+            help="Essais par commande (défaut : DISTRIBUTEUR_LOCK_RETRIES ; 1 : aucun rejeu)"
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Ce banc d'essai ne concerne que SQLite")
+        names = [name.strip() for name in options['profiles'].split(',') if name.strip()]
+        unknown = [name for name in names if name not in settings.SQLITE_PROFILES]
+        if unknown:
+            raise CommandError(f"Profils inconnus : {', '.join(unknown)}")
+
+        report = [self.run_profile(name, options) for name in names]
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+
+    def use_database(self, settings_dict):
+        # La connexion du thread courant garde ses réglages : on la remplace
+        connections.close_all()
+        connections.settings['default'] = settings_dict
+        try:
+            del connections['default']
+        except AttributeError:
+            pass
+
+    def run_profile(self, name, options):
+        original = connections.settings['default']
+        with tempfile.TemporaryDirectory() as directory:
+            profile = settings.SQLITE_PROFILES[name]
+            self.use_database({
+                **original,
+                **profile,
+                'OPTIONS': dict(profile.get('OPTIONS', {})),
+                'NAME': Path(directory) / 'benchmark.sqlite3',
+            })
+            try:
+                call_command('migrate', verbosity=0)
+                carts = self.seed(options['products'])
+                result = self.run_writers(carts, options)
+            finally:
+                self.use_database(original)
+        return {'profile': name, **result}
+
+    def seed(self, products):
+        """Catalogue au stock suffisant pour toutes les commandes ; un panier de 3 lignes par produit"""
+        product_format = ProductFormat.objects.create(name='Format', volume='33cl', price=Decimal('1.00'))
+        catalog = Product.objects.bulk_create(
+            Product(name=f'Produit {i}', price=Decimal('1.00'), stock=10 ** 9)
+            for i in range(products)
+        )
+        Product.formats.through.objects.bulk_create(
+            Product.formats.through(product_id=product.pk, productformat_id=product_format.pk)
+            for product in catalog
+        )
+        ProductStock.objects.bulk_create(
+            ProductStock(product_id=product.pk, product_format_id=product_format.pk, stock=10 ** 9)
+            for product in catalog
+        )
+        return [
+            [
+                {'product_id': catalog[(i + offset) % len(catalog)].pk,
+                 'product_format_id': product_format.pk,
+                 'quantity': 1}
+                for offset in range(3)
+            ]
+            for i in range(len(catalog))
+        ]
+
+    def run_writers(self, carts, options):
+        writers, per_writer = options['writers'], options['orders']
+        users = [User.objects.create_user(f'writer{i}') for i in range(writers)]
+        place = db.retry_on_lock(place_order, attempts=options['retries'])
+        outcomes = []
+        outcomes_lock = threading.Lock()
+        barrier = threading.Barrier(writers)
+
+        def write(index):
+            placed = failed = 0
+            barrier.wait()
+            try:
+                for n in range(per_writer):
+                    try:
+                        place(users[index], carts[(index * per_writer + n) % len(carts)])
+                        placed += 1
+                    except (db.DatabaseBusy, OperationalError, OrderPlacementError):
+                        failed += 1
+            finally:
+                connection.close()
+            with outcomes_lock:
+                outcomes.append((placed, failed))
+
+        connections.close_all()
+        db.reset_stats()
+        threads = [threading.Thread(target=write, args=(i,)) for i in range(writers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        placed = sum(placed for placed, _ in outcomes)
+        return {
+            'writers': writers,
+            'attempted': writers * per_writer,
+            'placed': placed,
+            'failed': sum(failed for _, failed in outcomes),
+            **db.stats(),
+            'seconds': round(elapsed, 3),
+            'orders_per_second': round(placed / elapsed, 1) if elapsed else None,
+        }
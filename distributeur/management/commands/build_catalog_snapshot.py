@@ -0,0 +1,30 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from distributeur import snapshots
+
+
+class Command(BaseCommand):
+    help = "Précalcule le fichier gzip de /api/catalog/snapshot/ pour la version courante du catalogue"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Reconstruit le fichier même s'il existe déjà"
+        )
+
+    def handle(self, *args, **options):
+        version, _ = snapshots.current_stamp()
+        path = snapshots.snapshot_path(version)
+        built = options['force'] or not path.exists()
+        if built:
+            path = snapshots.build(version)
+        report = {
+            'version': version,
+            'path': str(path),
+            'built': built,
+            'bytes': path.stat().st_size,
+        }
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
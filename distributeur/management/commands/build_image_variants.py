@@ -0,0 +1,28 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from distributeur import images
+from distributeur.models import Product
+
+
+class Command(BaseCommand):
+    help = "Génère en parallèle les déclinaisons WebP/JPEG des images produits existantes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help="Taille du pool de processus")
+        parser.add_argument('--chunk-size', type=int, default=images.BACKFILL_CHUNK_SIZE)
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Retraite aussi les produits dont les déclinaisons existent"
+        )
+
+    def handle(self, *args, **options):
+        report = images.backfill(
+            Product.objects.order_by('pk'),
+            workers=options['workers'],
+            force=options['force'],
+            chunk_size=options['chunk_size'],
+        )
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
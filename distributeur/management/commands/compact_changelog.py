@@ -0,0 +1,14 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from distributeur import sync
+from distributeur.models import ChangeLog
+
+
+class Command(BaseCommand):
+    help = "Supprime les entrées du journal de synchronisation remplacées par une entrée plus récente"
+
+    def handle(self, *args, **options):
+        report = {'deleted': sync.compact(), 'remaining': ChangeLog.objects.count()}
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,23 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from distributeur import ledger
+
+
+class Command(BaseCommand):
+    help = "Consolide le journal des mouvements de stock dans les instantanés"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help="Liste les produits dont Product.stock diverge du journal"
+        )
+
+    def handle(self, *args, **options):
+        report = ledger.compact(batch_size=options['batch_size'])
+        if options['verify']:
+            report['drift'] = ledger.drift()
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
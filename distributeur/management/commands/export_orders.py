@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from distributeur import exports
+from distributeur.models import Order
+
+
+class Command(BaseCommand):
+    help = "Exporte les commandes et leurs articles en NDJSON ou CSV, en flux"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', choices=exports.EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--since', help="Date de création minimale (AAAA-MM-JJ ou ISO 8601)")
+        parser.add_argument('--until', help="Date de création maximale (incluse)")
+        parser.add_argument('--status', help="Statut des commandes")
+        parser.add_argument('--user', help="Identifiant ou nom d'utilisateur")
+        parser.add_argument('--file', help="Fichier de destination (sortie standard par défaut)")
+        parser.add_argument('--chunk-size', type=int, default=exports.EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            orders = exports.filter_orders(
+                Order.objects.all(),
+                since=options['since'],
+                until=options['until'],
+                status=options['status'],
+                user=options['user'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        rows = exports.export_rows(orders, chunk_size=options['chunk_size'])
+        chunks = exports.render(rows, options['output'])
+
+        if options['file']:
+            with open(options['file'], 'w', encoding='utf-8', newline='') as stream:
+                stream.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
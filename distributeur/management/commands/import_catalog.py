@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from distributeur import imports
+
+
+class Command(BaseCommand):
+    help = "Importe un catalogue fournisseur (CSV ou NDJSON) en upsert, par lots"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier à importer")
+        parser.add_argument('--input', choices=imports.IMPORT_FORMATS, help="Format (déduit de l'extension par défaut)")
+        parser.add_argument('--batch-size', type=int, default=imports.IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        input_format = options['input'] or options['path'].rsplit('.', 1)[-1].lower()
+        if input_format == 'jsonl':
+            input_format = 'ndjson'
+        if input_format not in imports.IMPORT_FORMATS:
+            raise CommandError("Format inconnu : utilisez --input csv|ndjson")
+
+        try:
+            stream = open(options['path'], encoding='utf-8-sig', newline='')
+        except OSError as e:
+            raise CommandError(str(e))
+
+        with stream:
+            importer = imports.CatalogImporter(batch_size=options['batch_size'])
+            report = importer.run(imports.read_rows(stream, input_format))
+
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from distributeur import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        "Génère du trafic (navigation, filtres, commandes, annulations) depuis des clients "
+        "concurrents en processus et rapporte débit, latences et erreurs par route"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=100, help="Requêtes par client au plus")
+        parser.add_argument('--duration', type=float, default=None, help="Durée maximale (secondes)")
+        parser.add_argument(
+            '--mix',
+            default=','.join(f'{name}={weight}' for name, weight in loadtest.DEFAULT_MIX.items()),
+            help="Poids des parcours, ex. browse=60,filter=25,checkout=10,cancel=5"
+        )
+        parser.add_argument('--interface', choices=loadtest.INTERFACES, default='wsgi')
+        parser.add_argument(
+            '--views', choices=loadtest.VIEWS, default='sync',
+            help="Lectures du catalogue par les viewsets (sync) ou les vues asynchrones (async)"
+        )
+        parser.add_argument('--username', default='client', help="Préfixe des utilisateurs de seed_catalog")
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help="Écrit aussi le rapport JSON dans ce fichier")
+
+    def handle(self, *args, **options):
+        try:
+            report = loadtest.run(
+                workers=options['workers'],
+                requests=options['requests'],
+                duration=options['duration'],
+                mix=loadtest.parse_mix(options['mix']),
+                interface=options['interface'],
+                views=options['views'],
+                username=options['username'],
+                seed=options['seed'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                stream.write(output + '\n')
+        self.stdout.write(output)
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from distributeur.services import expire_reservations
+
+
+class Command(BaseCommand):
+    help = "Expire par lots les réservations de stock échues"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help="Tourne en continu avec cette pause (secondes) entre deux passes"
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            expired = 0
+            while True:
+                count = expire_reservations(batch_size=options['batch_size'])
+                expired += count
+                if count < options['batch_size']:
+                    break
+            self.stdout.write(f"{expired} réservation(s) expirée(s)")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,25 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from distributeur import analytics
+
+
+class Command(BaseCommand):
+    help = "Recalcule les ventes journalières (DailySales) depuis les articles de commande"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Premier jour recalculé (AAAA-MM-JJ)")
+        parser.add_argument('--until', help="Dernier jour recalculé (AAAA-MM-JJ)")
+        parser.add_argument('--batch-size', type=int, default=analytics.REBUILD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        bounds = {}
+        for name in ('since', 'until'):
+            if options[name]:
+                bounds[name] = parse_date(options[name])
+                if bounds[name] is None:
+                    raise CommandError(f'Date invalide : {options[name]}')
+        report = analytics.rebuild(batch_size=options['batch_size'], **bounds)
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,19 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from distributeur import search
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les documents de recherche (et l'index FTS5) de tous les produits"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=search.REINDEX_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        report = {
+            'documents': search.reindex(batch_size=options['batch_size']),
+            'fts5': search.fts_enabled(),
+        }
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,49 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from distributeur import jobs
+
+
+class Command(BaseCommand):
+    help = "Exécute les tâches asynchrones en file (traitement des commandes...)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=jobs.DEFAULT_BATCH_SIZE)
+        parser.add_argument('--lease', type=int, default=jobs.DEFAULT_LEASE, help="Durée du bail (secondes)")
+        parser.add_argument('--worker-id', default=None, help="Identifiant du worker (hôte:pid par défaut)")
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help="Pause (secondes) quand la file est vide"
+        )
+        parser.add_argument('--once', action='store_true', help="Vide la file puis s'arrête")
+        parser.add_argument(
+            '--purge-days',
+            type=int,
+            default=7,
+            help="Supprime au démarrage les tâches terminées depuis plus de N jours (0 : jamais)"
+        )
+
+    def handle(self, *args, **options):
+        worker_id = options['worker_id'] or jobs.default_worker_id()
+        if options['purge_days']:
+            purged = jobs.purge(timezone.now() - timedelta(days=options['purge_days']))
+            self.stdout.write(f"{purged} tâche(s) terminée(s) supprimée(s)")
+
+        while True:
+            close_old_connections()
+            report = jobs.work(worker_id, options['batch_size'], options['lease'])
+            if report['claimed']:
+                self.stdout.write(
+                    f"{report['claimed']} tâche(s) : {report['done']} terminée(s), "
+                    f"{report['retried']} replanifiée(s), {report['failed']} abandonnée(s)"
+                )
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
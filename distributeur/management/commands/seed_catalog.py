@@ -0,0 +1,51 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from distributeur import seeding
+
+
+class Command(BaseCommand):
+    help = "Peuple la base avec un catalogue, des utilisateurs et un historique de commandes (tirage déterministe)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--suppliers', type=int, default=50)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--formats', type=int, default=20)
+        parser.add_argument('--products', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--orders', type=int, default=20000)
+        parser.add_argument('--items-per-order', type=int, default=3)
+        parser.add_argument('--formats-per-product', type=int, default=3)
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=90,
+            help="Commandes réparties sur les N derniers jours (0 : toutes en attente, maintenant)"
+        )
+        parser.add_argument('--username', default='client', help="Préfixe des utilisateurs créés")
+        parser.add_argument('--password', default='client')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=seeding.SEED_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        report = seeding.seed_catalog(
+            suppliers=options['suppliers'],
+            categories=options['categories'],
+            formats=options['formats'],
+            products=options['products'],
+            users=options['users'],
+            orders=options['orders'],
+            items_per_order=options['items_per_order'],
+            formats_per_product=options['formats_per_product'],
+            days=options['days'],
+            username=options['username'],
+            password=options['password'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        report['users'] = len(report['users'])
+        report['seconds'] = round(time.perf_counter() - start, 2)
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,29 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from distributeur import db
+
+
+class Command(BaseCommand):
+    help = (
+        "Recopie la base principale dans les répliques de lecture "
+        "(à lancer périodiquement, par cron par exemple)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'aliases', nargs='*',
+            help="Alias à recopier (défaut : DISTRIBUTEUR_READ_REPLICAS)"
+        )
+        parser.add_argument(
+            '--pages', type=int, default=-1,
+            help="Pages copiées par étape, pour ne pas bloquer longtemps les écrivains (-1 : tout)"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            durations = db.sync_replicas(options['aliases'] or None, pages=options['pages'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(json.dumps({'replicas': durations}, ensure_ascii=False, indent=2))
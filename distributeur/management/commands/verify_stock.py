@@ -0,0 +1,25 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from distributeur import inventory
+from distributeur.services import realign_stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Liste les produits dont le stock total ou réservé diverge de la somme "
+        "de leurs déclinaisons (une requête d'agrégat)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help="Réaligne les totaux des produits sur leurs déclinaisons (écart journalisé)"
+        )
+
+    def handle(self, *args, **options):
+        drift = realign_stock() if options['fix'] else inventory.drift()
+        report = {'drift': drift, 'products': len(drift), 'fixed': options['fix']}
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
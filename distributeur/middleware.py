@@ -0,0 +1,216 @@
+# middleware.py
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.urls import Resolver404, resolve
+from django.utils import timezone
+
+from . import perf, routers
+
+
+class HybridMiddleware:
+    """
+    Base des intergiciels utilisables en WSGI comme en ASGI : sous ASGI,
+    un intergiciel seulement synchrone ferait repasser toute la chaîne, et
+    donc les vues asynchrones, par un thread
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+
+class PerformanceMiddleware(HybridMiddleware):
+    """
+    Mesure chaque requête : nombre et durée des requêtes SQL, durée de
+    sérialisation, durée totale et taille de la réponse
+
+    Les mesures sont renvoyées dans l'en-tête ``Server-Timing``, cumulées
+    par route (``/api/metrics/``) et, au-delà de
+    ``DISTRIBUTEUR_SLOW_REQUEST_MS``, écrites dans le journal des requêtes
+    lentes avec les requêtes SQL répétées les plus fréquentes. Les requêtes
+    SQL sont comptées par ``perf.install``, sur toutes les connexions.
+
+    Une réponse en flux (export, instantané) est mesurée jusqu'à la fin de
+    sa lecture : ses requêtes et sa taille sont cumulées et journalisées à
+    la fermeture du flux, l'en-tête ``Server-Timing``, déjà envoyé, ne
+    couvrant que la construction de la réponse. Un fichier servi tel quel
+    (``FileResponse``) n'exécute pas de requête et n'est pas enveloppé.
+    """
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = perf.RequestMetrics()
+        with perf.collecting(metrics):
+            response = self.get_response(request)
+        self.server_timing(response, metrics)
+        if self.streamed(response):
+            content = response.streaming_content
+            response.streaming_content = self.measure(request, response, metrics, content)
+        else:
+            self.report(request, response, metrics)
+        return response
+
+    async def __acall__(self, request):
+        metrics = perf.RequestMetrics()
+        with perf.collecting(metrics):
+            response = await self.get_response(request)
+        self.server_timing(response, metrics)
+        if self.streamed(response):
+            measure = self.ameasure if response.is_async else self.measure
+            content = response.streaming_content
+            response.streaming_content = measure(request, response, metrics, content)
+        else:
+            # Journal écrit dans un thread, hors de la boucle d'événements
+            await sync_to_async(self.report)(request, response, metrics)
+        return response
+
+    def server_timing(self, response, metrics):
+        size = self.response_size(response)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+            f'serialize;dur={metrics.spans["serialize"] * 1000:.1f}',
+            f'total;dur={metrics.elapsed * 1000:.1f}',
+            *([f'size;desc="{size} B"'] if size is not None else []),
+        ])
+
+    @staticmethod
+    def streamed(response):
+        """Réponse en flux dont la lecture peut encore exécuter des requêtes"""
+        return getattr(response, 'streaming', False) and getattr(response, 'file_to_stream', None) is None
+
+    def measure(self, request, response, metrics, content):
+        """Contenu en flux lu dans la mesure de la requête, rapportée à la fermeture"""
+        metrics.size = 0
+        chunks = iter(content)
+        try:
+            while True:
+                with perf.collecting(metrics):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                metrics.size += len(chunk)
+                yield chunk
+        finally:
+            self.report(request, response, metrics)
+
+    async def ameasure(self, request, response, metrics, content):
+        metrics.size = 0
+        chunks = aiter(content)
+        try:
+            while True:
+                with perf.collecting(metrics):
+                    chunk = await anext(chunks, None)
+                if chunk is None:
+                    break
+                metrics.size += len(chunk)
+                yield chunk
+        finally:
+            await sync_to_async(self.report)(request, response, metrics)
+
+    def report(self, request, response, metrics):
+        """Cumule la mesure par route et journalise la requête si elle est lente"""
+        total_ms = metrics.elapsed * 1000
+        db_ms = metrics.db_time * 1000
+        serialize_ms = metrics.spans['serialize'] * 1000
+        size = metrics.size if metrics.size is not None else self.response_size(response)
+
+        route = self.route(request)
+        perf.route_histograms.observe(
+            route, total_ms, db_ms, metrics.queries, serialize_ms, size, response.status_code
+        )
+        threshold_ms = perf.slow_requests.threshold_ms
+        if threshold_ms is not None and total_ms >= threshold_ms:
+            perf.slow_requests.write({
+                'at': timezone.now().isoformat(),
+                'method': request.method,
+                'path': request.get_full_path(),
+                'route': route,
+                'status': response.status_code,
+                'total_ms': round(total_ms, 2),
+                'db_ms': round(db_ms, 2),
+                'queries': metrics.queries,
+                'serialize_ms': round(serialize_ms, 2),
+                'bytes': size,
+                'duplicates': metrics.duplicates(),
+            })
+
+    @staticmethod
+    def route(request):
+        match = getattr(request, 'resolver_match', None)
+        name = (match.view_name or match.route) if match is not None else 'unmatched'
+        return f'{request.method} {name}'
+
+    @staticmethod
+    def response_size(response):
+        if response.has_header('Content-Length'):
+            return int(response['Content-Length'])
+        if getattr(response, 'streaming', False):
+            return None
+        return len(response.content)
+
+
+class ReadReplicaMiddleware(HybridMiddleware):
+    """
+    Sert les GET et HEAD des vues marquées ``read_replica`` (viewset ou
+    vue asynchrone) depuis une réplique de ``DISTRIBUTEUR_READ_REPLICAS``
+    (``ReadReplicaRouter``)
+
+    Après une écriture réussie, le client est épinglé à la base principale
+    pendant ``DISTRIBUTEUR_REPLICA_PIN_SECONDS`` par un cookie : il relit
+    ce qu'il vient d'écrire même si la réplique n'est pas encore à jour.
+    Les autres clients peuvent lire, le temps de la copie, des données en
+    retard, que le cache du catalogue conserve alors jusqu'à l'invalidation
+    suivante ou l'expiration.
+    """
+    pin_cookie = 'replica_pin'
+    safe_methods = ('GET', 'HEAD')
+
+    @property
+    def pin_seconds(self):
+        return getattr(settings, 'DISTRIBUTEUR_REPLICA_PIN_SECONDS', 5)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with routers.reading(self.read_alias(request)):
+            response = self.get_response(request)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        # Vue résolue ici plutôt que dans process_view : sous ASGI, celui-ci
+        # s'exécute dans un thread et l'alias qu'il poserait serait perdu
+        with routers.reading(self.read_alias(request)):
+            response = await self.get_response(request)
+        return self.pin(request, response)
+
+    def read_alias(self, request):
+        if request.method not in self.safe_methods or not routers.replicas() or self.pinned(request):
+            return None
+        try:
+            view = resolve(request.path_info, getattr(request, 'urlconf', None)).func
+        except Resolver404:
+            return None
+        if getattr(view, 'read_replica', False) or getattr(getattr(view, 'cls', None), 'read_replica', False):
+            return routers.choose()
+        return None
+
+    def pin(self, request, response):
+        if (request.method not in self.safe_methods and request.method != 'OPTIONS'
+                and response.status_code < 400 and routers.replicas()):
+            response.set_cookie(
+                self.pin_cookie, str(time.time() + self.pin_seconds),
+                max_age=self.pin_seconds, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def pinned(self, request):
+        try:
+            return float(request.COOKIES.get(self.pin_cookie, 0)) > time.time()
+        except ValueError:
+            return False
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:45
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+CATALOG_RESOURCES = ('products', 'categories', 'suppliers')
+
+
+def create_versions(apps, schema_editor):
+    CatalogVersion = apps.get_model('distributeur', 'CatalogVersion')
+    for resource in CATALOG_RESOURCES:
+        CatalogVersion.objects.get_or_create(resource=resource)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('distributeur', '0002_order_user_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=50, unique=True, verbose_name='Ressource')),
+                ('version', models.PositiveBigIntegerField(default=1, verbose_name='Version')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Mise à jour le')),
+            ],
+            options={
+                'verbose_name': 'Version du catalogue',
+                'verbose_name_plural': 'Versions du catalogue',
+            },
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
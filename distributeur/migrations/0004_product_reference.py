@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('distributeur', '0003_catalogversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='reference',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name='Référence fournisseur'),
+        ),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('supplier', 'reference'), name='product_supplier_reference_uniq'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def snapshot_existing_stock(apps, schema_editor):
+    """Le stock existant sert de point de départ au journal"""
+    Product = apps.get_model('distributeur', 'Product')
+    StockSnapshot = apps.get_model('distributeur', 'StockSnapshot')
+    StockSnapshot.objects.bulk_create(
+        StockSnapshot(product_id=pk, stock=stock)
+        for pk, stock in Product.objects.values_list('pk', 'stock').iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('distributeur', '0004_product_reference'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.IntegerField(verbose_name='Stock consolidé')),
+                ('last_movement_id', models.PositiveBigIntegerField(default=0, verbose_name='Dernier mouvement consolidé')),
+                ('taken_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Consolidé le')),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshot', to='distributeur.product', verbose_name='Produit')),
+            ],
+            options={
+                'verbose_name': 'Instantané de stock',
+                'verbose_name_plural': 'Instantanés de stock',
+            },
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField(verbose_name='Quantité (signée)')),
+                ('reason', models.CharField(choices=[('order', 'Commande'), ('cancel', 'Annulation'), ('restock', 'Réapprovisionnement'), ('adjustment', 'Ajustement')], max_length=20, verbose_name='Motif')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Créé le')),
+                ('order', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='distributeur.order', verbose_name='Commande')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='distributeur.product', verbose_name='Produit')),
+                ('product_format', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stock_movements', to='distributeur.productformat', verbose_name='Format du produit')),
+            ],
+            options={
+                'verbose_name': 'Mouvement de stock',
+                'verbose_name_plural': 'Mouvements de stock',
+                'indexes': [models.Index(fields=['product', 'created_at'], name='movement_product_created_idx')],
+            },
+        ),
+        migrations.RunPython(snapshot_existing_stock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:55
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def flag_low_stock(apps, schema_editor):
+    """Initialise l'indicateur pour les produits déjà sous leur seuil"""
+    Product = apps.get_model('distributeur', 'Product')
+    Product.objects.filter(stock__lt=F('min_stock')).update(low_stock=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('distributeur', '0006_stock_reservations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LowStockEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('direction', models.CharField(choices=[('below', 'Sous le seuil'), ('recovered', 'Revenu au-dessus du seuil')], max_length=20, verbose_name='Sens')),
+                ('stock', models.PositiveIntegerField(verbose_name='Stock')),
+                ('min_stock', models.PositiveIntegerField(verbose_name='Stock minimum')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Créé le')),
+            ],
+            options={
+                'verbose_name': 'Alerte de stock',
+                'verbose_name_plural': 'Alertes de stock',
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='low_stock',
+            field=models.BooleanField(default=False, help_text='stock < min_stock, tenu à jour à chaque mouvement de stock', verbose_name='Sous le stock minimum'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('low_stock', True)), fields=['supplier', 'id'], name='product_low_stock_idx'),
+        ),
+        migrations.AddField(
+            model_name='lowstockevent',
+            name='product',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='low_stock_events', to='distributeur.product', verbose_name='Produit'),
+        ),
+        migrations.RunPython(flag_low_stock, migrations.RunPython.noop),
+    ]
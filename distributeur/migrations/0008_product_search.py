@@ -0,0 +1,112 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:58
+
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FTS_TABLE = 'distributeur_product_fts'
+CONTENT_TABLE = 'distributeur_productsearchdocument'
+COLUMNS = 'name, supplier, category, formats'
+NEW_VALUES = 'new.name, new.supplier, new.category, new.formats'
+OLD_VALUES = 'old.name, old.supplier, old.category, old.formats'
+
+# Table FTS5 à contenu externe : les triggers la tiennent à jour à partir
+# des documents, l'index de préfixes accélère les recherches « mot* »
+CREATE_FTS = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        {COLUMNS},
+        content='{CONTENT_TABLE}',
+        content_rowid='product_id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {CONTENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {COLUMNS}) VALUES (new.product_id, {NEW_VALUES});
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {CONTENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {COLUMNS}) VALUES ('delete', old.product_id, {OLD_VALUES});
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {CONTENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {COLUMNS}) VALUES ('delete', old.product_id, {OLD_VALUES});
+        INSERT INTO {FTS_TABLE}(rowid, {COLUMNS}) VALUES (new.product_id, {NEW_VALUES});
+    END""",
+]
+DROP_FTS = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def _run(schema_editor, statements):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_fts(apps, schema_editor):
+    """Sous SQLite uniquement ; les autres bases interrogent les documents"""
+    _run(schema_editor, CREATE_FTS)
+
+
+def drop_fts(apps, schema_editor):
+    _run(schema_editor, DROP_FTS)
+
+
+def _normalize(text):
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def index_products(apps, schema_editor):
+    Product = apps.get_model('distributeur', 'Product')
+    ProductSearchDocument = apps.get_model('distributeur', 'ProductSearchDocument')
+    formats = {}
+    links = Product.formats.through.objects.values_list(
+        'product_id', 'productformat__name', 'productformat__volume'
+    )
+    for product_id, name, volume in links.iterator():
+        formats.setdefault(product_id, []).append(f'{name} {volume}')
+    rows = Product.objects.values_list('pk', 'name', 'supplier__name', 'category__name')
+    ProductSearchDocument.objects.bulk_create(
+        (
+            ProductSearchDocument(
+                product_id=pk,
+                name=_normalize(name),
+                supplier=_normalize(supplier),
+                category=_normalize(category),
+                formats=_normalize(' '.join(formats.get(pk, []))),
+            )
+            for pk, name, supplier, category in rows.iterator()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('distributeur', '0007_low_stock_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchDocument',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='distributeur.product', verbose_name='Produit')),
+                ('name', models.TextField(verbose_name='Nom')),
+                ('supplier', models.TextField(blank=True, verbose_name='Fournisseur')),
+                ('category', models.TextField(blank=True, verbose_name='Catégorie')),
+                ('formats', models.TextField(blank=True, verbose_name='Formats')),
+            ],
+            options={
+                'verbose_name': 'Document de recherche',
+                'verbose_name_plural': 'Documents de recherche',
+            },
+        ),
+        migrations.RunPython(create_fts, drop_fts),
+        migrations.RunPython(index_products, migrations.RunPython.noop),
+    ]
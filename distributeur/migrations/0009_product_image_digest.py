@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('distributeur', '0008_product_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_digest',
+            field=models.CharField(blank=True, editable=False, help_text="SHA-256 de l'image, renseigné une fois ses déclinaisons générées", max_length=64, verbose_name="Empreinte de l'image"),
+        ),
+    ]
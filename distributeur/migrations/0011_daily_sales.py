@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('distributeur', '0010_job_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Jour')),
+                ('lines', models.IntegerField(default=0, verbose_name='Lignes de commande')),
+                ('units', models.IntegerField(default=0, verbose_name='Unités')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name="Chiffre d'affaires")),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='distributeur.product', verbose_name='Produit')),
+                ('product_format', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='distributeur.productformat', verbose_name='Format du produit')),
+            ],
+            options={
+                'verbose_name': 'Ventes du jour',
+                'verbose_name_plural': 'Ventes par jour',
+                'constraints': [models.UniqueConstraint(fields=('day', 'product', 'product_format'), name='daily_sales_key_uniq')],
+            },
+        ),
+    ]
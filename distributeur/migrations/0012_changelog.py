@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:31
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('distributeur', '0011_daily_sales'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=50, verbose_name='Ressource')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='Identifiant')),
+                ('action', models.CharField(choices=[('upsert', 'Création ou modification'), ('delete', 'Suppression')], max_length=10, verbose_name='Action')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Créé le')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Propriétaire')),
+            ],
+            options={
+                'verbose_name': 'Modification',
+                'verbose_name_plural': 'Journal des modifications',
+                'indexes': [models.Index(fields=['resource', 'object_id', 'id'], name='changelog_object_idx')],
+            },
+        ),
+    ]
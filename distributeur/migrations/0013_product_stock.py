@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def allocate_existing_stock(apps, schema_editor):
+    """
+    Une déclinaison par lien produit-format : chacune porte ses réservations
+    actives, le reste du stock du produit va à son premier format
+
+    Le stock d'un produit sans format reste non réparti : ``verify_stock``
+    le signale.
+    """
+    Product = apps.get_model('distributeur', 'Product')
+    ProductStock = apps.get_model('distributeur', 'ProductStock')
+    StockReservation = apps.get_model('distributeur', 'StockReservation')
+
+    links = {}
+    for product_id, format_id in (
+        Product.formats.through.objects.order_by('product_id', 'productformat_id')
+        .values_list('product_id', 'productformat_id').iterator()
+    ):
+        links.setdefault(product_id, []).append(format_id)
+    reserved = {}
+    active = (
+        StockReservation.objects.filter(status='active')
+        .values_list('product_id', 'product_format_id', 'quantity')
+    )
+    for product_id, format_id, quantity in active.iterator():
+        key = (product_id, format_id)
+        reserved[key] = reserved.get(key, 0) + quantity
+
+    skus = []
+    for product_id, stock in Product.objects.values_list('pk', 'stock').iterator():
+        format_ids = links.get(product_id, [])
+        held = [reserved.get((product_id, format_id), 0) for format_id in format_ids]
+        remainder = max(stock - sum(held), 0)
+        for index, (format_id, quantity) in enumerate(zip(format_ids, held)):
+            skus.append(ProductStock(
+                product_id=product_id,
+                product_format_id=format_id,
+                stock=quantity + (remainder if index == 0 else 0),
+                reserved=quantity,
+            ))
+    ProductStock.objects.bulk_create(skus, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('distributeur', '0012_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock', models.PositiveIntegerField(default=0, verbose_name='Stock')),
+                ('reserved', models.PositiveIntegerField(default=0, help_text='Somme des réservations actives sur cette déclinaison', verbose_name='Stock réservé')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skus', to='distributeur.product', verbose_name='Produit')),
+                ('product_format', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='skus', to='distributeur.productformat', verbose_name='Format du produit')),
+            ],
+            options={
+                'verbose_name': 'Stock par format',
+                'verbose_name_plural': 'Stocks par format',
+                'constraints': [models.UniqueConstraint(fields=('product', 'product_format'), name='product_stock_sku_uniq')],
+            },
+        ),
+        migrations.RunPython(allocate_existing_stock, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='productformat',
+            name='stock',
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='reserved',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Somme des réservations actives des déclinaisons, modifiée avec elles', verbose_name='Stock réservé'),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='stock',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Somme du stock des déclinaisons (ProductStock), modifiée avec elles', verbose_name='Stock total'),
+        ),
+    ]
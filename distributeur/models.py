@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 
@@ -34,7 +35,6 @@ class ProductFormat(models.Model):
     name = models.CharField(_('Nom du format'), max_length=100)
     volume = models.CharField(_('Volume'), max_length=50)  # ex: '25cl', '50cl', '1L'
     price = models.DecimalField(_('Prix'), max_digits=10, decimal_places=2)
-    stock = models.PositiveIntegerField(_('Stock'))
 
     class Meta:
         verbose_name = _('Format de produit')
@@ -46,6 +46,12 @@ class ProductFormat(models.Model):
 class Product(models.Model):
     """Modèle principal pour les produits"""
     name = models.CharField(_('Nom'), max_length=200)
+    reference = models.CharField(
+        _('Référence fournisseur'),
+        max_length=100,
+        blank=True,
+        null=True
+    )
     supplier = models.ForeignKey(
         Supplier, 
         on_delete=models.SET_NULL, 
@@ -61,8 +67,24 @@ class Product(models.Model):
         null=True
     )
     price = models.DecimalField(_('Prix'), max_digits=10, decimal_places=2)
-    stock = models.PositiveIntegerField(_('Stock total'))
+    stock = models.PositiveIntegerField(
+        _('Stock total'),
+        default=0,
+        editable=False,
+        help_text=_('Somme du stock des déclinaisons (ProductStock), modifiée avec elles')
+    )
+    reserved = models.PositiveIntegerField(
+        _('Stock réservé'),
+        default=0,
+        editable=False,
+        help_text=_('Somme des réservations actives des déclinaisons, modifiée avec elles')
+    )
     min_stock = models.PositiveIntegerField(_('Stock minimum'), default=50)
+    low_stock = models.BooleanField(
+        _('Sous le stock minimum'),
+        default=False,
+        help_text=_('stock < min_stock, tenu à jour à chaque mouvement de stock')
+    )
     
     image = models.ImageField(
         _('Image'), 
@@ -70,6 +92,13 @@ class Product(models.Model):
         blank=True, 
         null=True
     )
+    image_digest = models.CharField(
+        _("Empreinte de l'image"),
+        max_length=64,
+        blank=True,
+        editable=False,
+        help_text=_('SHA-256 de l\'image, renseigné une fois ses déclinaisons générées')
+    )
     
     formats = models.ManyToManyField(
         ProductFormat, 
@@ -86,10 +115,102 @@ class Product(models.Model):
     class Meta:
         verbose_name = _('Produit')
         verbose_name_plural = _('Produits')
+        constraints = [
+            # Clé d'upsert des imports de catalogue
+            models.UniqueConstraint(
+                fields=['supplier', 'reference'],
+                name='product_supplier_reference_uniq'
+            ),
+        ]
+        indexes = [
+            # Index partiel : ne contient que les produits en alerte
+            models.Index(
+                fields=['supplier', 'id'],
+                condition=models.Q(low_stock=True),
+                name='product_low_stock_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
-    
+
+    # Totaux tenus par les déclinaisons, jamais écrits par save() une fois le produit créé
+    STOCK_TOTALS = ('stock', 'reserved', 'low_stock')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'image' in instance.__dict__:
+            instance._recorded_image = str(instance.__dict__['image'] or '')
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or 'image' in fields:
+            self._recorded_image = str(self.__dict__.get('image') or '')
+
+    def save(self, *args, **kwargs):
+        """
+        Surcharge de la méthode save : journalise le stock initial d'un
+        produit créé, et tient à jour l'indicateur ``low_stock``
+
+        Un produit existant est enregistré sans ses totaux (``STOCK_TOTALS``),
+        lus au chargement et peut-être périmés : ils ne varient que par les
+        UPDATE en SQL des déclinaisons. Ils sont relus, verrouillés, après
+        l'enregistrement ; l'indicateur est recalculé avec le ``min_stock``
+        enregistré et son franchissement journalisé.
+        """
+        from . import alerts
+
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        if adding:
+            self.low_stock = self.stock < self.min_stock
+        else:
+            if update_fields is None:
+                deferred = self.get_deferred_fields()
+                update_fields = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.attname not in deferred
+                ]
+            kwargs['update_fields'] = {*update_fields} - set(self.STOCK_TOTALS)
+        threshold_tracked = not adding and 'min_stock' in kwargs['update_fields']
+
+        # Nouvelle image : ses déclinaisons seront régénérées (voir images.py)
+        image_tracked = (
+            (update_fields is None or 'image' in update_fields)
+            and 'image' not in self.get_deferred_fields()
+        )
+        self._image_changed = False
+        if image_tracked and (self.image.name or '') != getattr(self, '_recorded_image', ''):
+            self.image_digest = ''
+            self._image_changed = bool(self.image)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'image_digest'}
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                if self.stock:
+                    StockMovement.objects.create(
+                        product=self,
+                        quantity=self.stock,
+                        reason=StockMovement.ADJUSTMENT
+                    )
+                alerts.record_crossings([(self.pk, False, self.low_stock, self.stock, self.min_stock)])
+            elif threshold_tracked:
+                products = Product.objects.filter(pk=self.pk)
+                self.stock, self.reserved, was_low = (
+                    products.select_for_update().values_list(*self.STOCK_TOTALS).get()
+                )
+                self.low_stock = self.stock < self.min_stock
+                if self.low_stock != was_low:
+                    products.update(low_stock=self.low_stock)
+                    alerts.record_crossings([(self.pk, was_low, self.low_stock, self.stock, self.min_stock)])
+        if image_tracked:
+            # Nom définitif, attribué par le stockage lors de l'enregistrement
+            self._recorded_image = self.image.name or ''
+
     def check_stock_availability(self, quantity):
         """
         Vérifie si la quantité demandée est disponible en stock
@@ -100,39 +221,161 @@ class Product(models.Model):
         Returns:
             bool: True si le stock est suffisant, False sinon
         """
-        return self.stock >= quantity
+        return self.available_stock >= quantity
+
+    @property
+    def available_stock(self):
+        """Stock physique diminué des réservations actives"""
+        return self.stock - self.reserved
 
-    def reduce_stock(self, quantity):
+    def _sku(self, product_format=None):
         """
-        Réduit le stock du produit
-        
+        Déclinaison visée par un mouvement de stock unitaire
+
+        Un format absent est déduit lorsque le produit n'en propose qu'un seul.
+
+        Raises:
+            ValidationError: Format absent et ambigu, ou sans déclinaison
+        """
+        skus = self.skus.all()
+        if product_format is not None:
+            skus = skus.filter(product_format=product_format)
+        skus = list(skus.values_list('pk', 'product_format_id', 'stock', 'reserved')[:2])
+        if len(skus) != 1:
+            raise ValidationError(
+                _('Format requis : le produit %(product)s en propose plusieurs')
+                if skus else _('Aucun stock pour ce format du produit %(product)s'),
+                params={'product': self.name}
+            )
+        return skus[0]
+
+    def _move_total(self, format_id, delta, reason):
+        """
+        Reporte sur le total du produit un mouvement déjà appliqué à une
+        déclinaison, par un UPDATE en SQL, dans la transaction en cours
+
+        L'instance, peut-être périmée, n'est jamais enregistrée telle quelle :
+        elle est relue une fois le total modifié.
+        """
+        from . import alerts, ledger
+        from .signals import stock_changed
+
+        products = Product.objects.filter(pk=self.pk)
+        # Ligne du produit verrouillée jusqu'à la fin de la transaction : deux
+        # mouvements sur des déclinaisons différentes se suivent
+        was_low = products.select_for_update().values_list('low_stock', flat=True).get()
+        products.update(
+            stock=models.F('stock') + delta,
+            low_stock=models.Case(
+                models.When(stock__lt=models.F('min_stock') - delta, then=models.Value(True)),
+                default=models.Value(False),
+            ),
+        )
+        self.refresh_from_db(fields=['stock', 'reserved', 'min_stock', 'low_stock'])
+        ledger.record([
+            StockMovement(product_id=self.pk, product_format_id=format_id, quantity=delta, reason=reason)
+        ])
+        alerts.record_crossings([(self.pk, was_low, self.low_stock, self.stock, self.min_stock)])
+        stock_changed.send(sender=Product, product_ids=[self.pk])
+
+    def reduce_stock(self, quantity, product_format=None):
+        """
+        Réduit le stock d'une déclinaison du produit, et son total
+
         Args:
             quantity (int): Quantité à réduire du stock
-        
+            product_format (ProductFormat): Format visé (déduit s'il est unique)
+
         Raises:
             ValidationError: Si la quantité demandée excède le stock disponible
         """
-        if not self.check_stock_availability(quantity):
-            raise ValidationError(
-                _('Stock insuffisant. Stock disponible : %(stock)d, Quantité demandée : %(quantity)d'),
-                params={
-                    'stock': self.stock,
-                    'quantity': quantity
-                }
-            )
-        
-        self.stock -= quantity
-        self.save()
+        pk, format_id, stock, reserved = self._sku(product_format)
+        with transaction.atomic():
+            updated = ProductStock.objects.filter(
+                pk=pk, stock__gte=models.F('reserved') + quantity
+            ).update(stock=models.F('stock') - quantity)
+            if not updated:
+                raise ValidationError(
+                    _('Stock insuffisant. Stock disponible : %(stock)d, Quantité demandée : %(quantity)d'),
+                    params={
+                        'stock': stock - reserved,
+                        'quantity': quantity
+                    }
+                )
+            self._move_total(format_id, -quantity, StockMovement.ORDER)
 
-    def restore_stock(self, quantity):
+    def restore_stock(self, quantity, product_format=None):
         """
-        Restaure la quantité au stock (utile pour l'annulation de commande)
-        
+        Restaure la quantité au stock d'une déclinaison (utile pour l'annulation de commande)
+
         Args:
             quantity (int): Quantité à ajouter au stock
+            product_format (ProductFormat): Format visé (déduit s'il est unique)
         """
-        self.stock += quantity
-        self.save()
+        pk, format_id, _stock, _reserved = self._sku(product_format)
+        with transaction.atomic():
+            ProductStock.objects.filter(pk=pk).update(stock=models.F('stock') + quantity)
+            self._move_total(format_id, quantity, StockMovement.CANCEL)
+
+
+class ProductStock(models.Model):
+    """
+    Stock d'une déclinaison (produit, format), l'unité réellement vendue
+
+    ``Product.stock`` et ``Product.reserved`` en sont les totaux
+    dénormalisés : chaque mouvement modifie les deux dans la même
+    transaction (voir ``services``). ``manage.py verify_stock`` détecte et
+    corrige les écarts.
+    """
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='skus',
+        verbose_name=_('Produit')
+    )
+    product_format = models.ForeignKey(
+        ProductFormat,
+        on_delete=models.CASCADE,
+        related_name='skus',
+        verbose_name=_('Format du produit')
+    )
+    stock = models.PositiveIntegerField(_('Stock'), default=0)
+    reserved = models.PositiveIntegerField(
+        _('Stock réservé'),
+        default=0,
+        help_text=_('Somme des réservations actives sur cette déclinaison')
+    )
+
+    class Meta:
+        verbose_name = _('Stock par format')
+        verbose_name_plural = _('Stocks par format')
+        constraints = [
+            # Disponibilité d'une déclinaison : une lecture sur cet index
+            models.UniqueConstraint(
+                fields=['product', 'product_format'],
+                name='product_stock_sku_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}/{self.product_format_id}: {self.stock}"
+
+    @property
+    def available_stock(self):
+        return self.stock - self.reserved
+
+class CatalogVersion(models.Model):
+    """Version d'une ressource du catalogue, incrémentée à chaque modification"""
+    resource = models.CharField(_('Ressource'), max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(_('Version'), default=1)
+    updated_at = models.DateTimeField(_('Mise à jour le'), default=timezone.now)
+
+    class Meta:
+        verbose_name = _('Version du catalogue')
+        verbose_name_plural = _('Versions du catalogue')
+
+    def __str__(self):
+        return f"{self.resource} v{self.version}"
 
 class Order(models.Model):
     """Modèle pour les commandes"""
@@ -169,10 +412,44 @@ class Order(models.Model):
     class Meta:
         verbose_name = _('Commande')
         verbose_name_plural = _('Commandes')
+        indexes = [
+            models.Index(
+                fields=['user', '-created_at', '-id'],
+                name='order_user_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"Commande {self.id} - {self.user.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Statut lu en base : une annulation retire la commande des agrégats
+        instance._recorded_status = instance.__dict__.get('status')
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or 'status' in fields:
+            self._recorded_status = self.__dict__.get('status')
+
+    def cancel_order(self):
+        """
+        Annule la commande et rend son stock (voir ``services.transition_orders``)
+
+        Returns:
+            bool: True si la commande a été annulée
+        """
+        from .services import transition_orders
+
+        result, = transition_orders([self.pk], 'cancelled')
+        if result['status'] != 'updated':
+            return False
+        self.status = 'cancelled'
+        self._recorded_status = self.status
+        return True
+
 class OrderItem(models.Model):
     """Modèle pour les éléments de commande"""
     order = models.ForeignKey(
@@ -212,15 +489,329 @@ class OrderItem(models.Model):
     def save(self, *args, **kwargs):
         """
         Surcharge de la méthode save pour vérifier le stock avant la création
+
+        Le stock n'est réduit qu'à la création : une mise à jour de l'article
+        ne doit pas le décompter une seconde fois. Les commandes passées via
+        l'API utilisent ``services.place_order`` (``bulk_create``), qui gère
+        le stock de manière ensembliste sans passer par cette méthode.
         """
-        # Vérifier le stock avant de créer l'item de commande
-        if not self.product.check_stock_availability(self.quantity):
-            raise ValidationError(
-                _('Stock insuffisant pour le produit %(product)s'),
-                params={'product': self.product.name}
-            )
-        
-        # Réduire le stock lors de la création de l'item de commande
-        self.product.reduce_stock(self.quantity)
-        
-        super().save(*args, **kwargs)
\ No newline at end of file
+        if self._state.adding:
+            # Vérifier le stock avant de créer l'item de commande
+            if not self.product.check_stock_availability(self.quantity):
+                raise ValidationError(
+                    _('Stock insuffisant pour le produit %(product)s'),
+                    params={'product': self.product.name}
+                )
+
+            # Réduire le stock lors de la création de l'item de commande
+            self.product.reduce_stock(self.quantity, self.product_format)
+
+        super().save(*args, **kwargs)
+
+class StockMovement(models.Model):
+    """
+    Journal des mouvements de stock, en ajout seul
+
+    Le stock d'un produit à un instant donné vaut son ``StockSnapshot`` plus
+    la somme des mouvements postérieurs au dernier compactage.
+    """
+    ORDER = 'order'
+    CANCEL = 'cancel'
+    RESTOCK = 'restock'
+    ADJUSTMENT = 'adjustment'
+    REASON_CHOICES = [
+        (ORDER, _('Commande')),
+        (CANCEL, _('Annulation')),
+        (RESTOCK, _('Réapprovisionnement')),
+        (ADJUSTMENT, _('Ajustement'))
+    ]
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_movements',
+        verbose_name=_('Produit')
+    )
+    product_format = models.ForeignKey(
+        ProductFormat,
+        on_delete=models.SET_NULL,
+        related_name='stock_movements',
+        verbose_name=_('Format du produit'),
+        blank=True,
+        null=True
+    )
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        related_name='stock_movements',
+        verbose_name=_('Commande'),
+        blank=True,
+        null=True
+    )
+    quantity = models.IntegerField(_('Quantité (signée)'))
+    reason = models.CharField(_('Motif'), max_length=20, choices=REASON_CHOICES)
+    created_at = models.DateTimeField(_('Créé le'), default=timezone.now)
+
+    class Meta:
+        verbose_name = _('Mouvement de stock')
+        verbose_name_plural = _('Mouvements de stock')
+        indexes = [
+            models.Index(fields=['product', 'created_at'], name='movement_product_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity:+d} {self.product_id} ({self.reason})"
+
+class StockSnapshot(models.Model):
+    """Stock d'un produit consolidé jusqu'au mouvement ``last_movement_id`` inclus"""
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_snapshot',
+        verbose_name=_('Produit')
+    )
+    stock = models.IntegerField(_('Stock consolidé'))
+    last_movement_id = models.PositiveBigIntegerField(_('Dernier mouvement consolidé'), default=0)
+    taken_at = models.DateTimeField(_('Consolidé le'), default=timezone.now)
+
+    class Meta:
+        verbose_name = _('Instantané de stock')
+        verbose_name_plural = _('Instantanés de stock')
+
+    def __str__(self):
+        return f"{self.product_id}: {self.stock}"
+
+class StockReservation(models.Model):
+    """
+    Réservation temporaire de stock pour un panier
+
+    ``reserved`` (déclinaison et total du produit) est incrémenté à la
+    création et décrémenté à l'expiration, à la libération ou à la
+    conversion en commande.
+    """
+    ACTIVE = 'active'
+    CONVERTED = 'converted'
+    RELEASED = 'released'
+    EXPIRED = 'expired'
+    STATUS_CHOICES = [
+        (ACTIVE, _('Active')),
+        (CONVERTED, _('Convertie en commande')),
+        (RELEASED, _('Libérée')),
+        (EXPIRED, _('Expirée'))
+    ]
+
+    user = models.ForeignKey(
+        'auth.User',
+        on_delete=models.CASCADE,
+        related_name='stock_reservations',
+        verbose_name=_('Utilisateur')
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='reservations',
+        verbose_name=_('Produit')
+    )
+    product_format = models.ForeignKey(
+        ProductFormat,
+        on_delete=models.CASCADE,
+        verbose_name=_('Format du produit')
+    )
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        related_name='reservations',
+        verbose_name=_('Commande'),
+        blank=True,
+        null=True
+    )
+    quantity = models.PositiveIntegerField(_('Quantité'))
+    status = models.CharField(
+        _('Statut'),
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=ACTIVE
+    )
+    created_at = models.DateTimeField(_('Créée le'), auto_now_add=True)
+    expires_at = models.DateTimeField(_('Expire le'))
+
+    class Meta:
+        verbose_name = _('Réservation de stock')
+        verbose_name_plural = _('Réservations de stock')
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='reservation_status_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} ({self.status})"
+
+class LowStockEvent(models.Model):
+    """Passage d'un produit sous (ou au-dessus de) son stock minimum"""
+    BELOW = 'below'
+    RECOVERED = 'recovered'
+    DIRECTION_CHOICES = [
+        (BELOW, _('Sous le seuil')),
+        (RECOVERED, _('Revenu au-dessus du seuil'))
+    ]
+
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='low_stock_events',
+        verbose_name=_('Produit')
+    )
+    direction = models.CharField(_('Sens'), max_length=20, choices=DIRECTION_CHOICES)
+    stock = models.PositiveIntegerField(_('Stock'))
+    min_stock = models.PositiveIntegerField(_('Stock minimum'))
+    created_at = models.DateTimeField(_('Créé le'), default=timezone.now)
+
+    class Meta:
+        verbose_name = _('Alerte de stock')
+        verbose_name_plural = _('Alertes de stock')
+
+    def __str__(self):
+        return f"{self.product_id} {self.direction} ({self.stock}/{self.min_stock})"
+
+
+class ProductSearchDocument(models.Model):
+    """
+    Texte indexé d'un produit, en minuscules et sans accents
+
+    Sert de contenu externe à la table FTS5 ``distributeur_product_fts``
+    (tenue à jour par des triggers SQLite) et d'index de repli sur les
+    autres bases.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document',
+        verbose_name=_('Produit')
+    )
+    name = models.TextField(_('Nom'))
+    supplier = models.TextField(_('Fournisseur'), blank=True)
+    category = models.TextField(_('Catégorie'), blank=True)
+    formats = models.TextField(_('Formats'), blank=True)
+
+    class Meta:
+        verbose_name = _('Document de recherche')
+        verbose_name_plural = _('Documents de recherche')
+
+    def __str__(self):
+        return self.name
+
+
+class Job(models.Model):
+    """Tâche asynchrone stockée en base, exécutée par ``manage.py run_jobs``"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, _('En file')),
+        (RUNNING, _('En cours')),
+        (DONE, _('Terminée')),
+        (FAILED, _('Échouée'))
+    ]
+
+    task = models.CharField(_('Tâche'), max_length=100)
+    payload = models.JSONField(_('Paramètres'), default=dict, blank=True)
+    status = models.CharField(_('Statut'), max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(_('Tentatives'), default=0)
+    max_attempts = models.PositiveIntegerField(_('Tentatives maximum'), default=5)
+    run_at = models.DateTimeField(_('Exécuter à partir de'), default=timezone.now)
+    # Bail : un worker arrêté en cours de route libère ses tâches à son échéance
+    locked_by = models.CharField(_('Verrouillée par'), max_length=100, blank=True)
+    locked_until = models.DateTimeField(_('Bail jusqu\'au'), blank=True, null=True)
+    last_error = models.TextField(_('Dernière erreur'), blank=True)
+    created_at = models.DateTimeField(_('Créée le'), default=timezone.now)
+    finished_at = models.DateTimeField(_('Terminée le'), blank=True, null=True)
+
+    class Meta:
+        verbose_name = _('Tâche asynchrone')
+        verbose_name_plural = _('Tâches asynchrones')
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+            models.Index(fields=['status', 'finished_at'], name='job_status_finished_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+class DailySales(models.Model):
+    """
+    Ventes agrégées par jour, produit et format
+
+    Tenu à jour à la création et à l'annulation des commandes
+    (voir ``analytics.py``) ; reconstruit par ``rebuild_sales_rollups``.
+    """
+    day = models.DateField(_('Jour'))
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='daily_sales',
+        verbose_name=_('Produit')
+    )
+    product_format = models.ForeignKey(
+        ProductFormat,
+        on_delete=models.CASCADE,
+        related_name='daily_sales',
+        verbose_name=_('Format du produit')
+    )
+    lines = models.IntegerField(_('Lignes de commande'), default=0)
+    units = models.IntegerField(_('Unités'), default=0)
+    revenue = models.DecimalField(_("Chiffre d'affaires"), max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = _('Ventes du jour')
+        verbose_name_plural = _('Ventes par jour')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'product', 'product_format'],
+                name='daily_sales_key_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.product_id}/{self.product_format_id}: {self.units}"
+
+
+class ChangeLog(models.Model):
+    """
+    Journal numéroté des créations, modifications et suppressions, lu par
+    ``/api/sync/`` ; l'identifiant sert de jeton de synchronisation
+
+    Les commandes portent leur propriétaire : chaque utilisateur ne
+    synchronise que les siennes.
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = [
+        (UPSERT, _('Création ou modification')),
+        (DELETE, _('Suppression'))
+    ]
+
+    resource = models.CharField(_('Ressource'), max_length=50)
+    object_id = models.PositiveBigIntegerField(_('Identifiant'))
+    action = models.CharField(_('Action'), max_length=10, choices=ACTION_CHOICES)
+    user = models.ForeignKey(
+        'auth.User',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('Propriétaire'),
+        blank=True,
+        null=True
+    )
+    created_at = models.DateTimeField(_('Créé le'), default=timezone.now)
+
+    class Meta:
+        verbose_name = _('Modification')
+        verbose_name_plural = _('Journal des modifications')
+        indexes = [
+            # Compactage : dernière entrée de chaque objet
+            models.Index(fields=['resource', 'object_id', 'id'], name='changelog_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.action} {self.resource}:{self.object_id}"
@@ -0,0 +1,82 @@
+# pagination.py
+from django.conf import settings
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+def max_page_size():
+    return getattr(settings, 'DISTRIBUTEUR_MAX_PAGE_SIZE', 500)
+
+
+class BoundedOffsetPagination(LimitOffsetPagination):
+    """Pagination limit/offset avec une taille de page plafonnée"""
+
+    @property
+    def max_limit(self):
+        return max_page_size()
+
+
+class SearchPagination(BoundedOffsetPagination):
+    """
+    Pagination des résultats de recherche : l'ordre est celui du classement,
+    pas d'une colonne indexée, d'où un découpage limit/offset
+    """
+    default_limit = 20
+
+
+class AnalyticsPagination(BoundedOffsetPagination):
+    """Lignes agrégées, triées par clé de regroupement et non par une colonne indexée"""
+    default_limit = 100
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Pagination par curseur sur un tri indexé : une page profonde coûte
+    autant que la première
+
+    Le personnel (``is_staff``) peut demander ``?pagination=offset`` pour
+    l'interface d'administration, qui a besoin de sauter à une page donnée.
+    """
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    mode_query_param = 'pagination'
+    offset_pagination_class = BoundedOffsetPagination
+
+    def __init__(self):
+        self.offset_paginator = None
+
+    @property
+    def max_page_size(self):
+        return max_page_size()
+
+    def use_offset(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'offset'
+            and request.user.is_staff
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_offset(request):
+            self.offset_paginator = self.offset_pagination_class()
+            ordering = self.get_ordering(request, queryset, view)
+            page = self.offset_paginator.paginate_queryset(
+                queryset.order_by(*ordering), request, view
+            )
+            self.display_page_controls = self.offset_paginator.display_page_controls
+            return page
+        self.offset_paginator = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.offset_paginator is not None:
+            return self.offset_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.offset_paginator is not None:
+            return self.offset_paginator.to_html()
+        return super().to_html()
+
+
+class OrderPagination(KeysetPagination):
+    """Commandes les plus récentes d'abord, sur l'index (user, created_at, id)"""
+    ordering = ('-created_at', '-id')
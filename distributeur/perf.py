@@ -0,0 +1,233 @@
+# perf.py
+import bisect
+import contextvars
+import json
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Bornes supérieures des classes des histogrammes (millisecondes)
+DURATION_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+SLOW_REQUEST_MS = 500
+DUPLICATES_LOGGED = 5
+
+_current = contextvars.ContextVar('distributeur_request_metrics', default=None)
+
+_placeholder_lists = re.compile(r'\((?:\s*%s\s*,)+\s*%s\s*\)')
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+
+
+def fingerprint(sql):
+    """
+    Forme normalisée d'une requête : littéraux et listes ``IN (%s, %s...)``
+    remplacés, pour regrouper les requêtes répétées (N+1)
+    """
+    sql = _placeholder_lists.sub('(...)', sql)
+    return _literals.sub('?', sql)
+
+
+class RequestMetrics:
+    """
+    Mesures d'une requête HTTP : requêtes SQL (nombre, durée, texte) et
+    durées nommées (``span``)
+
+    Le texte SQL est compté tel quel ; la normalisation n'est faite que
+    pour les requêtes lentes, à l'écriture du journal.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+        self.statement_time = Counter()
+        self.spans = Counter()
+        # Taille d'une réponse en flux, comptée pendant sa lecture
+        self.size = None
+
+    def __call__(self, execute, sql, params, many, context):
+        """Enveloppe d'exécution (``connection.execute_wrapper``)"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += elapsed
+            self.statements[sql] += 1
+            self.statement_time[sql] += elapsed
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def duplicates(self, limit=DUPLICATES_LOGGED):
+        """Requêtes répétées, regroupées par empreinte, les plus fréquentes d'abord"""
+        counts = Counter()
+        durations = Counter()
+        for sql, count in self.statements.items():
+            key = fingerprint(sql)
+            counts[key] += count
+            durations[key] += self.statement_time[sql]
+        return [
+            {'sql': sql, 'count': count, 'ms': round(durations[sql] * 1000, 2)}
+            for sql, count in counts.most_common(limit)
+            if count > 1
+        ]
+
+
+def current():
+    return _current.get()
+
+
+def _execute(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install(connection, **kwargs):
+    """
+    Récepteur de ``connection_created`` : chaque connexion compte ses
+    requêtes dans la mesure de la requête HTTP en cours
+
+    La mesure suit le contexte et non le thread : les requêtes de l'ORM
+    asynchrone, exécutées dans un thread de ``sync_to_async``, sont
+    comptées dans la requête qui les a lancées. L'enveloppe est placée en
+    tête : ``execute_wrapper`` retire la dernière enveloppe en sortie.
+    """
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _execute)
+
+
+@contextmanager
+def collecting(metrics):
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(name):
+    """Ajoute la durée du bloc à la mesure ``name`` de la requête en cours (sans effet hors requête)"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.spans[name] += time.perf_counter() - start
+
+
+class RouteHistograms:
+    """
+    Histogrammes des durées et cumuls par route, tenus par processus
+
+    Une route est la méthode HTTP suivie du nom de la vue résolue
+    (``GET product-list``) : leur nombre est borné par l'URLconf.
+    """
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def observe(self, route, total_ms, db_ms, queries, serialize_ms, size, status_code):
+        index = bisect.bisect_left(DURATION_BUCKETS, total_ms)
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = {
+                    'buckets': [0] * len(DURATION_BUCKETS),
+                    'totals': Counter(),
+                    'statuses': Counter(),
+                }
+            stats['buckets'][index] += 1
+            stats['statuses'][status_code // 100] += 1
+            totals = stats['totals']
+            totals['count'] += 1
+            totals['total_ms'] += total_ms
+            totals['db_ms'] += db_ms
+            totals['queries'] += queries
+            totals['serialize_ms'] += serialize_ms
+            totals['bytes'] += size or 0
+            totals['max_ms'] = max(totals['max_ms'], total_ms)
+
+    def snapshot(self):
+        with self._lock:
+            routes = {
+                route: (list(stats['buckets']), Counter(stats['totals']), Counter(stats['statuses']))
+                for route, stats in self._routes.items()
+            }
+        return {route: self._summary(*stats) for route, stats in sorted(routes.items())}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+    @staticmethod
+    def _percentile(buckets, count, fraction):
+        """Borne supérieure de la classe contenant le percentile (None au-delà de la dernière borne)"""
+        rank = fraction * count
+        seen = 0
+        for bound, bucket in zip(DURATION_BUCKETS, buckets):
+            seen += bucket
+            if seen >= rank:
+                return bound if bound != float('inf') else None
+        return None
+
+    def _summary(self, buckets, totals, statuses):
+        count = totals['count']
+        return {
+            'count': count,
+            'statuses': {f'{status}xx': number for status, number in sorted(statuses.items())},
+            'mean_ms': round(totals['total_ms'] / count, 2),
+            'max_ms': round(totals['max_ms'], 2),
+            'p50_ms': self._percentile(buckets, count, 0.5),
+            'p95_ms': self._percentile(buckets, count, 0.95),
+            'p99_ms': self._percentile(buckets, count, 0.99),
+            'mean_db_ms': round(totals['db_ms'] / count, 2),
+            'mean_queries': round(totals['queries'] / count, 2),
+            'mean_serialize_ms': round(totals['serialize_ms'] / count, 2),
+            'mean_bytes': round(totals['bytes'] / count),
+            'buckets': {
+                ('+Inf' if bound == float('inf') else str(bound)): number
+                for bound, number in zip(DURATION_BUCKETS, buckets)
+            },
+        }
+
+
+route_histograms = RouteHistograms()
+
+
+class SlowRequestLog:
+    """Journal JSONL des requêtes lentes, une ligne par requête"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def threshold_ms(self):
+        return getattr(settings, 'DISTRIBUTEUR_SLOW_REQUEST_MS', SLOW_REQUEST_MS)
+
+    @property
+    def path(self):
+        return getattr(settings, 'DISTRIBUTEUR_SLOW_REQUEST_LOG', None)
+
+    def write(self, record):
+        if not self.path:
+            return
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._lock, open(self.path, 'a', encoding='utf-8') as stream:
+            stream.write(line)
+
+
+slow_requests = SlowRequestLog()
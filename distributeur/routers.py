@@ -0,0 +1,74 @@
+# routers.py
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Alias de lecture de la requête en cours (None : base principale)
+_current = contextvars.ContextVar('distributeur_read_alias', default=None)
+
+# Modèles toujours lus sur la base principale : les tampons de version sont
+# recopiés dans le cache, une réplique en retard y figerait un ancien numéro
+PRIMARY_ONLY = {'catalogversion'}
+
+
+def replicas():
+    return list(getattr(settings, 'DISTRIBUTEUR_READ_REPLICAS', []))
+
+
+def choose():
+    """Une réplique tirée au hasard, ou None si aucune n'est configurée"""
+    aliases = replicas()
+    return random.choice(aliases) if aliases else None
+
+
+def current():
+    return _current.get()
+
+
+def read_replica(view):
+    """Marque une vue fonction dont les GET et HEAD peuvent être servis par une réplique"""
+    view.read_replica = True
+    return view
+
+
+@contextmanager
+def reading(alias):
+    """Dirige les lectures du bloc vers ``alias`` (None : base principale)"""
+    token = _current.set(alias)
+    try:
+        yield alias
+    finally:
+        _current.reset(token)
+
+
+class ReadReplicaRouter:
+    """
+    Envoie les lectures de l'application vers la réplique choisie pour la
+    requête en cours (``ReadReplicaMiddleware``)
+
+    Les écritures, les migrations et les autres applications (sessions,
+    authentification) restent sur ``default`` : une session ouverte à
+    l'instant n'est peut-être pas encore copiée sur la réplique.
+    """
+    app_label = 'distributeur'
+
+    def db_for_read(self, model, **hints):
+        alias = _current.get()
+        if alias is None or model._meta.app_label != self.app_label:
+            return None
+        if model._meta.model_name in PRIMARY_ONLY:
+            return None
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Les répliques sont des copies de la même base
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Une réplique reçoit le schéma avec les données, par copie
+        return db == 'default'
@@ -0,0 +1,199 @@
+# search.py
+import re
+import unicodedata
+
+from django.db import connections, router
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from .models import Product, ProductSearchDocument
+
+FTS_TABLE = 'distributeur_product_fts'
+# Poids BM25 des colonnes : name, supplier, category, formats
+FTS_WEIGHTS = (10.0, 3.0, 3.0, 1.0)
+SEARCH_FIELDS = ('name', 'supplier', 'category', 'formats')
+REINDEX_BATCH_SIZE = 500
+
+_WORD = re.compile(r'\w+')
+_fts_tables = {}
+
+
+def normalize(text):
+    """Minuscules sans accents : « Crème Brûlée » devient « creme brulee »"""
+    if not text:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def terms(query):
+    """Mots normalisés d'une requête utilisateur"""
+    return _WORD.findall(normalize(query))
+
+
+def _connection():
+    return connections[router.db_for_read(ProductSearchDocument)]
+
+
+def fts_enabled(connection=None):
+    """Vrai si la base est SQLite et que la table FTS5 a été créée par la migration"""
+    connection = connection or _connection()
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _fts_tables:
+        with connection.cursor() as cursor:
+            _fts_tables[name] = FTS_TABLE in connection.introspection.table_names(cursor)
+    return _fts_tables[name]
+
+
+def _documents(product_ids):
+    """Documents normalisés des produits donnés, en deux requêtes"""
+    formats = {}
+    links = Product.formats.through.objects.filter(product_id__in=product_ids)
+    for product_id, name, volume in links.values_list(
+        'product_id', 'productformat__name', 'productformat__volume'
+    ):
+        formats.setdefault(product_id, []).append(f'{name} {volume}')
+
+    rows = Product.objects.filter(pk__in=product_ids).values_list(
+        'pk', 'name', 'supplier__name', 'category__name'
+    )
+    return [
+        ProductSearchDocument(
+            product_id=pk,
+            name=normalize(name),
+            supplier=normalize(supplier),
+            category=normalize(category),
+            formats=normalize(' '.join(formats.get(pk, []))),
+        )
+        for pk, name, supplier, category in rows
+    ]
+
+
+def reindex(product_ids=None, batch_size=REINDEX_BATCH_SIZE):
+    """
+    Réécrit les documents de recherche des produits donnés (tous si None)
+
+    Upsert par lots : les triggers SQLite répercutent chaque ligne dans
+    l'index FTS5.
+
+    Returns:
+        int: Nombre de documents écrits
+    """
+    if product_ids is None:
+        product_ids = Product.objects.order_by('pk').values_list('pk', flat=True).iterator()
+    written = 0
+    batch = []
+    for pk in product_ids:
+        batch.append(pk)
+        if len(batch) >= batch_size:
+            written += _write(batch)
+            batch = []
+    if batch:
+        written += _write(batch)
+    return written
+
+
+def _write(product_ids):
+    documents = _documents(product_ids)
+    ProductSearchDocument.objects.bulk_create(
+        documents,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=list(SEARCH_FIELDS),
+    )
+    return len(documents)
+
+
+class SearchResults:
+    """
+    Résultats classés d'une recherche, découpés à la demande
+
+    Se comporte comme une séquence pour la pagination : ``count()`` compte
+    les correspondances et une tranche ne charge que les produits de la page,
+    dans l'ordre du classement.
+    """
+
+    def __init__(self, query, queryset=None):
+        self.terms = terms(query)
+        self.queryset = queryset if queryset is not None else Product.objects.all()
+        self.connection = _connection()
+        self.fts = fts_enabled(self.connection)
+        self._count = None
+
+    def _match(self):
+        # Chaque mot est cité (pas de syntaxe FTS5 injectée) ; seul le dernier,
+        # en cours de saisie, est cherché en préfixe : un préfixe court sur
+        # chaque mot fusionnerait des listes couvrant tout le catalogue
+        *words, last = self.terms
+        return ' '.join([f'"{word}"' for word in words] + [f'"{last}"*'])
+
+    def _fallback(self):
+        documents = ProductSearchDocument.objects.all()
+        for term in self.terms:
+            documents = documents.filter(
+                Q(name__contains=term) | Q(supplier__contains=term)
+                | Q(category__contains=term) | Q(formats__contains=term)
+            )
+        return documents
+
+    def count(self):
+        if self._count is None:
+            if not self.terms:
+                self._count = 0
+            elif self.fts:
+                with self.connection.cursor() as cursor:
+                    cursor.execute(
+                        f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                        [self._match()],
+                    )
+                    self._count = cursor.fetchone()[0]
+            else:
+                self._count = self._fallback().count()
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def ranked_ids(self, offset, limit):
+        """Identifiants des produits classés (BM25 sous SQLite) pour une tranche"""
+        if not self.terms or limit <= 0:
+            return []
+        if self.fts:
+            weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                    f'ORDER BY bm25({FTS_TABLE}, {weights}), rowid LIMIT %s OFFSET %s',
+                    [self._match(), limit, offset],
+                )
+                return [row[0] for row in cursor.fetchall()]
+        # Repli : les correspondances sur le nom passent en tête
+        first = self.terms[0]
+        rank = Case(
+            When(name__startswith=first, then=Value(0)),
+            When(name__contains=first, then=Value(1)),
+            default=Value(2),
+            output_field=IntegerField(),
+        )
+        documents = self._fallback().annotate(rank=rank).order_by('rank', 'product_id')
+        return list(documents.values_list('product_id', flat=True)[offset:offset + limit])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError('Seules les tranches simples sont prises en charge')
+        offset = index.start or 0
+        stop = index.stop if index.stop is not None else self.count()
+        ids = self.ranked_ids(offset, stop - offset)
+        products = self.queryset.in_bulk(ids)
+        return [products[pk] for pk in ids if pk in products]
+
+
+def search(query, queryset=None):
+    """
+    Recherche plein texte sur le nom, le fournisseur, la catégorie et les formats
+
+    Insensible à la casse et aux accents ; tous les mots doivent correspondre,
+    le dernier en préfixe (recherche au fil de la saisie).
+    """
+    return SearchResults(query, queryset)
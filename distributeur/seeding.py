@@ -0,0 +1,188 @@
+# seeding.py
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from . import analytics, ledger, search, sync
+from .models import (
+    Category, Order, OrderItem, Product, ProductFormat, ProductStock, StockMovement, Supplier
+)
+from .signals import invalidate_catalog
+
+SEED_BATCH_SIZE = 1000
+# Statuts des commandes historiques et leurs poids
+HISTORY_STATUSES = (('completed', 85), ('cancelled', 10), ('processing', 5))
+
+
+def _batches(count, batch_size):
+    for start in range(0, count, batch_size):
+        yield range(start, min(start + batch_size, count))
+
+
+@transaction.atomic
+def seed_catalog(suppliers=10, categories=10, formats=20, products=50, users=1, orders=10,
+                 items_per_order=3, formats_per_product=3, days=0, username='client',
+                 password='client', seed=42, batch_size=SEED_BATCH_SIZE):
+    """
+    Peuple la base avec un catalogue, des utilisateurs et des commandes
+
+    Insertions groupées par lots de ``batch_size`` ; le tirage est
+    déterministe pour une même graine. Le stock initial des produits est
+    réparti entre leurs déclinaisons et journalisé comme un ajustement, les
+    ventes journalières sont recalculées et chaque objet créé est inscrit au
+    journal de synchronisation.
+
+    Avec ``days=0`` les commandes sont créées maintenant, en attente ; sinon
+    elles sont réparties sur les ``days`` derniers jours avec un statut
+    d'historique (terminée le plus souvent). Les commandes historiques ne
+    décomptent pas le stock.
+
+    Args:
+        username (str): Préfixe des identifiants (``client0``, ``client1``...)
+        password (str): Mot de passe commun, haché une seule fois
+
+    Returns:
+        dict: Utilisateurs créés et nombre d'objets par modèle
+    """
+    rng = random.Random(seed)
+
+    password = make_password(password)
+    created_users = User.objects.bulk_create(
+        [User(username=f'{username}{i}', password=password) for i in range(users)],
+        batch_size=batch_size,
+    )
+
+    created_suppliers = Supplier.objects.bulk_create(
+        [Supplier(name=f'Fournisseur {i}') for i in range(suppliers)], batch_size=batch_size
+    )
+    created_categories = Category.objects.bulk_create(
+        [Category(name=f'Catégorie {i}') for i in range(categories)], batch_size=batch_size
+    )
+    created_formats = ProductFormat.objects.bulk_create(
+        [
+            ProductFormat(name=f'Format {i}', volume=f'{25 * (i + 1)}cl', price=Decimal('1.00'))
+            for i in range(formats)
+        ],
+        batch_size=batch_size,
+    )
+
+    catalog = []
+    Through = Product.formats.through
+    # Sans format, un produit n'a pas de déclinaison pour porter son stock
+    stocked = bool(created_formats) and formats_per_product > 0
+    for batch in _batches(products, batch_size):
+        stocks = [rng.randint(0, 500) if stocked else 0 for _ in batch]
+        created = Product.objects.bulk_create([
+            Product(
+                name=f'Produit {i}',
+                reference=f'REF-{i:06d}',
+                supplier=rng.choice(created_suppliers) if created_suppliers else None,
+                category=rng.choice(created_categories) if created_categories else None,
+                price=Decimal(rng.randint(100, 10000)) / 100,
+                stock=stock,
+                low_stock=stock < Product._meta.get_field('min_stock').default,
+            )
+            for i, stock in zip(batch, stocks)
+        ])
+        linked = [
+            rng.sample(created_formats, min(formats_per_product, len(created_formats)))
+            for _ in created
+        ]
+        Through.objects.bulk_create([
+            Through(product_id=product.pk, productformat_id=product_format.pk)
+            for product, product_formats in zip(created, linked)
+            for product_format in product_formats
+        ])
+        # Stock réparti entre les déclinaisons, le reste de la division au premier format
+        skus = ProductStock.objects.bulk_create([
+            ProductStock(
+                product_id=product.pk,
+                product_format_id=product_format.pk,
+                stock=product.stock // len(product_formats) + (product.stock % len(product_formats) if index == 0 else 0),
+            )
+            for product, product_formats in zip(created, linked)
+            for index, product_format in enumerate(product_formats)
+        ])
+        ledger.record([
+            StockMovement(
+                product_id=sku.product_id,
+                product_format_id=sku.product_format_id,
+                quantity=sku.stock,
+                reason=StockMovement.ADJUSTMENT,
+            )
+            for sku in skus
+        ])
+        catalog.extend(
+            (product.pk, product.price, [product_format.pk for product_format in product_formats])
+            for product, product_formats in zip(created, linked)
+        )
+
+    order_count = item_count = 0
+    # Un article de commande porte toujours un format du produit
+    orderable = [entry for entry in catalog if entry[2]]
+    if created_users and orderable and orders:
+        now = timezone.now()
+        statuses, weights = zip(*HISTORY_STATUSES)
+        for batch in _batches(orders, batch_size):
+            carts = [rng.sample(orderable, min(items_per_order, len(orderable))) for _ in batch]
+            quantities = [[rng.randint(1, 10) for _ in cart] for cart in carts]
+            created = Order.objects.bulk_create([
+                Order(
+                    user=rng.choice(created_users),
+                    status=rng.choices(statuses, weights)[0] if days else 'pending',
+                    total_amount=sum(price * quantity for (_, price, _), quantity in zip(cart, counts)),
+                )
+                for cart, counts in zip(carts, quantities)
+            ])
+            if days:
+                # created_at est fixé à l'insertion (auto_now_add) : antidaté ensuite
+                Order.objects.filter(pk__in=[order.pk for order in created]).update(created_at=Case(
+                    *[
+                        When(pk=order.pk, then=Value(now - timedelta(seconds=rng.randint(0, days * 86400))))
+                        for order in created
+                    ],
+                    output_field=DateTimeField(),
+                ))
+            items = OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product_id=product_id,
+                    product_format_id=rng.choice(format_ids),
+                    quantity=quantity,
+                    unit_price=price,
+                )
+                for order, cart, counts in zip(created, carts, quantities)
+                for (product_id, price, format_ids), quantity in zip(cart, counts)
+            ])
+            order_count += len(created)
+            item_count += len(items)
+            sync.record_orders([(order.pk, order.user_id) for order in created])
+
+    product_ids = [pk for pk, _, _ in catalog]
+    search.reindex(product_ids)
+    if order_count:
+        analytics.rebuild()
+    for resource, pks in (
+        ('suppliers', [supplier.pk for supplier in created_suppliers]),
+        ('categories', [category.pk for category in created_categories]),
+        ('formats', [product_format.pk for product_format in created_formats]),
+        ('products', product_ids),
+    ):
+        sync.record(resource, pks)
+        invalidate_catalog(resource if resource != 'formats' else 'products', None)
+
+    return {
+        'users': created_users,
+        'suppliers': len(created_suppliers),
+        'categories': len(created_categories),
+        'formats': len(created_formats),
+        'products': len(catalog),
+        'orders': order_count,
+        'order_items': item_count,
+    }
@@ -1,41 +1,76 @@
 # serializers.py
 from rest_framework import serializers
-from .models import Category, Supplier, Product, ProductFormat, Order, OrderItem
+from . import images
+from .fieldsets import SparseFieldsMixin
+from .models import (
+    Category, Supplier, Product, ProductFormat, Order, OrderItem,
+    StockMovement, StockReservation, LowStockEvent
+)
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
 
-class SupplierSerializer(serializers.ModelSerializer):
+class SupplierSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Supplier
         fields = '__all__'
 
-class ProductFormatSerializer(serializers.ModelSerializer):
+class ProductFormatSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = ProductFormat
         fields = '__all__'
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     supplier = SupplierSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
     formats = ProductFormatSerializer(many=True, read_only=True)
+    image_variants = serializers.SerializerMethodField()
+    column_dependencies = {'image_variants': ('image_digest',)}
 
     class Meta:
         model = Product
         fields = '__all__'
+        read_only_fields = ['low_stock']
 
-class OrderItemSerializer(serializers.ModelSerializer):
+    def get_image_variants(self, obj):
+        """URL des déclinaisons (thumbnail, card, full en webp et jpg), une fois générées"""
+        if not obj.image_digest:
+            return None
+        request = self.context.get('request')
+        urls = images.variant_urls(obj.image_digest)
+        if request is not None:
+            for formats in urls.values():
+                for extension, url in formats.items():
+                    formats[extension] = request.build_absolute_uri(url)
+        return urls
+
+class OrderItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
 
     class Meta:
         model = OrderItem
         fields = '__all__'
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
 
     class Meta:
         model = Order
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class StockMovementSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = StockMovement
+        fields = '__all__'
+
+class StockReservationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = StockReservation
+        fields = '__all__'
+
+class LowStockEventSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = LowStockEvent
+        fields = '__all__'
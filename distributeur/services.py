@@ -0,0 +1,873 @@
+# services.py
+import operator
+from collections import OrderedDict
+from datetime import timedelta
+from functools import reduce
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, When
+from django.utils import timezone
+
+from . import alerts, analytics, inventory, jobs, ledger, sync
+from .models import Order, OrderItem, Product, ProductStock, StockMovement, StockReservation
+from .signals import stock_changed
+
+
+class OrderPlacementError(Exception):
+    """Erreur levée lors du passage d'une commande, avec le détail par ligne"""
+
+    def __init__(self, message, issues=None, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.issues = issues or []
+        self.status_code = status_code
+
+
+def _parse_cart(cart_items):
+    """
+    Valide et normalise les lignes du panier
+
+    Args:
+        cart_items (list): Lignes brutes ``{'product_id', 'quantity', 'product_format_id'}``
+
+    Returns:
+        OrderedDict: Quantités agrégées par couple (product_id, product_format_id)
+
+    Raises:
+        OrderPlacementError: Si une ligne est mal formée
+    """
+    lines = OrderedDict()
+    issues = []
+    for index, item in enumerate(cart_items):
+        try:
+            product_id = int(item['product_id'])
+            quantity = int(item['quantity'])
+            format_id = item.get('product_format_id')
+            format_id = int(format_id) if format_id is not None else None
+        except (KeyError, TypeError, ValueError, AttributeError):
+            issues.append({'line': index, 'error': 'Ligne de panier invalide'})
+            continue
+        if quantity <= 0:
+            issues.append({
+                'line': index,
+                'product_id': product_id,
+                'error': 'La quantité doit être positive',
+            })
+            continue
+        key = (product_id, format_id)
+        lines[key] = lines.get(key, 0) + quantity
+
+    if issues:
+        raise OrderPlacementError('Panier invalide', issues)
+    return lines
+
+
+def _resolve_formats(lines, formats_by_product):
+    """
+    Associe chaque ligne à un format du produit
+
+    Un format absent est déduit lorsque le produit n'en propose qu'un seul.
+    """
+    resolved = OrderedDict()
+    issues = []
+    for (product_id, format_id), quantity in lines.items():
+        available = formats_by_product.get(product_id, set())
+        if format_id is None and len(available) == 1:
+            format_id = next(iter(available))
+        if format_id is None or format_id not in available:
+            issues.append({
+                'product_id': product_id,
+                'product_format_id': format_id,
+                'error': 'Format indisponible pour ce produit',
+            })
+            continue
+        key = (product_id, format_id)
+        resolved[key] = resolved.get(key, 0) + quantity
+
+    if issues:
+        raise OrderPlacementError('Formats invalides', issues)
+    return resolved
+
+
+def _stock_issues(products, skus, lines, held=None):
+    """
+    Lignes dont la déclinaison n'a pas assez de stock disponible
+
+    Args:
+        skus (dict): {(product_id, product_format_id): (stock, reserved)}
+        held (dict): Quantités déjà retenues par les réservations converties
+    """
+    held = held or {}
+    issues = []
+    for (product_id, format_id), quantity in lines.items():
+        stock, reserved = skus.get((product_id, format_id), (0, 0))
+        available = stock - reserved + held.get((product_id, format_id), 0)
+        if available < quantity:
+            issues.append({
+                'product_id': product_id,
+                'product_format_id': format_id,
+                'product_name': products[product_id].name,
+                'available_stock': available,
+                'requested_quantity': quantity,
+            })
+    return issues
+
+
+def _sku_stocks(keys):
+    """Stock et réservations courants de déclinaisons, après un UPDATE conditionnel refusé"""
+    return {
+        (product_id, format_id): (stock, reserved)
+        for product_id, format_id, stock, reserved in ProductStock.objects.filter(
+            inventory.sku_filter(keys)
+        ).values_list('product_id', 'product_format_id', 'stock', 'reserved')
+    }
+
+
+def _product_case(values, default=None):
+    """Expression CASE donnant une valeur par produit ({product_id: valeur})"""
+    return Case(
+        *[When(pk=product_id, then=value) for product_id, value in values.items()],
+        default=default,
+        output_field=IntegerField(),
+    )
+
+
+def _load_cart(lines):
+    """
+    Charge et verrouille les produits du panier et leurs déclinaisons, puis
+    résout les formats
+
+    Deux requêtes quelle que soit la taille du panier ; seules les
+    déclinaisons dont le format est lié au produit sont lues.
+
+    Returns:
+        tuple: (produits par id, ``(stock, reserved)`` par déclinaison,
+        lignes résolues, quantités totales par produit)
+    """
+    product_ids = {product_id for product_id, _ in lines}
+    products = (
+        Product.objects
+        .select_for_update()
+        .only('id', 'name', 'price', 'stock', 'reserved', 'min_stock', 'low_stock')
+        .in_bulk(product_ids)
+    )
+    missing = sorted(product_ids - products.keys())
+    if missing:
+        raise OrderPlacementError(
+            'Produit non trouvé',
+            [{'product_id': product_id, 'error': 'Produit non trouvé'} for product_id in missing],
+            status_code=404,
+        )
+
+    skus = {}
+    formats_by_product = {}
+    rows = (
+        inventory.linked_skus(product_ids).select_for_update()
+        .values_list('product_id', 'product_format_id', 'stock', 'reserved')
+    )
+    for product_id, format_id, stock, reserved in rows:
+        skus[(product_id, format_id)] = (stock, reserved)
+        formats_by_product.setdefault(product_id, set()).add(format_id)
+    lines = _resolve_formats(lines, formats_by_product)
+    return products, skus, lines, inventory.product_totals(lines)
+
+
+def _claim_reservations(user, reservation_ids):
+    """
+    Verrouille les réservations actives de l'utilisateur à convertir
+
+    Raises:
+        OrderPlacementError: Réservation inconnue, déjà utilisée ou expirée
+    """
+    try:
+        reservation_ids = {int(pk) for pk in reservation_ids}
+    except (TypeError, ValueError):
+        raise OrderPlacementError('Identifiants de réservation invalides')
+
+    reservations = list(
+        StockReservation.objects.select_for_update()
+        .filter(pk__in=reservation_ids, user=user, status=StockReservation.ACTIVE)
+    )
+    now = timezone.now()
+    valid = {reservation.pk for reservation in reservations if reservation.expires_at > now}
+    if valid != reservation_ids:
+        raise OrderPlacementError('Réservations invalides', [
+            {'reservation_id': pk, 'error': 'Réservation inconnue, utilisée ou expirée'}
+            for pk in sorted(reservation_ids - valid)
+        ])
+    return reservations
+
+
+@transaction.atomic
+def place_order(user, cart_items, reservation_ids=()):
+    """
+    Crée une commande en un nombre constant de requêtes, quelle que soit
+    la taille du panier
+
+    Les produits et leurs déclinaisons sont chargés et verrouillés, le stock
+    est décrémenté par un unique UPDATE conditionnel (stock disponible >=
+    quantité) puis les articles sont insérés avec ``bulk_create``.
+
+    Les ventes journalières (``DailySales``) sont incrémentées dans la même
+    transaction.
+
+    La commande reste ``pending`` : une tâche ``orders.process`` est mise en
+    file pour la suite du traitement, hors de la requête.
+
+    Le stock est tenu par déclinaison (``ProductStock``) : ``Product.stock``
+    et ``Product.reserved``, leurs totaux, sont décrémentés dans la même
+    transaction.
+
+    Les réservations converties s'ajoutent au panier : leur quantité est
+    déjà retenue sur la déclinaison, il suffit de la transférer de
+    ``reserved`` à ``stock`` dans le même UPDATE.
+
+    Args:
+        user (User): Auteur de la commande
+        cart_items (list): Lignes du panier
+        reservation_ids (list): Réservations actives de l'utilisateur à convertir
+
+    Returns:
+        Order: La commande créée
+
+    Raises:
+        OrderPlacementError: Panier invalide, produit introuvable ou stock insuffisant
+    """
+    if not cart_items and not reservation_ids:
+        raise OrderPlacementError('Aucun article dans le panier')
+
+    lines = _parse_cart(cart_items) if cart_items else OrderedDict()
+    reservations = _claim_reservations(user, reservation_ids) if reservation_ids else []
+    held = {}
+    for reservation in reservations:
+        key = (reservation.product_id, reservation.product_format_id)
+        lines[key] = lines.get(key, 0) + reservation.quantity
+        held[key] = held.get(key, 0) + reservation.quantity
+
+    products, skus, lines, totals = _load_cart(lines)
+
+    stock_errors = _stock_issues(products, skus, lines, held)
+    if stock_errors:
+        raise OrderPlacementError('Stocks insuffisants', stock_errors)
+
+    # Décrément atomique : une déclinaison n'est modifiée que si son stock
+    # disponible (hors réservations des autres paniers) suffit encore
+    guard = reduce(operator.or_, (
+        Q(product_id=product_id, product_format_id=format_id,
+          stock__gte=F('reserved') - held.get((product_id, format_id), 0) + quantity)
+        for (product_id, format_id), quantity in lines.items()
+    ))
+    sku_changes = {'stock': F('stock') - inventory.sku_case(lines)}
+    if held:
+        sku_changes['reserved'] = F('reserved') - inventory.sku_case(held, default=0)
+    if ProductStock.objects.filter(guard).update(**sku_changes) != len(lines):
+        # Une commande concurrente a consommé le stock entre-temps
+        raise OrderPlacementError('Stocks insuffisants', _stock_issues(products, _sku_stocks(lines), lines, held))
+
+    # Totaux dénormalisés du produit, dans la même transaction
+    remaining = {product_id: products[product_id].stock - quantity for product_id, quantity in totals.items()}
+    changes = {
+        'stock': F('stock') - _product_case(totals),
+        'low_stock': alerts.low_stock_case({
+            product_id: stock < products[product_id].min_stock
+            for product_id, stock in remaining.items()
+        }),
+        'last_order_date': timezone.localdate(),
+    }
+    if held:
+        changes['reserved'] = F('reserved') - _product_case(inventory.product_totals(held), default=0)
+    Product.objects.filter(pk__in=totals.keys()).update(**changes)
+
+    order = Order.objects.create(
+        user=user,
+        total_amount=sum(
+            products[product_id].price * quantity
+            for (product_id, _), quantity in lines.items()
+        ),
+        status='pending',
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product_id=product_id,
+            product_format_id=format_id,
+            quantity=quantity,
+            unit_price=products[product_id].price,
+        )
+        for (product_id, format_id), quantity in lines.items()
+    ])
+    day = analytics.sales_day(order.created_at)
+    analytics.record(
+        (day, product_id, format_id, quantity, products[product_id].price)
+        for (product_id, format_id), quantity in lines.items()
+    )
+    if reservations:
+        StockReservation.objects.filter(pk__in=[r.pk for r in reservations]).update(
+            status=StockReservation.CONVERTED, order=order
+        )
+    ledger.record([
+        StockMovement(
+            product_id=product_id,
+            product_format_id=format_id,
+            order=order,
+            quantity=-quantity,
+            reason=StockMovement.ORDER,
+        )
+        for (product_id, format_id), quantity in lines.items()
+    ])
+    alerts.record_crossings(
+        (
+            product_id,
+            products[product_id].low_stock,
+            stock < products[product_id].min_stock,
+            stock,
+            products[product_id].min_stock,
+        )
+        for product_id, stock in remaining.items()
+    )
+    # Le traitement de la commande est confié aux workers (tasks.process_orders)
+    jobs.enqueue('orders.process', {'order_id': order.pk})
+    stock_changed.send(sender=Product, product_ids=list(totals))
+    return order
+
+
+def reservation_ttl(ttl=None):
+    """Durée de validité d'une réservation, bornée par la configuration"""
+    default = getattr(settings, 'DISTRIBUTEUR_RESERVATION_TTL', 900)
+    maximum = getattr(settings, 'DISTRIBUTEUR_RESERVATION_MAX_TTL', 3600)
+    if ttl in (None, ''):
+        return default
+    try:
+        ttl = int(ttl)
+    except (TypeError, ValueError):
+        raise OrderPlacementError('Durée de réservation invalide')
+    if ttl <= 0:
+        raise OrderPlacementError('Durée de réservation invalide')
+    return min(ttl, maximum)
+
+
+@transaction.atomic
+def reserve_stock(user, cart_items, ttl=None):
+    """
+    Pose des réservations temporaires sur les lignes d'un panier
+
+    Même principe que ``place_order`` : un UPDATE conditionnel incrémente
+    ``reserved`` des déclinaisons tant que stock >= réservé + quantité, puis
+    celui des produits ; les réservations sont insérées avec ``bulk_create``.
+
+    Returns:
+        list: Les réservations créées
+    """
+    if not cart_items:
+        raise OrderPlacementError('Aucun article à réserver')
+    expires_at = timezone.now() + timedelta(seconds=reservation_ttl(ttl))
+
+    products, skus, lines, totals = _load_cart(_parse_cart(cart_items))
+    stock_errors = _stock_issues(products, skus, lines)
+    if stock_errors:
+        raise OrderPlacementError('Stocks insuffisants', stock_errors)
+
+    guard = reduce(operator.or_, (
+        Q(product_id=product_id, product_format_id=format_id, stock__gte=F('reserved') + quantity)
+        for (product_id, format_id), quantity in lines.items()
+    ))
+    if ProductStock.objects.filter(guard).update(reserved=F('reserved') + inventory.sku_case(lines)) != len(lines):
+        raise OrderPlacementError('Stocks insuffisants', _stock_issues(products, _sku_stocks(lines), lines))
+    Product.objects.filter(pk__in=totals.keys()).update(reserved=F('reserved') + _product_case(totals))
+
+    reservations = StockReservation.objects.bulk_create([
+        StockReservation(
+            user=user,
+            product_id=product_id,
+            product_format_id=format_id,
+            quantity=quantity,
+            expires_at=expires_at,
+        )
+        for (product_id, format_id), quantity in lines.items()
+    ])
+    stock_changed.send(sender=Product, product_ids=list(totals))
+    return reservations
+
+
+def _release(reservations, new_status):
+    """
+    Rend au stock disponible les quantités de réservations actives
+
+    Un UPDATE sur les réservations, un sur les déclinaisons et un agrégé
+    par produit.
+    """
+    if not reservations:
+        return 0
+    held = {}
+    for pk, product_id, format_id, quantity in reservations:
+        held[(product_id, format_id)] = held.get((product_id, format_id), 0) + quantity
+    totals = inventory.product_totals(held)
+
+    StockReservation.objects.filter(pk__in=[pk for pk, _, _, _ in reservations]).update(status=new_status)
+    ProductStock.objects.filter(inventory.sku_filter(held)).update(
+        reserved=F('reserved') - inventory.sku_case(held)
+    )
+    Product.objects.filter(pk__in=totals.keys()).update(reserved=F('reserved') - _product_case(totals))
+    stock_changed.send(sender=Product, product_ids=list(totals))
+    return len(reservations)
+
+
+@transaction.atomic
+def release_reservation(reservation):
+    """Libère une réservation active avant son expiration"""
+    rows = list(
+        StockReservation.objects.select_for_update()
+        .filter(pk=reservation.pk, status=StockReservation.ACTIVE)
+        .values_list('pk', 'product_id', 'product_format_id', 'quantity')
+    )
+    return _release(rows, StockReservation.RELEASED) == 1
+
+
+@transaction.atomic
+def expire_reservations(batch_size=1000):
+    """
+    Expire un lot de réservations échues
+
+    Returns:
+        int: Nombre de réservations expirées (0 quand il n'en reste plus)
+    """
+    rows = list(
+        StockReservation.objects.select_for_update()
+        .filter(status=StockReservation.ACTIVE, expires_at__lte=timezone.now())
+        .order_by('expires_at')
+        .values_list('pk', 'product_id', 'product_format_id', 'quantity')[:batch_size]
+    )
+    return _release(rows, StockReservation.EXPIRED)
+
+
+STOCK_ADJUSTMENT_MODES = ('absolute', 'delta')
+BULK_STOCK_BATCH_SIZE = 300
+
+
+def _parse_adjustments(adjustments, mode):
+    """
+    Valide les ajustements de stock
+
+    Returns:
+        tuple: (OrderedDict {(id, format ou None): valeur}, {clé: numéro de ligne},
+        résultats en erreur)
+    """
+    field = 'stock' if mode == 'absolute' else 'delta'
+    values = OrderedDict()
+    lines = {}
+    rejected = []
+    for index, row in enumerate(adjustments):
+        try:
+            pk = int(row['id'])
+            value = int(row[field])
+            format_id = row.get('product_format_id')
+            format_id = int(format_id) if format_id is not None else None
+        except (KeyError, TypeError, ValueError, AttributeError):
+            rejected.append({'line': index, 'status': 'invalid', 'error': f"'id' et '{field}' entiers requis"})
+            continue
+        if mode == 'absolute' and value < 0:
+            rejected.append({'line': index, 'id': pk, 'status': 'invalid', 'error': 'Le stock ne peut pas être négatif'})
+            continue
+        if (pk, format_id) in values:
+            rejected.append({'line': index, 'id': pk, 'status': 'invalid', 'error': 'Identifiant en double'})
+            continue
+        values[(pk, format_id)] = value
+        lines[(pk, format_id)] = index
+    return values, lines, rejected
+
+
+def _batches(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+@transaction.atomic
+def adjust_stock(adjustments, mode='absolute'):
+    """
+    Applique des ajustements de stock en masse, par lots d'UPDATE ensemblistes
+
+    Chaque ligne vise une déclinaison (produit, format) ; le format peut
+    être omis lorsque le produit n'en propose qu'un seul. En mode
+    ``absolute`` le stock est remplacé ; en mode ``delta`` il est
+    incrémenté via ``F('stock')``, l'UPDATE ne touchant que les lignes dont
+    le stock resterait positif, ce qui le rend sûr face aux commandes
+    concurrentes. Le total du produit et son indicateur ``low_stock`` sont
+    modifiés par un second UPDATE, dans la même transaction.
+
+    Args:
+        adjustments (list): Lignes ``{'id', 'product_format_id', 'stock'}``
+            ou ``{'id', 'product_format_id', 'delta'}``
+        mode (str): ``absolute`` ou ``delta``
+
+    Returns:
+        list: Un résultat par ligne, dans l'ordre reçu (``updated``,
+        ``not_found``, ``insufficient_stock`` ou ``invalid``)
+    """
+    if mode not in STOCK_ADJUSTMENT_MODES:
+        raise ValueError(f'Mode inconnu : {mode}')
+
+    values, lines, results = _parse_adjustments(adjustments, mode)
+    updated_ids = []
+    for batch in _batches(values.items(), BULK_STOCK_BATCH_SIZE):
+        product_ids = {pk for (pk, _), _ in batch}
+        products = {
+            pk: (stock, min_stock, low_stock)
+            for pk, stock, min_stock, low_stock in Product.objects.select_for_update()
+            .filter(pk__in=product_ids)
+            .values_list('pk', 'stock', 'min_stock', 'low_stock')
+        }
+        current = {}
+        formats_by_product = {}
+        rows = (
+            inventory.linked_skus(product_ids).select_for_update()
+            .order_by('product_format_id')
+            .values_list('product_id', 'product_format_id', 'stock')
+        )
+        for pk, format_id, stock in rows:
+            current[(pk, format_id)] = stock
+            formats_by_product.setdefault(pk, []).append(format_id)
+
+        applicable = OrderedDict()
+        for (pk, format_id), value in batch:
+            line = lines[(pk, format_id)]
+            available = formats_by_product.get(pk, [])
+            if format_id is None and len(available) == 1:
+                format_id = available[0]
+            sku = (pk, format_id)
+            if pk not in products or (format_id is not None and sku not in current):
+                results.append({'line': line, 'id': pk, 'product_format_id': format_id, 'status': 'not_found'})
+            elif format_id is None:
+                results.append({
+                    'line': line,
+                    'id': pk,
+                    'status': 'invalid',
+                    'error': "'product_format_id' requis : le produit propose plusieurs formats"
+                    if available else 'Aucun format pour ce produit',
+                })
+            elif sku in applicable:
+                results.append({'line': line, 'id': pk, 'status': 'invalid', 'error': 'Identifiant en double'})
+            elif mode == 'delta' and current[sku] + value < 0:
+                results.append({
+                    'line': line,
+                    'id': pk,
+                    'product_format_id': format_id,
+                    'status': 'insufficient_stock',
+                    'stock': current[sku],
+                    'delta': value,
+                })
+            else:
+                applicable[sku] = (value, line)
+        if not applicable:
+            continue
+
+        values_by_sku = {sku: value for sku, (value, _) in applicable.items()}
+        if mode == 'absolute':
+            rows = ProductStock.objects.filter(inventory.sku_filter(applicable))
+            new_stock = inventory.sku_case(values_by_sku)
+        else:
+            rows = ProductStock.objects.filter(reduce(operator.or_, (
+                Q(product_id=pk, product_format_id=format_id, stock__gte=-value)
+                if value < 0 else Q(product_id=pk, product_format_id=format_id)
+                for (pk, format_id), value in values_by_sku.items()
+            )))
+            new_stock = F('stock') + inventory.sku_case(values_by_sku)
+        if rows.update(stock=new_stock) != len(applicable):
+            # Les lignes sont verrouillées : un écart signale une écriture concurrente
+            raise DatabaseError('Stock modifié pendant l\'ajustement, opération annulée')
+
+        stocks = {
+            sku: value if mode == 'absolute' else current[sku] + value
+            for sku, value in values_by_sku.items()
+        }
+        deltas = inventory.product_totals({sku: stock - current[sku] for sku, stock in stocks.items()})
+        totals = {pk: products[pk][0] + delta for pk, delta in deltas.items()}
+        Product.objects.filter(pk__in=deltas.keys()).update(
+            stock=F('stock') + _product_case(deltas),
+            low_stock=alerts.low_stock_case({pk: stock < products[pk][1] for pk, stock in totals.items()}),
+        )
+
+        movements = []
+        for (pk, format_id), (_, line) in applicable.items():
+            stock = stocks[(pk, format_id)]
+            results.append({
+                'line': line,
+                'id': pk,
+                'product_format_id': format_id,
+                'status': 'updated',
+                'stock': stock,
+                'product_stock': totals[pk],
+            })
+            change = stock - current[(pk, format_id)]
+            movements.append(StockMovement(
+                product_id=pk,
+                product_format_id=format_id,
+                quantity=change,
+                reason=StockMovement.RESTOCK if mode == 'delta' and change > 0 else StockMovement.ADJUSTMENT,
+            ))
+        ledger.record(movements)
+        alerts.record_crossings(
+            (pk, products[pk][2], stock < products[pk][1], stock, products[pk][1])
+            for pk, stock in totals.items()
+        )
+        updated_ids.extend(deltas)
+
+    if updated_ids:
+        stock_changed.send(sender=Product, product_ids=updated_ids)
+    return sorted(results, key=lambda result: result['line'])
+
+
+@transaction.atomic
+def realign_stock(product_ids=None):
+    """
+    Ramène ``stock`` et ``reserved`` des produits en écart à la somme de
+    leurs déclinaisons (voir ``inventory.drift``)
+
+    Les déclinaisons font foi ; l'écart de stock est journalisé comme un
+    ajustement.
+
+    Returns:
+        list: Les écarts corrigés
+    """
+    drift = inventory.drift(product_ids)
+    for batch in _batches(drift, BULK_STOCK_BATCH_SIZE):
+        stocks = {row['product_id']: row['sku_stock'] for row in batch}
+        thresholds = {
+            pk: (min_stock, low_stock)
+            for pk, min_stock, low_stock in Product.objects.select_for_update()
+            .filter(pk__in=stocks.keys())
+            .values_list('pk', 'min_stock', 'low_stock')
+        }
+        Product.objects.filter(pk__in=stocks.keys()).update(
+            stock=_product_case(stocks),
+            reserved=_product_case({row['product_id']: row['sku_reserved'] for row in batch}),
+            low_stock=alerts.low_stock_case({pk: stock < thresholds[pk][0] for pk, stock in stocks.items()}),
+        )
+        ledger.record([
+            StockMovement(
+                product_id=row['product_id'],
+                quantity=row['sku_stock'] - row['stock'],
+                reason=StockMovement.ADJUSTMENT,
+            )
+            for row in batch
+        ])
+        alerts.record_crossings(
+            (pk, thresholds[pk][1], stock < thresholds[pk][0], stock, thresholds[pk][0])
+            for pk, stock in stocks.items()
+        )
+    if drift:
+        stock_changed.send(sender=Product, product_ids=[row['product_id'] for row in drift])
+    return drift
+
+
+@transaction.atomic
+def retire_skus(links):
+    """
+    Supprime les déclinaisons dont le format n'est plus lié au produit
+
+    Les réservations actives de ces déclinaisons sont libérées ; leur stock
+    et ce qui reste réservé sont retirés des totaux des produits, le stock
+    étant journalisé comme un ajustement.
+
+    Args:
+        links (dict): {product_id: formats désormais liés au produit}
+
+    Returns:
+        int: Nombre de déclinaisons supprimées
+    """
+    links = {product_id: set(formats) for product_id, formats in links.items()}
+    keys = {
+        (product_id, format_id)
+        for product_id, format_id in ProductStock.objects.filter(product_id__in=links.keys())
+        .values_list('product_id', 'product_format_id')
+        if format_id not in links[product_id]
+    }
+    if not keys:
+        return 0
+    _release(
+        list(
+            StockReservation.objects.filter(inventory.sku_filter(keys), status=StockReservation.ACTIVE)
+            .values_list('pk', 'product_id', 'product_format_id', 'quantity')
+        ),
+        StockReservation.RELEASED,
+    )
+
+    skus = ProductStock.objects.filter(inventory.sku_filter(keys))
+    rows = list(skus.values_list('product_id', 'product_format_id', 'stock', 'reserved'))
+    stocks, reserved = {}, {}
+    for product_id, _, stock, held in rows:
+        stocks[product_id] = stocks.get(product_id, 0) + stock
+        reserved[product_id] = reserved.get(product_id, 0) + held
+    products = {
+        pk: (stock, min_stock, low_stock)
+        for pk, stock, min_stock, low_stock in Product.objects.select_for_update()
+        .filter(pk__in=stocks.keys())
+        .values_list('pk', 'stock', 'min_stock', 'low_stock')
+    }
+    remaining = {pk: products[pk][0] - removed for pk, removed in stocks.items()}
+    Product.objects.filter(pk__in=stocks.keys()).update(
+        stock=F('stock') - _product_case(stocks),
+        reserved=F('reserved') - _product_case(reserved),
+        low_stock=alerts.low_stock_case({pk: stock < products[pk][1] for pk, stock in remaining.items()}),
+    )
+    skus.delete()
+    ledger.record([
+        StockMovement(
+            product_id=product_id,
+            product_format_id=format_id,
+            quantity=-stock,
+            reason=StockMovement.ADJUSTMENT,
+        )
+        for product_id, format_id, stock, _ in rows
+        if stock
+    ])
+    alerts.record_crossings(
+        (pk, products[pk][2], stock < products[pk][1], stock, products[pk][1])
+        for pk, stock in remaining.items()
+    )
+    stock_changed.send(sender=Product, product_ids=list(stocks))
+    return len(rows)
+
+
+# Transitions de statut autorisées : statut courant -> statuts atteignables
+ORDER_TRANSITIONS = {
+    'pending': {'processing', 'cancelled'},
+    'processing': {'completed', 'cancelled'},
+    'completed': set(),
+    'cancelled': set(),
+}
+ORDER_TRANSITION_BATCH_SIZE = 500
+
+
+def _restore_stock(order_ids):
+    """
+    Rend au stock les articles de commandes annulées
+
+    Les quantités sont agrégées en base par produit et format (GROUP BY),
+    puis réintégrées par un UPDATE ``F('stock') + CASE`` par lot de
+    déclinaisons et un par lot de produits pour leurs totaux : le nombre de
+    requêtes ne dépend pas du nombre de commandes.
+
+    Returns:
+        list: Identifiants des produits réapprovisionnés
+    """
+    lines = list(
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .values('order_id', 'product_id', 'product_format_id')
+        .annotate(total=Sum('quantity'))
+        .order_by()
+    )
+    quantities = {}
+    for line in lines:
+        key = (line['product_id'], line['product_format_id'])
+        quantities[key] = quantities.get(key, 0) + line['total']
+    totals = inventory.product_totals(quantities)
+
+    for batch in _batches(quantities.items(), BULK_STOCK_BATCH_SIZE):
+        batch = dict(batch)
+        ProductStock.objects.filter(inventory.sku_filter(batch)).update(
+            stock=F('stock') + inventory.sku_case(batch)
+        )
+    for batch in _batches(totals.items(), BULK_STOCK_BATCH_SIZE):
+        batch = dict(batch)
+        locked = (
+            Product.objects.select_for_update()
+            .filter(pk__in=batch.keys())
+            .values_list('pk', 'stock', 'min_stock', 'low_stock')
+        )
+        stocks = {pk: (stock + batch[pk], min_stock, low_stock) for pk, stock, min_stock, low_stock in locked}
+        Product.objects.filter(pk__in=stocks.keys()).update(
+            stock=F('stock') + _product_case(batch),
+            low_stock=alerts.low_stock_case({
+                pk: stock < min_stock for pk, (stock, min_stock, _) in stocks.items()
+            }),
+        )
+        alerts.record_crossings(
+            (pk, low_stock, stock < min_stock, stock, min_stock)
+            for pk, (stock, min_stock, low_stock) in stocks.items()
+        )
+
+    ledger.record([
+        StockMovement(
+            product_id=line['product_id'],
+            product_format_id=line['product_format_id'],
+            order_id=line['order_id'],
+            quantity=line['total'],
+            reason=StockMovement.CANCEL,
+        )
+        for line in lines
+    ])
+    return list(totals)
+
+
+@transaction.atomic
+def transition_orders(order_ids, new_status, user=None):
+    """
+    Change le statut de nombreuses commandes en une transaction
+
+    Les commandes sont verrouillées et modifiées par lots, par UPDATE
+    ensembliste ; seules les transitions de ``ORDER_TRANSITIONS`` sont
+    appliquées. Une annulation rend le stock (``_restore_stock``) et retire
+    les commandes des ventes journalières. Les UPDATE ne déclenchant pas
+    ``post_save``, le journal de synchronisation est tenu ici.
+
+    Args:
+        order_ids (list): Identifiants des commandes
+        new_status (str): Statut cible
+        user (User): Limite aux commandes de cet utilisateur (None : toutes)
+
+    Returns:
+        list: Un résultat par identifiant, dans l'ordre reçu (``updated``,
+        ``unchanged``, ``not_found`` ou ``invalid``)
+
+    Raises:
+        ValueError: Statut cible inconnu ou identifiant non entier
+    """
+    if new_status not in ORDER_TRANSITIONS:
+        raise ValueError(f"Statut inconnu : {new_status}")
+    order_ids = list(OrderedDict.fromkeys(int(pk) for pk in order_ids))
+    sources = [status for status, targets in ORDER_TRANSITIONS.items() if new_status in targets]
+
+    results = {}
+    moved = []
+    for batch in _batches(order_ids, ORDER_TRANSITION_BATCH_SIZE):
+        orders = Order.objects.select_for_update().filter(pk__in=batch)
+        if user is not None:
+            orders = orders.filter(user=user)
+        current = {pk: (status, user_id) for pk, status, user_id in orders.values_list('pk', 'status', 'user_id')}
+
+        eligible = []
+        for pk in batch:
+            if pk not in current:
+                results[pk] = {'id': pk, 'status': 'not_found'}
+            elif current[pk][0] == new_status:
+                results[pk] = {'id': pk, 'status': 'unchanged', 'order_status': new_status}
+            elif current[pk][0] not in sources:
+                results[pk] = {
+                    'id': pk,
+                    'status': 'invalid',
+                    'order_status': current[pk][0],
+                    'error': f"Transition {current[pk][0]} -> {new_status} interdite",
+                }
+            else:
+                eligible.append(pk)
+        if not eligible:
+            continue
+
+        updated = Order.objects.filter(pk__in=eligible, status__in=sources).update(
+            status=new_status, updated_at=timezone.now()
+        )
+        if updated != len(eligible):
+            # Les lignes sont verrouillées : un écart signale une écriture concurrente
+            raise DatabaseError('Statut modifié pendant la transition, opération annulée')
+        for pk in eligible:
+            results[pk] = {'id': pk, 'status': 'updated', 'from': current[pk][0], 'order_status': new_status}
+        moved.extend(eligible)
+        sync.record_orders([(pk, current[pk][1]) for pk in eligible])
+
+    if moved and new_status == analytics.CANCELLED:
+        product_ids = _restore_stock(moved)
+        analytics.retract_orders(moved)
+        stock_changed.send(sender=Product, product_ids=product_ids)
+    return [results[pk] for pk in order_ids]
@@ -0,0 +1,243 @@
+# signals.py
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from . import analytics, images, inventory, search, sync
+from .cache import catalog_cache, catalog_versions
+from .models import Category, Supplier, ProductFormat, Product, Order, OrderItem, ChangeLog
+
+# Envoyé après une modification de stock qui ne passe pas par Model.save()
+# (UPDATE ensembliste). Arguments : product_ids et/ou format_ids
+stock_changed = Signal()
+
+# Envoyé par le worker quand des commandes passent en traitement, dans la
+# transaction de la tâche. Argument : order_ids
+order_processing = Signal()
+
+
+def invalidate_catalog(resource, pks=()):
+    """
+    Invalide le cache du catalogue et incrémente la version de la ressource
+    une fois la transaction validée
+
+    Args:
+        pks: Identifiants modifiés, ou None pour toute la ressource
+    """
+    pks = list(pks) if pks is not None else None
+
+    def invalidate():
+        catalog_cache.invalidate(resource, pks)
+        catalog_versions.bump(resource)
+
+    transaction.on_commit(invalidate)
+
+
+def _products_of_format(format_id):
+    through = Product.formats.through
+    return through.objects.filter(productformat_id=format_id).values_list('product_id', flat=True)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    invalidate_catalog('products', [instance.pk])
+
+
+@receiver(stock_changed)
+def product_stock_changed(sender, product_ids=(), format_ids=(), **kwargs):
+    product_ids = list(product_ids)
+    if format_ids:
+        through = Product.formats.through
+        product_ids.extend(
+            through.objects.filter(productformat_id__in=format_ids)
+            .values_list('product_id', flat=True).distinct()
+        )
+    invalidate_catalog('products', product_ids)
+
+
+@receiver(m2m_changed, sender=Product.formats.through)
+def product_formats_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            invalidate_catalog('products', [instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        invalidate_catalog('products', pk_set)
+    elif action == 'pre_clear':
+        invalidate_catalog('products', _products_of_format(instance.pk))
+
+
+@receiver(m2m_changed, sender=Product.formats.through)
+def create_product_skus(sender, instance, action, reverse, pk_set, **kwargs):
+    """Chaque format lié à un produit a sa déclinaison de stock (``ProductStock``)"""
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        inventory.create_skus((product_id, instance.pk) for product_id in sorted(pk_set))
+    else:
+        inventory.create_skus((instance.pk, format_id) for format_id in sorted(pk_set))
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def category_changed(sender, instance, **kwargs):
+    invalidate_catalog('categories', [instance.pk])
+    invalidate_catalog('products', instance.products.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Supplier)
+@receiver(pre_delete, sender=Supplier)
+def supplier_changed(sender, instance, **kwargs):
+    invalidate_catalog('suppliers', [instance.pk])
+    invalidate_catalog('products', instance.products.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=ProductFormat)
+@receiver(pre_delete, sender=ProductFormat)
+def product_format_changed(sender, instance, **kwargs):
+    invalidate_catalog('products', _products_of_format(instance.pk))
+
+
+# Index de recherche : réécrit dans la même transaction que la modification
+
+SEARCHED_PRODUCT_FIELDS = {'name', 'supplier', 'supplier_id', 'category', 'category_id'}
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and not SEARCHED_PRODUCT_FIELDS & set(update_fields)):
+        return
+    search.reindex([instance.pk])
+
+
+@receiver(m2m_changed, sender=Product.formats.through)
+def index_product_formats(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            search.reindex([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        search.reindex(pk_set)
+    elif action == 'pre_clear':
+        instance._search_product_ids = list(_products_of_format(instance.pk))
+    elif action == 'post_clear':
+        search.reindex(getattr(instance, '_search_product_ids', []))
+
+
+def _indexed_products(instance):
+    if isinstance(instance, ProductFormat):
+        return list(_products_of_format(instance.pk))
+    return list(instance.products.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Supplier)
+@receiver(post_save, sender=ProductFormat)
+def index_related_products(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        search.reindex(_indexed_products(instance))
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Supplier)
+@receiver(pre_delete, sender=ProductFormat)
+def remember_indexed_products(sender, instance, **kwargs):
+    # Les liens sont effacés par la suppression : on les relève avant
+    instance._search_product_ids = _indexed_products(instance)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_delete, sender=ProductFormat)
+def reindex_orphaned_products(sender, instance, **kwargs):
+    search.reindex(getattr(instance, '_search_product_ids', []))
+
+
+@receiver(post_save, sender=Product)
+def schedule_image_variants(sender, instance, raw=False, **kwargs):
+    # Après validation : le rendu ne doit pas retenir la transaction
+    if not raw and getattr(instance, '_image_changed', False):
+        transaction.on_commit(partial(images.schedule, instance.pk))
+
+
+# Ventes journalières : une annulation (ou sa levée) enregistrée par save()
+# retire (ou rajoute) les articles de la commande
+
+@receiver(post_save, sender=Order)
+def order_status_changed(sender, instance, created=False, raw=False, **kwargs):
+    previous = getattr(instance, '_recorded_status', None)
+    instance._recorded_status = instance.status
+    if created or raw or previous is None:
+        return
+    was_cancelled = previous == analytics.CANCELLED
+    if was_cancelled != (instance.status == analytics.CANCELLED):
+        analytics.record_orders([instance.pk], sign=1 if was_cancelled else -1)
+
+
+@receiver(post_save, sender=OrderItem)
+def order_item_created(sender, instance, created=False, raw=False, **kwargs):
+    # Les commandes de l'API sont insérées par bulk_create et comptées par place_order
+    if created and not raw and instance.order.status != analytics.CANCELLED:
+        analytics.record([(
+            analytics.sales_day(instance.order.created_at),
+            instance.product_id,
+            instance.product_format_id,
+            instance.quantity,
+            instance.unit_price,
+        )])
+
+
+# Journal de synchronisation (/api/sync/) : écrit dans la transaction de la modification
+
+SYNCED_MODELS = {
+    Product: 'products',
+    Category: 'categories',
+    Supplier: 'suppliers',
+    ProductFormat: 'formats',
+}
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Supplier)
+@receiver(post_save, sender=ProductFormat)
+def log_catalog_change(sender, instance, **kwargs):
+    sync.record(SYNCED_MODELS[sender], [instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_delete, sender=ProductFormat)
+def log_catalog_deletion(sender, instance, **kwargs):
+    sync.record(SYNCED_MODELS[sender], [instance.pk], ChangeLog.DELETE)
+    # Clés mises à NULL et liens de formats effacés sans save() sur les produits
+    sync.record('products', getattr(instance, '_search_product_ids', []))
+
+
+@receiver(m2m_changed, sender=Product.formats.through)
+def log_product_formats(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            sync.record('products', [instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        sync.record('products', pk_set)
+    elif action == 'post_clear':
+        sync.record('products', getattr(instance, '_search_product_ids', []))
+
+
+@receiver(stock_changed)
+def log_stock_change(sender, product_ids=(), format_ids=(), **kwargs):
+    sync.record('products', product_ids)
+    sync.record('formats', format_ids)
+
+
+@receiver(post_save, sender=Order)
+def log_order_change(sender, instance, **kwargs):
+    sync.record_orders([(instance.pk, instance.user_id)])
+
+
+@receiver(post_delete, sender=Order)
+def log_order_deletion(sender, instance, **kwargs):
+    sync.record_orders([(instance.pk, instance.user_id)], ChangeLog.DELETE)
@@ -0,0 +1,156 @@
+# snapshots.py
+import gzip
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import catalog_versions
+from .fieldsets import Fieldset, FlatRows
+from .models import Category, Product, ProductFormat, Supplier
+from .serializers import (
+    CategorySerializer, ProductFormatSerializer, ProductSerializer, SupplierSerializer
+)
+
+SNAPSHOT_RESOURCES = ('products', 'categories', 'suppliers')
+SNAPSHOT_PREFIX = 'catalog-'
+SNAPSHOT_SUFFIX = '.json.gz'
+SNAPSHOT_CHUNK_SIZE = 1000
+
+_build_lock = threading.Lock()
+_accepts_gzip = re.compile(r'\bgzip\b')
+
+
+def snapshot_dir():
+    return Path(getattr(settings, 'DISTRIBUTEUR_SNAPSHOT_DIR', settings.BASE_DIR / 'catalog_snapshots'))
+
+
+def current_stamp():
+    """
+    Version du catalogue complet, tirée des tampons des ressources
+
+    Les formats invalident la ressource ``products`` : ils sont couverts. La
+    date de modification distingue deux bases dont les compteurs coïncident.
+
+    Returns:
+        tuple: (version ``p<n>-c<n>-s<n>-<horodatage>``, date de dernière modification)
+    """
+    stamps = [catalog_versions.current(resource) for resource in SNAPSHOT_RESOURCES]
+    updated_at = max(updated_at for _, updated_at in stamps)
+    version = '-'.join(
+        f'{resource[0]}{number}' for resource, (number, _) in zip(SNAPSHOT_RESOURCES, stamps)
+    )
+    return f'{version}-{int(updated_at.timestamp())}', updated_at
+
+
+def snapshot_path(version):
+    return snapshot_dir() / f'{SNAPSHOT_PREFIX}{version}{SNAPSHOT_SUFFIX}'
+
+
+def _by_id(serializer, model):
+    flat = FlatRows(serializer, Fieldset(), model, None)
+    rows = flat.render(flat.values(model.objects.order_by('pk')))
+    return {row['id']: row for row in rows}
+
+
+def _products():
+    flat = FlatRows(ProductSerializer(), Fieldset(), Product, None)
+    rows = flat.values(Product.objects.order_by('pk'))
+    last_id = 0
+    while True:
+        chunk = list(rows.filter(pk__gt=last_id)[:SNAPSHOT_CHUNK_SIZE])
+        if not chunk:
+            return
+        yield from flat.render(chunk)
+        last_id = chunk[-1]['id']
+
+
+def write_snapshot(stream, version):
+    """
+    Écrit le catalogue normalisé en JSON
+
+    Les produits portent les identifiants de leur fournisseur, catégorie et
+    formats ; chacun de ces objets n'apparaît qu'une fois, dans son
+    dictionnaire. Les produits sont lus et écrits par tranches.
+    """
+    encode = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    header = {
+        'version': version,
+        'generated_at': timezone.now(),
+        'suppliers': _by_id(SupplierSerializer(), Supplier),
+        'categories': _by_id(CategorySerializer(), Category),
+        'formats': _by_id(ProductFormatSerializer(), ProductFormat),
+    }
+    stream.write(encode(header)[:-1].encode())
+    stream.write(b',"products":[')
+    for index, product in enumerate(_products()):
+        if index:
+            stream.write(b',')
+        stream.write(encode(product).encode())
+    stream.write(b']}')
+
+
+def build(version=None):
+    """
+    Construit le fichier compressé d'une version et efface les précédents
+
+    Lecture en une transaction, écriture dans un fichier temporaire renommé
+    une fois complet : un lecteur ne voit jamais de fichier partiel.
+
+    Returns:
+        Path: Chemin du fichier
+    """
+    if version is None:
+        version, _ = current_stamp()
+    directory = snapshot_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = snapshot_path(version)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb') as stream:
+            with transaction.atomic():
+                write_snapshot(stream, version)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+    for stale in directory.glob(f'{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}'):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return path
+
+
+def current():
+    """
+    Fichier du catalogue à jour, construit au premier appel après un changement
+
+    Returns:
+        tuple: (chemin, version, date de dernière modification)
+    """
+    version, updated_at = current_stamp()
+    path = snapshot_path(version)
+    if not path.exists():
+        with _build_lock:
+            if not path.exists():
+                build(version)
+    return path, version, updated_at
+
+
+def accepts_gzip(request):
+    return bool(_accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+
+
+def decompressed(path, chunk_size=64 * 1024):
+    """Contenu décompressé à la volée, pour les clients sans gzip"""
+    with gzip.open(path, 'rb') as stream:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
@@ -0,0 +1,151 @@
+# sync.py
+from django.db.models import Exists, Max, OuterRef, Q
+
+from .fieldsets import Fieldset, FlatRows
+from .models import Category, ChangeLog, Order, OrderItem, Product, ProductFormat, Supplier
+from .serializers import (
+    CategorySerializer, OrderSerializer, ProductFormatSerializer, ProductSerializer,
+    SupplierSerializer
+)
+
+SYNC_PAGE_SIZE = 1000
+ORDERS = 'orders'
+# Ressource : (modèle, sérialiseur dont les colonnes sont émises)
+RESOURCES = {
+    'products': (Product, ProductSerializer),
+    'categories': (Category, CategorySerializer),
+    'suppliers': (Supplier, SupplierSerializer),
+    'formats': (ProductFormat, ProductFormatSerializer),
+    ORDERS: (Order, OrderSerializer),
+}
+ORDER_ITEM_COLUMNS = ('id', 'order', 'product', 'product_format', 'quantity', 'unit_price')
+
+
+def record(resource, pks, action=ChangeLog.UPSERT, user_id=None):
+    """Ajoute une entrée par objet au journal, en une seule insertion"""
+    entries = [
+        ChangeLog(resource=resource, object_id=pk, action=action, user_id=user_id)
+        for pk in dict.fromkeys(pks)
+    ]
+    if entries:
+        ChangeLog.objects.bulk_create(entries)
+
+
+def record_orders(orders, action=ChangeLog.UPSERT):
+    """
+    Args:
+        orders: Itérable de ``(order_id, user_id)``
+    """
+    entries = [
+        ChangeLog(resource=ORDERS, object_id=pk, action=action, user_id=user_id)
+        for pk, user_id in orders
+    ]
+    if entries:
+        ChangeLog.objects.bulk_create(entries)
+
+
+def parse_token(value):
+    """
+    Raises:
+        ValueError: Si le jeton n'est pas un entier positif
+    """
+    if value in (None, ''):
+        return 0
+    token = int(value)
+    if token < 0:
+        raise ValueError(token)
+    return token
+
+
+def _order_items(order_ids):
+    items = {pk: [] for pk in order_ids}
+    rows = (
+        OrderItem.objects.filter(order_id__in=order_ids)
+        .order_by('id')
+        .values(*ORDER_ITEM_COLUMNS)
+    )
+    for row in rows:
+        row['unit_price'] = str(row['unit_price'])
+        items[row['order']].append(row)
+    return items
+
+
+def _rows(resource, pks, user, request):
+    model, serializer_class = RESOURCES[resource]
+    queryset = model.objects.filter(pk__in=pks).order_by('pk')
+    if resource == ORDERS:
+        queryset = queryset.filter(user=user)
+    flat = FlatRows(serializer_class(), Fieldset(), model, request)
+    rows = flat.render(flat.values(queryset))
+    if resource == ORDERS and rows:
+        items = _order_items([row['id'] for row in rows])
+        for row in rows:
+            row['items'] = items[row['id']]
+    return rows
+
+
+def changes(user, since=0, limit=SYNC_PAGE_SIZE, request=None):
+    """
+    Modifications postérieures au jeton ``since``, par ressource
+
+    Seule la dernière entrée de chaque objet compte : un objet modifié puis
+    supprimé n'apparaît que dans ``deleted``. Les lignes modifiées sont
+    relues dans leur état courant, au format du mode ``?flat=1``. Le jeton
+    renvoyé est borné par le dernier identifiant lu au début de l'appel :
+    une entrée écrite pendant la lecture sera servie au prochain appel.
+
+    Returns:
+        dict: ``{'token', 'has_more', 'changes': {ressource: {'upserted', 'deleted'}}}``
+    """
+    latest_id = ChangeLog.objects.aggregate(last=Max('id'))['last'] or 0
+    scope = ~Q(resource=ORDERS)
+    if user.is_authenticated:
+        scope |= Q(resource=ORDERS, user=user)
+    entries = list(
+        ChangeLog.objects.filter(scope, id__gt=since, id__lte=latest_id)
+        .order_by('id')
+        .values_list('id', 'resource', 'object_id', 'action')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    token = entries[-1][0] if has_more else max(since, latest_id)
+
+    actions = {}
+    for _, resource, object_id, action in entries:
+        actions[(resource, object_id)] = action
+    upserted = {resource: [] for resource in RESOURCES}
+    deleted = {resource: set() for resource in RESOURCES}
+    for (resource, pk), action in actions.items():
+        if resource not in RESOURCES:
+            continue
+        if action == ChangeLog.DELETE:
+            deleted[resource].add(pk)
+        else:
+            upserted[resource].append(pk)
+
+    result = {}
+    for resource, pks in upserted.items():
+        rows = _rows(resource, pks, user, request) if pks else []
+        # Objet supprimé depuis son entrée de modification
+        deleted[resource].update(set(pks) - {row['id'] for row in rows})
+        result[resource] = {'upserted': rows, 'deleted': sorted(deleted[resource])}
+    return {'token': str(token), 'has_more': has_more, 'changes': result}
+
+
+def compact():
+    """
+    Supprime les entrées remplacées par une entrée plus récente du même objet
+
+    Un client synchronise toujours l'état final : seule la dernière entrée
+    de chaque objet est utile, quel que soit son jeton.
+
+    Returns:
+        int: Nombre d'entrées supprimées
+    """
+    newer = ChangeLog.objects.filter(
+        resource=OuterRef('resource'),
+        object_id=OuterRef('object_id'),
+        id__gt=OuterRef('id'),
+    )
+    deleted, _ = ChangeLog.objects.filter(Exists(newer)).delete()
+    return deleted
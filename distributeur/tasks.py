@@ -0,0 +1,30 @@
+# tasks.py
+from django.utils import timezone
+
+from . import jobs, sync
+from .models import Order
+from .signals import order_processing
+
+PROCESS_ORDERS = 'orders.process'
+
+
+@jobs.task(PROCESS_ORDERS, batch=True)
+def process_orders(payloads):
+    """
+    Passe en ``processing`` les commandes en attente d'un lot, en un UPDATE
+
+    Les traitements en aval (notifications, facturation...) s'abonnent au
+    signal ``order_processing`` : s'ils échouent, la transition est annulée
+    et les tâches replanifiées.
+    """
+    order_ids = {payload['order_id'] for payload in payloads}
+    pending = Order.objects.filter(pk__in=order_ids, status='pending')
+    rows = list(pending.values_list('pk', 'user_id'))
+    moved = [pk for pk, _ in rows]
+    if moved:
+        Order.objects.filter(pk__in=moved, status='pending').update(
+            status='processing', updated_at=timezone.now()
+        )
+        sync.record_orders(rows)
+        order_processing.send(sender=Order, order_ids=moved)
+    return moved
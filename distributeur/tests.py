@@ -1,3 +1,1656 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connections, router
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework.utils.encoders import JSONEncoder
+
+from . import db, images, inventory, jobs, ledger, loadtest, perf, routers, search, seeding, sync
+from .cache import catalog_cache
+from .models import (
+    Category, Supplier, ProductFormat, Product, ProductStock, Order, OrderItem, StockReservation,
+    LowStockEvent, Job, DailySales, ChangeLog, CatalogVersion, StockMovement
+)
+from .services import adjust_stock
+
+
+def seed_catalog(products=50, orders=10, items_per_order=3, formats_per_product=3, seed=42):
+    """
+    Peuple la base avec un catalogue et des commandes, en insertions groupées
+
+    Returns:
+        User: Propriétaire des commandes créées
+    """
+    seeded = seeding.seed_catalog(
+        products=products,
+        orders=orders,
+        items_per_order=items_per_order,
+        formats_per_product=formats_per_product,
+        username='bench',
+        password='bench',
+        seed=seed,
+    )
+    return seeded['users'][0]
+
+
+# Bancs d'essai, lancés seulement avec BENCH=1 : manage.py test distributeur --tag benchmark
+benchmark = skipUnless(os.environ.get('BENCH'), "banc d'essai (BENCH=1 pour le lancer)")
+
+
+@override_settings(DISTRIBUTEUR_SLOW_REQUEST_LOG=None)
+class DistributeurTestCase(TestCase):
+    """Client authentifié et cache du catalogue vidé entre chaque test"""
+
+    def setUp(self):
+        catalog_cache.cache.clear()
+        catalog_cache.reset_stats()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class QueryBudgetTests(DistributeurTestCase):
+    """Le nombre de requêtes SQL par endpoint ne doit pas dépendre du volume"""
+
+    # Les endpoints du catalogue lisent en plus leur tampon de version (cache froid)
+    BUDGETS = {
+        '/api/categories/': 2,
+        '/api/suppliers/': 2,
+        '/api/products/': 3,
+        '/api/products/low_stock/': 2,
+        '/api/orders/': 3,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_catalog(products=60, orders=15)
+
+    def test_list_endpoints(self):
+        for url, budget in self.BUDGETS.items():
+            with self.subTest(url=url), self.assertNumQueries(budget):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_detail_endpoints(self):
+        product = Product.objects.first()
+        order = Order.objects.first()
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(f'/api/products/{product.pk}/').status_code, 200)
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get(f'/api/orders/{order.pk}/').status_code, 200)
+
+    def test_budget_independent_of_volume(self):
+        Product.objects.bulk_create(
+            Product(name=f'Extra {i}', price=Decimal('1.00'), stock=1)
+            for i in range(Product.objects.count())
+        )
+        with self.assertNumQueries(self.BUDGETS['/api/products/']):
+            self.client.get('/api/products/')
+
+    def test_order_creation(self):
+        products = list(Product.objects.prefetch_related('formats').filter(stock__gte=5)[:8])
+        items = [
+            {
+                'product_id': product.id,
+                'product_format_id': product.formats.all()[0].id,
+                'quantity': 1,
+            }
+            for product in products
+        ]
+        # savepoint, verrouillage, déclinaisons, update des déclinaisons puis
+        # des totaux, commande, articles, ventes journalières (insertion,
+        # incrément), journal, mise en file du traitement, journal de
+        # synchronisation (commande, produits), puis relecture
+        with self.assertNumQueries(17):
+            response = self.client.post('/api/orders/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['items']), len(items))
+
+
+@benchmark
+@tag('benchmark')
+class EndpointLatencyBenchmark(DistributeurTestCase):
+    """
+    Latence p95 par endpoint sur un jeu de données volumineux
+
+    Lancé seulement avec ``BENCH=1`` (``manage.py test distributeur --tag
+    benchmark``). Le volume est réglable via ``BENCH_PRODUCTS`` et
+    ``BENCH_ORDERS``.
+    """
+
+    PRODUCTS = int(os.environ.get('BENCH_PRODUCTS', 2000))
+    ORDERS = int(os.environ.get('BENCH_ORDERS', 500))
+    ROUNDS = int(os.environ.get('BENCH_ROUNDS', 20))
+    # Budgets p95 en millisecondes : environ 2,5 fois le p95 mesuré sur le
+    # volume par défaut (10, 8, 38, 200 et 28 ms)
+    P95_BUDGETS = {
+        '/api/categories/': 25,
+        '/api/suppliers/': 20,
+        '/api/products/': 100,
+        '/api/orders/': 500,
+        '/api/products/search/?q=produit 1234': 75,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_catalog(products=cls.PRODUCTS, orders=cls.ORDERS)
+        search.reindex()
+
+    def measure(self, url):
+        timings = []
+        for _ in range(self.ROUNDS):
+            # Mesure du chemin complet (requêtes et sérialisation), hors cache
+            catalog_cache.cache.clear()
+            start = time.perf_counter()
+            response = self.client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+            self.assertEqual(response.status_code, 200)
+        timings.sort()
+        return timings[int(0.95 * (len(timings) - 1))]
+
+    def test_p95_latency(self):
+        for url, budget in self.P95_BUDGETS.items():
+            with self.subTest(url=url):
+                p95 = self.measure(url)
+                self.assertLess(p95, budget, f'{url}: p95 {p95:.1f} ms > {budget} ms')
+
+
+class PaginationTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_catalog(products=30, orders=12)
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 7)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_cursor_walks_every_row_once(self):
+        product_ids = self.walk('/api/products/?page_size=7')
+        self.assertEqual(product_ids, sorted(Product.objects.values_list('id', flat=True)))
+        order_ids = self.walk('/api/orders/?page_size=7')
+        self.assertEqual(
+            order_ids,
+            list(Order.objects.order_by('-created_at', '-id').values_list('id', flat=True)),
+        )
+
+    def test_page_size_is_capped(self):
+        with self.settings(DISTRIBUTEUR_MAX_PAGE_SIZE=5):
+            response = self.client.get('/api/products/?page_size=100000')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_offset_mode_is_staff_only(self):
+        response = self.client.get('/api/products/?pagination=offset&limit=5&offset=10')
+        self.assertNotIn('count', response.data)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/api/products/?pagination=offset&limit=5&offset=10')
+        self.assertEqual(response.data['count'], 30)
+        self.assertEqual(len(response.data['results']), 5)
+
+
+class CatalogCacheTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_catalog(products=10, orders=2)
+
+    def test_list_and_detail_are_served_from_cache(self):
+        product = Product.objects.first()
+        for url in ('/api/products/', f'/api/products/{product.pk}/', '/api/categories/'):
+            with self.subTest(url=url):
+                self.client.get(url)
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+        stats = catalog_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (3, 3))
+
+    def test_query_params_are_part_of_the_key(self):
+        self.client.get('/api/products/?page_size=2')
+        response = self.client.get('/api/products/?page_size=3')
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_save_invalidates_list_and_own_detail_only(self):
+        first, second = Product.objects.all()[:2]
+        urls = ['/api/products/', f'/api/products/{first.pk}/', f'/api/products/{second.pk}/']
+        for url in urls:
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.reduce_stock(1, first.skus.filter(stock__gte=1).first().product_format)
+
+        self.assertEqual(self.client.get(urls[1]).data['stock'], first.stock)
+        with self.assertNumQueries(0):
+            self.client.get(urls[2])
+        self.assertEqual(catalog_cache.stats()['invalidations'], 2)
+
+    def test_related_changes_invalidate_products(self):
+        product = Product.objects.select_related('supplier').first()
+        url = f'/api/products/{product.pk}/'
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            product.supplier.name = 'Renommé'
+            product.supplier.save()
+        self.assertEqual(self.client.get(url).data['supplier']['name'], 'Renommé')
+
+        product_format = product.formats.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            product_format.volume = '33cl'
+            product_format.save()
+        volumes = [f['volume'] for f in self.client.get(url).data['formats']]
+        self.assertIn('33cl', volumes)
+
+    def test_order_placement_invalidates_stock(self):
+        product = Product.objects.filter(stock__gte=1).prefetch_related('formats').first()
+        url = f'/api/products/{product.pk}/'
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/orders/', {'items': [{
+                'product_id': product.pk,
+                'product_format_id': product.formats.all()[0].pk,
+                'quantity': 1,
+            }]}, format='json')
+        self.assertEqual(self.client.get(url).data['stock'], product.stock - 1)
+
+    def test_stats_endpoint_is_admin_only(self):
+        self.assertEqual(self.client.get('/api/catalog/cache/').status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/api/catalog/cache/')
+        self.assertEqual(set(response.data), {'backend', 'hits', 'misses', 'invalidations', 'hit_ratio'})
+
+
+class ConditionalGetTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_catalog(products=10, orders=2)
+
+    def test_etag_round_trip(self):
+        response = self.client.get('/api/products/')
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        other = self.client.get('/api/products/?page_size=2')
+        self.assertNotEqual(other['ETag'], etag)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get('/api/categories/')['Last-Modified']
+        response = self.client.get('/api/categories/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_change_bumps_version(self):
+        etag = self.client.get('/api/categories/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(name='Nouvelle')
+        response = self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # Les produits embarquent leur catégorie
+        product = Product.objects.select_related('category').first()
+        etag = self.client.get('/api/products/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            product.category.save()
+        self.assertEqual(
+            self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+
+class BulkStockTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_catalog(products=600, orders=0)
+        cls.user.is_staff = True
+        cls.user.save()
+
+    def test_absolute_update_runs_in_batches(self):
+        skus = {}
+        for product_id, format_id in ProductStock.objects.order_by('pk').values_list('product_id', 'product_format_id'):
+            skus.setdefault(product_id, format_id)
+        body = {'products': [
+            {'id': product_id, 'product_format_id': format_id, 'stock': 7}
+            for product_id, format_id in skus.items()
+        ]}
+        with self.assertNumQueries(20):
+            # savepoint, puis pour chacun des deux lots de 300 : verrou des
+            # produits et des déclinaisons, UPDATE des déclinaisons et des
+            # totaux, journal, alertes ; enfin journal de synchronisation (les
+            # insertions sont découpées par la limite de paramètres de SQLite)
+            response = self.client.post('/api/products/bulk_stock/', body, format='json')
+        self.assertEqual(response.data['updated'], 600)
+        updated = ProductStock.objects.filter(inventory.sku_filter(skus.items()))
+        self.assertEqual(set(updated.values_list('stock', flat=True)), {7})
+        self.assertEqual(inventory.drift(), [])
+
+    def test_delta_reports_rows_it_cannot_apply(self):
+        low = ProductStock.objects.order_by('pk')[0]
+        high = ProductStock.objects.filter(stock__gte=2).exclude(product=low.product_id).order_by('pk')[0]
+        body = {
+            'mode': 'delta',
+            'products': [
+                {'id': low.product_id, 'product_format_id': low.product_format_id, 'delta': -(low.stock + 1)},
+                {'id': high.product_id, 'product_format_id': high.product_format_id, 'delta': -2},
+                {'id': 0, 'delta': 1},
+                {'id': high.product_id, 'delta': 1},
+            ],
+        }
+        total = Product.objects.get(pk=high.product_id).stock
+        response = self.client.post('/api/products/bulk_stock/', body, format='json')
+        statuses = [row['status'] for row in response.data['products']]
+        self.assertEqual(statuses, ['insufficient_stock', 'updated', 'not_found', 'invalid'])
+        self.assertEqual(response.data['products'][1]['product_stock'], total - 2)
+        high.refresh_from_db()
+        self.assertEqual(high.stock, response.data['products'][1]['stock'])
+        self.assertEqual(inventory.drift(), [])
+
+        body = {'mode': 'delta', 'formats': [{'id': high.product_format_id, 'delta': 3}]}
+        self.assertEqual(self.client.post('/api/products/bulk_stock/', body, format='json').status_code, 400)
+
+    def test_staff_only(self):
+        sku = ProductStock.objects.order_by('pk')[0]
+        self.client.force_authenticate(User.objects.create_user('client'))
+        body = {'products': [{'id': sku.product_id, 'product_format_id': sku.product_format_id, 'stock': 0}]}
+        self.assertEqual(self.client.post('/api/products/bulk_stock/', body, format='json').status_code, 403)
+        self.assertEqual(ProductStock.objects.get(pk=sku.pk).stock, sku.stock)
+
+
+class OrderExportTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_catalog(products=20, orders=5)
+
+    def test_streams_flat_rows(self):
+        response = self.client.get('/api/orders/export/?output=ndjson&status=pending')
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), OrderItem.objects.count())
+        self.assertIn('product_format_name', json.loads(lines[0]))
+
+    def test_csv_and_filters(self):
+        response = self.client.get('/api/orders/export/?output=csv&until=2000-01-01')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+        self.assertEqual(self.client.get('/api/orders/export/?since=hier').status_code, 400)
+
+
+class CatalogImportTests(DistributeurTestCase):
+    CSV = (
+        'reference,name,supplier,category,price,stock,formats\n'
+        'R1,Jus,Fourn A,Boissons,1.50,10,Canette:33cl;Bouteille:1L\n'
+        'R2,Eau,Fourn A,Boissons,0.80,5,Bouteille:1L\n'
+        'R3,,Fourn B,,1,1,\n'
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('admin', password='admin', is_staff=True)
+
+    def upload(self, content, name='catalogue.csv'):
+        upload = SimpleUploadedFile(name, content.encode())
+        return self.client.post('/api/products/import/', {'file': upload}, format='multipart')
+
+    def test_upsert_and_format_links(self):
+        report = self.upload(self.CSV).data
+        self.assertEqual((report['created'], report['updated'], report['failed']), (2, 0, 1))
+        self.assertEqual(report['errors'][0]['line'], 4)
+        self.assertEqual(Product.objects.get(reference='R1').formats.count(), 2)
+
+        report = self.upload('{"reference": "R1", "name": "Jus", "supplier": "Fourn A", '
+                             '"price": "2", "formats": ["Canette:33cl"]}\n', 'maj.ndjson').data
+        self.assertEqual((report['created'], report['updated']), (0, 1))
+        product = Product.objects.get(reference='R1')
+        self.assertEqual(product.price, Decimal('2'))
+        self.assertEqual([f.volume for f in product.formats.all()], ['33cl'])
+        self.assertEqual(ProductFormat.objects.count(), 2)
+
+    def test_new_products_raise_only_real_alerts(self):
+        self.upload('reference,name,supplier,price,stock,min_stock,formats\n'
+                    'R1,Jus,Fourn A,1.50,100,10,Canette:33cl\n'
+                    'R2,Eau,Fourn A,0.80,,10,\n')
+        stocked, empty = Product.objects.get(reference='R1'), Product.objects.get(reference='R2')
+        self.assertEqual((stocked.low_stock, empty.low_stock), (False, True))
+        self.assertFalse(LowStockEvent.objects.filter(product=stocked).exists())
+        self.assertEqual(
+            list(LowStockEvent.objects.filter(product=empty).values_list('direction', flat=True)),
+            [LowStockEvent.BELOW]
+        )
+
+    def test_dropped_formats_leave_stock(self):
+        self.upload('reference,name,supplier,price,stock,formats\n'
+                    'R1,Jus,Fourn A,1.50,10,Bouteille:1L;Canette:33cl\n')
+        bottle = ProductFormat.objects.get(name='Bouteille')
+        self.upload('reference,name,supplier,price,formats\nR1,Jus,Fourn A,1.50,Canette:33cl\n')
+
+        product = Product.objects.get(reference='R1')
+        self.assertEqual((product.stock, product.reserved), (0, 0))
+        self.assertFalse(ProductStock.objects.filter(product=product, product_format=bottle).exists())
+        self.assertEqual(inventory.drift(), [])
+        movement = StockMovement.objects.filter(product=product).latest('id')
+        self.assertEqual((movement.product_format_id, movement.quantity, movement.reason),
+                         (bottle.pk, -10, StockMovement.ADJUSTMENT))
+
+
+class StockLedgerTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('magasin', password='magasin', is_staff=True)
+        cls.format = ProductFormat.objects.create(name='Canette', volume='33cl', price=1)
+
+    def create_product(self, stock):
+        product = Product.objects.create(name='Soda', price=Decimal('2.00'), stock=stock)
+        product.formats.add(self.format)
+        return product
+
+    def test_every_stock_path_is_journaled(self):
+        from . import ledger
+        product = self.create_product(20)
+        self.client.post('/api/orders/', {'items': [{'product_id': product.pk, 'quantity': 3}]}, format='json')
+        self.client.post('/api/products/bulk_stock/', {
+            'mode': 'delta', 'products': [{'id': product.pk, 'delta': 5}],
+        }, format='json')
+        self.client.post(f'/api/products/{product.pk}/update_stock/', {'stock': 30}, format='json')
+        product.refresh_from_db()
+        product.reduce_stock(2)
+        product.restore_stock(1)
+
+        reasons = list(product.stock_movements.order_by('id').values_list('reason', 'quantity'))
+        self.assertEqual(reasons, [
+            ('adjustment', 20), ('order', -3), ('restock', 5),
+            ('adjustment', 8), ('order', -2), ('cancel', 1),
+        ])
+        self.assertEqual(ledger.ledger_stock([product.pk]), {product.pk: 29})
+        self.assertEqual(ledger.drift(), [])
+
+    def test_compaction_and_stock_at(self):
+        from . import ledger
+        product = self.create_product(10)
+        before = timezone.now()
+        product.reduce_stock(4)
+
+        report = ledger.compact()
+        self.assertEqual((report['movements'], report['products']), (2, 1))
+        self.assertEqual(product.stock_snapshot.stock, 6)
+        self.assertEqual(ledger.compact()['movements'], 0)
+
+        product.restore_stock(2)
+        self.assertEqual(ledger.ledger_stock([product.pk]), {product.pk: 8})
+        self.assertEqual(ledger.stock_at([product.pk], before), {product.pk: 10})
+
+        response = self.client.get(f'/api/products/{product.pk}/stock_history/', {'at': before.isoformat()})
+        self.assertEqual((response.data['ledger_stock'], response.data['stock_at']), (8, 10))
+        self.assertEqual(len(response.data['results']), 3)
+
+
+class OrderPlacementTests(DistributeurTestCase):
+    """Un panier refusé ne touche ni au stock, ni aux réservations"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('acheteur', password='acheteur')
+        cls.can = ProductFormat.objects.create(name='Canette', volume='33cl', price=1)
+        cls.bottle = ProductFormat.objects.create(name='Bouteille', volume='1L', price=1)
+        cls.soda = Product.objects.create(name='Soda', price=Decimal('2.00'), stock=10)
+        cls.soda.formats.add(cls.can, cls.bottle)
+        cls.water = Product.objects.create(name='Eau', price=Decimal('1.00'), stock=5)
+        cls.water.formats.add(cls.bottle)
+
+    def setUp(self):
+        super().setUp()
+        line = {'product_id': self.soda.pk, 'product_format_id': self.can.pk, 'quantity': 2}
+        self.reservation_id = self.client.post('/api/reservations/', {'items': [line]}, format='json').data[0]['id']
+
+    def state(self):
+        return (
+            list(ProductStock.objects.order_by('pk').values_list('stock', 'reserved')),
+            list(Product.objects.order_by('pk').values_list('stock', 'reserved')),
+            list(StockReservation.objects.values_list('pk', 'status')),
+            Order.objects.count(),
+        )
+
+    def assertRejected(self, items, status_code):
+        before = self.state()
+        response = self.client.post(
+            '/api/orders/', {'items': items, 'reservation_ids': [self.reservation_id]}, format='json'
+        )
+        self.assertEqual(response.status_code, status_code)
+        self.assertEqual(self.state(), before)
+        return response
+
+    def test_insufficient_sku_stock(self):
+        response = self.assertRejected(
+            [{'product_id': self.soda.pk, 'product_format_id': self.can.pk, 'quantity': 9}], 400
+        )
+        issue, = response.data['stock_issues']
+        self.assertEqual((issue['product_format_id'], issue['available_stock']), (self.can.pk, 10))
+
+    def test_unknown_product(self):
+        response = self.assertRejected([{'product_id': 0, 'quantity': 1}], 404)
+        self.assertEqual(response.data['stock_issues'], [{'product_id': 0, 'error': 'Produit non trouvé'}])
+
+    def test_unknown_format(self):
+        other = ProductFormat.objects.create(name='Fût', volume='30L', price=1)
+        response = self.assertRejected(
+            [{'product_id': self.water.pk, 'product_format_id': other.pk, 'quantity': 1}], 400
+        )
+        self.assertEqual(response.data['stock_issues'][0]['product_format_id'], other.pk)
+
+    def test_format_inferred_only_when_unique(self):
+        # Deux formats : le format doit être indiqué
+        self.assertRejected([{'product_id': self.soda.pk, 'quantity': 1}], 400)
+
+        line = {'product_id': self.water.pk, 'quantity': 2}
+        response = self.client.post('/api/orders/', {'items': [line]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['items'][0]['product_format'], self.bottle.pk)
+        sku = ProductStock.objects.get(product=self.water, product_format=self.bottle)
+        self.assertEqual(sku.stock, 3)
+        self.assertEqual(inventory.drift(), [])
+
+
+class StockReservationTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('panier', password='panier')
+        cls.other = User.objects.create_user('autre', password='autre')
+        product_format = ProductFormat.objects.create(name='Canette', volume='33cl', price=1)
+        cls.product = Product.objects.create(name='Soda', price=Decimal('2.00'), stock=10)
+        cls.product.formats.add(product_format)
+
+    def reserve(self, quantity, client=None, **extra):
+        body = {'items': [{'product_id': self.product.pk, 'quantity': quantity}], **extra}
+        return (client or self.client).post('/api/reservations/', body, format='json')
+
+    def test_holds_reduce_available_stock(self):
+        self.assertEqual(self.reserve(7).status_code, 201)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.reserved, self.product.available_stock), (7, 3))
+
+        other = APIClient()
+        other.force_authenticate(self.other)
+        response = other.post('/api/orders/', {'items': [{'product_id': self.product.pk, 'quantity': 4}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['stock_issues'][0]['available_stock'], 3)
+        self.assertEqual(self.reserve(4, client=other).status_code, 400)
+
+    def test_order_converts_holds(self):
+        reservation_id = self.reserve(7).data[0]['id']
+        response = self.client.post('/api/orders/', {
+            'items': [{'product_id': self.product.pk, 'quantity': 3}],
+            'reservation_ids': [reservation_id],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['items'][0]['quantity'], 10)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved), (0, 0))
+        self.assertEqual(StockReservation.objects.get().status, StockReservation.CONVERTED)
+
+        response = self.client.post('/api/orders/', {'reservation_ids': [reservation_id]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_release_and_reaper(self):
+        from datetime import timedelta
+        from .services import expire_reservations
+        first = self.reserve(2).data[0]['id']
+        self.reserve(3)
+        self.assertEqual(self.client.delete(f'/api/reservations/{first}/').status_code, 204)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 3)
+
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(expire_reservations(batch_size=10), 1)
+        self.assertEqual(expire_reservations(batch_size=10), 0)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 0)
+
+
+class LowStockAlertTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alerte', password='alerte', is_staff=True)
+        cls.supplier = Supplier.objects.create(name='Brasserie')
+        cls.product = Product.objects.create(
+            name='Bière', supplier=cls.supplier, price=Decimal('2.00'), stock=12, min_stock=10
+        )
+        cls.other = Product.objects.create(name='Eau', price=Decimal('1.00'), stock=3, min_stock=10)
+        bottle = ProductFormat.objects.create(name='Bouteille', volume='50cl', price=1)
+        cls.product.formats.add(bottle)
+        cls.other.formats.add(bottle)
+
+    def directions(self):
+        return list(LowStockEvent.objects.filter(product=self.product).values_list('direction', flat=True))
+
+    def test_flag_follows_orders_and_adjustments(self):
+        self.assertTrue(self.other.low_stock)
+        response = self.client.post('/api/orders/', {'items': [{'product_id': self.product.pk, 'quantity': 5}]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.product.refresh_from_db()
+        self.assertTrue(self.product.low_stock)
+
+        body = {'mode': 'delta', 'products': [{'id': self.product.pk, 'delta': 20}]}
+        self.client.post('/api/products/bulk_stock/', body, format='json')
+        self.product.refresh_from_db()
+        self.assertFalse(self.product.low_stock)
+
+        self.product.min_stock = 100
+        self.product.save(update_fields=['min_stock'])
+        self.assertTrue(Product.objects.get(pk=self.product.pk).low_stock)
+        self.assertEqual(self.directions(), [LowStockEvent.BELOW, LowStockEvent.RECOVERED, LowStockEvent.BELOW])
+
+    def test_low_stock_endpoints(self):
+        Product.objects.filter(pk=self.product.pk).update(stock=1, low_stock=True)
+        # validation du fournisseur filtré, produits, formats
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/products/low_stock/', {'supplier': self.supplier.pk})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.product.pk])
+        self.assertEqual(len(self.client.get('/api/products/low_stock/').data['results']), 2)
+
+        self.client.post('/api/products/bulk_stock/', {'products': [{'id': self.other.pk, 'stock': 50}]}, format='json')
+        events = self.client.get('/api/products/low_stock_events/').data['results']
+        # l'eau est créée sous son seuil, puis réapprovisionnée
+        self.assertEqual(
+            [(event['product'], event['direction']) for event in events],
+            [(self.other.pk, LowStockEvent.BELOW), (self.other.pk, LowStockEvent.RECOVERED)]
+        )
+        response = self.client.get('/api/products/low_stock_events/', {'since': events[-1]['id']})
+        self.assertEqual(response.data['results'], [])
+
+
+class ProductSearchTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('vendeur', password='vendeur')
+        brasserie = Supplier.objects.create(name='Brasserie du Nord')
+        desserts = Category.objects.create(name='Desserts')
+        cls.creme = Product.objects.create(name='Crème brûlée', category=desserts, price=Decimal('3.00'), stock=10)
+        cls.biere = Product.objects.create(name='Bière blonde', supplier=brasserie, price=Decimal('2.00'), stock=10)
+        cls.biere.formats.add(ProductFormat.objects.create(name='Canette', volume='33cl', price=1))
+        Product.objects.create(name='Eau minérale', price=Decimal('1.00'), stock=10)
+
+    def names(self, query):
+        response = self.client.get('/api/products/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.data['results']]
+
+    def test_prefix_and_accent_insensitive(self):
+        self.assertEqual(self.names('CREME bru'), ['Crème brûlée'])
+        self.assertEqual(self.names('bière'), ['Bière blonde'])
+        self.assertEqual(self.names('nord canet'), ['Bière blonde'])
+        self.assertEqual(self.names('dessert'), ['Crème brûlée'])
+        self.assertEqual(self.names('vin'), [])
+        self.assertEqual(self.client.get('/api/products/search/', {'q': ' "* '}).status_code, 400)
+
+    def test_index_follows_catalog_changes(self):
+        Supplier.objects.filter(name='Brasserie du Nord').get().delete()
+        self.assertEqual(self.names('nord'), [])
+        self.creme.name = 'Île flottante'
+        self.creme.save()
+        self.assertEqual(self.names('ile'), ['Île flottante'])
+        self.assertEqual(self.names('creme'), [])
+
+    def test_name_matches_rank_first(self):
+        Product.objects.create(
+            name='Sirop', category=Category.objects.create(name='Eau aromatisée'), price=Decimal('1.00'), stock=10
+        )
+        self.assertEqual(self.names('eau'), ['Eau minérale', 'Sirop'])
+
+    def test_fallback_without_fts(self):
+        from unittest import mock
+        with mock.patch('distributeur.search.fts_enabled', return_value=False):
+            self.assertEqual(self.names('CREME bru'), ['Crème brûlée'])
+            self.assertEqual(self.names('eau'), ['Eau minérale'])
+
+
+class ImageVariantTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('photo', password='photo')
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = self.settings(MEDIA_ROOT=media.name, DISTRIBUTEUR_IMAGE_WORKERS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def upload(self, color='red', name='photo.png'):
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGB', (2000, 1000), color).save(buffer, format='PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_variants_generated_after_upload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(name='Jus', price=Decimal('1.00'), stock=5, image=self.upload())
+        product.refresh_from_db()
+        self.assertEqual(len(product.image_digest), 64)
+
+        data = self.client.get(f'/api/products/{product.pk}/').data
+        self.assertEqual(set(data['image_variants']), {'thumbnail', 'card', 'full'})
+        from PIL import Image
+        from django.core.files.storage import default_storage
+        path = images.variant_path(product.image_digest, 'card', 'webp')
+        with default_storage.open(path) as variant, Image.open(variant) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (600, 300)))
+
+        # Une autre image efface l'empreinte jusqu'à sa génération
+        product.image = self.upload('blue')
+        product.save(update_fields=['image'])
+        self.assertEqual(Product.objects.get(pk=product.pk).image_digest, '')
+
+    def test_identical_uploads_share_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Product.objects.create(name='A', price=Decimal('1.00'), stock=5, image=self.upload())
+            second = Product.objects.create(name='B', price=Decimal('1.00'), stock=5, image=self.upload())
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertNotEqual(first.image.name, second.image.name)
+        self.assertEqual(first.image_digest, second.image_digest)
+
+    def test_backfill(self):
+        Product.objects.create(name='A', price=Decimal('1.00'), stock=5, image=self.upload())
+        Product.objects.create(name='B', price=Decimal('1.00'), stock=5, image=self.upload())
+        Product.objects.create(name='C', price=Decimal('1.00'), stock=5, image=self.upload('green'))
+        report = images.backfill(Product.objects.all(), workers=0)
+        self.assertEqual(report, {'products': 3, 'rendered': 2, 'deduplicated': 1, 'failed': 0})
+        self.assertFalse(Product.objects.filter(image_digest='').exists())
+        self.assertEqual(images.backfill(Product.objects.all(), workers=0)['products'], 0)
+
+
+class JobQueueTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('worker', password='worker', is_staff=True)
+        cls.product = Product.objects.create(name='Soda', price=Decimal('2.00'), stock=100)
+        cls.product.formats.add(ProductFormat.objects.create(name='Canette', volume='33cl', price=1))
+
+    def order(self):
+        response = self.client.post('/api/orders/', {'items': [{'product_id': self.product.pk, 'quantity': 1}]}, format='json')
+        self.assertEqual(response.data['status'], 'pending')
+        return response.data['id']
+
+    def test_worker_batch_transitions_orders(self):
+        from .signals import order_processing
+        seen = []
+        handler = lambda sender, order_ids, **kwargs: seen.extend(order_ids)
+        order_processing.connect(handler)
+        self.addCleanup(order_processing.disconnect, handler)
+
+        order_ids = [self.order() for _ in range(3)]
+        self.assertEqual(self.client.get('/api/jobs/stats/').data['queued'], 3)
+        report = jobs.work('test', batch_size=10)
+        self.assertEqual((report['claimed'], report['done']), (3, 3))
+        self.assertEqual(sorted(seen), order_ids)
+        self.assertEqual(set(Order.objects.values_list('status', flat=True)), {'processing'})
+        stats = self.client.get('/api/jobs/stats/').data
+        self.assertEqual((stats['queued'], stats['done']), (0, 3))
+        self.assertEqual(jobs.work('test')['claimed'], 0)
+
+    def test_failures_back_off_then_give_up(self):
+        calls = []
+
+        @jobs.task('tests.flaky')
+        def flaky(payload):
+            calls.append(payload)
+            raise RuntimeError('indisponible')
+        self.addCleanup(jobs.TASKS.pop, 'tests.flaky')
+
+        job = jobs.enqueue('tests.flaky', {'n': 1}, max_attempts=2)
+        with self.assertLogs('distributeur.jobs', 'ERROR'):
+            self.assertEqual(jobs.work('test')['retried'], 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(jobs.work('test')['claimed'], 0)
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('distributeur.jobs', 'ERROR'):
+            self.assertEqual(jobs.work('test')['failed'], 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('indisponible', job.last_error)
+        self.assertEqual(len(calls), 2)
+
+    def test_expired_lease_is_reclaimed(self):
+        self.order()
+        self.assertEqual(len(jobs.claim('crashed', lease=60)), 1)
+        self.assertEqual(jobs.claim('other'), [])
+        from datetime import timedelta
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        job, = jobs.claim('other')
+        self.assertEqual(job.attempts, 2)
+
+
+class SalesRollupTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('analyste', password='analyste', is_staff=True)
+        cls.supplier = Supplier.objects.create(name='Brasserie')
+        cls.can = ProductFormat.objects.create(name='Canette', volume='33cl', price=1)
+        cls.bottle = ProductFormat.objects.create(name='Bouteille', volume='1L', price=1)
+        cls.soda = Product.objects.create(name='Soda', supplier=cls.supplier, price=Decimal('2.00'), stock=100)
+        cls.soda.formats.add(cls.can, cls.bottle)
+        cls.water = Product.objects.create(name='Eau', price=Decimal('0.50'), stock=100)
+        cls.water.formats.add(cls.can)
+        # Le stock initial est porté par le premier format : la bouteille est réapprovisionnée
+        adjust_stock([{'id': cls.soda.pk, 'product_format_id': cls.bottle.pk, 'stock': 100}])
+
+    def order(self, *lines):
+        items = [
+            {'product_id': product.pk, 'product_format_id': product_format.pk, 'quantity': quantity}
+            for product, product_format, quantity in lines
+        ]
+        response = self.client.post('/api/orders/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Order.objects.get(pk=response.data['id'])
+
+    def rollups(self):
+        return sorted(DailySales.objects.values_list('product_id', 'product_format_id', 'lines', 'units', 'revenue'))
+
+    def test_orders_and_cancellations_update_rollups(self):
+        self.order((self.soda, self.can, 3), (self.water, self.can, 4))
+        second = self.order((self.soda, self.can, 2), (self.soda, self.bottle, 1))
+        self.assertEqual(self.rollups(), [
+            (self.soda.pk, self.can.pk, 2, 5, Decimal('10.00')),
+            (self.soda.pk, self.bottle.pk, 1, 1, Decimal('2.00')),
+            (self.water.pk, self.can.pk, 1, 4, Decimal('2.00')),
+        ])
+
+        second.status = 'cancelled'
+        second.save()
+        self.assertEqual(self.rollups(), [
+            (self.soda.pk, self.can.pk, 1, 3, Decimal('6.00')),
+            (self.soda.pk, self.bottle.pk, 0, 0, Decimal('0.00')),
+            (self.water.pk, self.can.pk, 1, 4, Decimal('2.00')),
+        ])
+
+        incremental = self.rollups()
+        from . import analytics
+        analytics.rebuild()
+        self.assertEqual(
+            self.rollups(),
+            [row for row in incremental if row[2]]
+        )
+
+    def test_sales_endpoint_groups_rollups(self):
+        self.order((self.soda, self.can, 3), (self.water, self.can, 4))
+        self.order((self.soda, self.bottle, 1))
+        # validation de la session, lignes groupées, comptage, totaux
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/analytics/sales/', {'group_by': 'supplier,product'})
+        self.assertEqual(response.status_code, 200)
+        rows = [
+            (row['supplier'], row['product'], row['total_units'], row['total_revenue'])
+            for row in response.data['results']
+        ]
+        self.assertEqual(sorted(rows, key=lambda row: row[1]), [
+            (self.supplier.pk, self.soda.pk, 4, Decimal('8.00')),
+            (None, self.water.pk, 4, Decimal('2.00')),
+        ])
+        self.assertEqual(response.data['totals']['total_revenue'], Decimal('10.00'))
+
+        today = timezone.localdate()
+        response = self.client.get('/api/analytics/sales/', {
+            'group_by': 'month,product_format', 'product_format': self.can.pk, 'since': today.isoformat(),
+        })
+        self.assertEqual(response.data['results'][0]['total_units'], 7)
+        self.assertEqual(self.client.get('/api/analytics/sales/', {'group_by': 'colour'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/analytics/sales/', {'since': 'hier'}).status_code, 400)
+
+
+class SparseFieldsetTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_catalog(products=20, orders=5)
+
+    def test_fields_restrict_payload_and_columns(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/products/', {'fields': 'id,name,supplier.name'})
+        row = response.data['results'][0]
+        self.assertEqual(set(row), {'id', 'name', 'supplier'})
+        self.assertEqual(set(row['supplier']), {'name'})
+        products_sql = next(q['sql'] for q in queries if 'FROM "distributeur_product"' in q['sql'])
+        self.assertNotIn('"distributeur_product"."price"', products_sql)
+        # version du catalogue, produits joints au fournisseur ; aucun préchargement
+        self.assertEqual(len(queries), 2)
+
+    def test_expand_keeps_only_listed_relations(self):
+        row = self.client.get('/api/products/', {'expand': 'category'}).data['results'][0]
+        self.assertIsInstance(row['supplier'], int)
+        self.assertIsInstance(row['category'], dict)
+        self.assertTrue(all(isinstance(pk, int) for pk in row['formats']))
+
+        # commandes, puis articles joints au produit : ni fournisseur ni formats
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/orders/', {'fields': 'id,status,items.quantity,items.product.name'})
+        order = response.data['results'][0]
+        self.assertEqual(set(order), {'id', 'status', 'items'})
+        self.assertEqual(set(order['items'][0]), {'quantity', 'product'})
+        self.assertEqual(set(order['items'][0]['product']), {'name'})
+
+        with self.assertNumQueries(2):
+            items = self.client.get('/api/orders/', {'expand': 'items'}).data['results'][0]['items']
+        self.assertIsInstance(items[0]['product'], int)
+
+    def test_flat_mode(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/products/', {'flat': '1', 'page_size': 5})
+        rows = response.data['results']
+        full = self.client.get('/api/products/', {'page_size': 5}).data['results']
+        self.assertEqual([row['id'] for row in rows], [row['id'] for row in full])
+        self.assertEqual(rows[0]['price'], full[0]['price'])
+        self.assertEqual(rows[0]['supplier'], full[0]['supplier']['id'])
+        self.assertEqual(rows[0]['formats'], sorted(f['id'] for f in full[0]['formats']))
+        self.assertNotIn('image_variants', rows[0])
+
+        response = self.client.get('/api/orders/', {'flat': 'true', 'fields': 'id,total_amount', 'page_size': 2})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'total_amount'})
+        self.assertIsNotNone(response.data['next'])
+
+    def test_writes_ignore_fieldsets(self):
+        product = Product.objects.filter(stock__gte=1).prefetch_related('formats').first()
+        response = self.client.post('/api/orders/?fields=id', {'items': [{
+            'product_id': product.pk, 'product_format_id': product.formats.all()[0].pk, 'quantity': 1,
+        }]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('items', response.data)
+
+
+@benchmark
+@tag('benchmark')
+class SerializationBenchmark(DistributeurTestCase):
+    """
+    Temps de sérialisation pour 1 000 lignes : complet, restreint par
+    ``?fields=`` et mode ``?flat=1``
+
+    Lancé seulement avec ``BENCH=1``.
+    """
+
+    ROWS = 1000
+    ROUNDS = int(os.environ.get('BENCH_ROUNDS', 5))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_catalog(products=cls.ROWS, orders=cls.ROWS // 5)
+
+    def measure(self, url, params):
+        timings = []
+        for _ in range(self.ROUNDS):
+            catalog_cache.cache.clear()
+            start = time.perf_counter()
+            response = self.client.get(url, {'page_size': self.ROWS, **params})
+            timings.append((time.perf_counter() - start) * 1000)
+            self.assertEqual(response.status_code, 200)
+        return min(timings) * 1000 / max(len(response.data['results']), 1)
+
+    def test_ms_per_thousand_rows(self):
+        for url in ('/api/products/', '/api/orders/'):
+            full = self.measure(url, {})
+            sparse = self.measure(url, {'fields': 'id,status,total_amount' if 'orders' in url else 'id,name,price'})
+            flat = self.measure(url, {'flat': '1'})
+            timings = f'complet {full:.1f} ms, fields {sparse:.1f} ms, flat {flat:.1f} ms / 1000 lignes'
+            with self.subTest(url=url):
+                self.assertLess(sparse, full, timings)
+                self.assertLess(flat, full, timings)
+
+
+class CatalogSnapshotTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_catalog(products=40, orders=0)
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = self.settings(DISTRIBUTEUR_SNAPSHOT_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.directory = directory.name
+
+    def download(self, **headers):
+        import gzip
+        response = self.client.get('/api/catalog/snapshot/', HTTP_ACCEPT_ENCODING='gzip', **headers)
+        if response.status_code != 200:
+            return response, None
+        return response, json.loads(gzip.decompress(b''.join(response.streaming_content)))
+
+    def test_references_are_deduplicated(self):
+        response, snapshot = self.download()
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(snapshot['products']), 40)
+        self.assertEqual(len(snapshot['suppliers']), 10)
+        self.assertEqual(len(snapshot['formats']), 20)
+        product = Product.objects.get(pk=snapshot['products'][0]['id'])
+        self.assertEqual(snapshot['products'][0]['supplier'], product.supplier_id)
+        self.assertEqual(snapshot['suppliers'][str(product.supplier_id)]['name'], product.supplier.name)
+        self.assertEqual(
+            snapshot['products'][0]['formats'],
+            sorted(product.formats.values_list('id', flat=True))
+        )
+
+        plain = self.client.get('/api/catalog/snapshot/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertEqual(json.loads(b''.join(plain.streaming_content)), snapshot)
+
+    def test_served_as_is_until_catalog_changes(self):
+        response, snapshot = self.download()
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.download()[1], snapshot)
+        with self.assertNumQueries(0):
+            response, _ = self.download(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Supplier.objects.filter(name='Fournisseur 0').get().save()
+        response, updated = self.download(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(updated['version'], snapshot['version'])
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+
+class SyncTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('sync', password='sync')
+        cls.other = User.objects.create_user('other', password='other')
+        cls.supplier = Supplier.objects.create(name='Fournisseur')
+        cls.product = Product.objects.create(
+            name='Jus', supplier=cls.supplier, price=Decimal('2.00'), stock=10
+        )
+
+    def sync(self, token=None, **params):
+        if token is not None:
+            params['since'] = token
+        response = self.client.get('/api/sync/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_only_changes_since_token(self):
+        initial = self.sync()
+        self.assertEqual([row['id'] for row in initial['changes']['products']['upserted']], [self.product.pk])
+        self.assertEqual(initial['changes']['suppliers']['upserted'][0]['name'], 'Fournisseur')
+
+        self.assertFalse(any(
+            group['upserted'] or group['deleted']
+            for group in self.sync(initial['token'])['changes'].values()
+        ))
+
+        Product.objects.filter(pk=self.product.pk).update(name='Jus frais')
+        self.product.refresh_from_db()
+        self.product.save()
+        delta = self.sync(initial['token'])
+        self.assertEqual(delta['changes']['products']['upserted'][0]['name'], 'Jus frais')
+        self.assertEqual(delta['changes']['suppliers']['upserted'], [])
+
+    def test_deletion_leaves_tombstone(self):
+        token = self.sync()['token']
+        product = Product.objects.create(name='Éphémère', price=Decimal('1.00'), stock=1)
+        product_id = product.pk
+        product.delete()
+        changes = self.sync(token)['changes']['products']
+        self.assertEqual(changes['upserted'], [])
+        self.assertEqual(changes['deleted'], [product_id])
+
+    def test_orders_scoped_to_owner(self):
+        token = self.sync()['token']
+        mine = Order.objects.create(user=self.user, total_amount=Decimal('0'))
+        Order.objects.create(user=self.other, total_amount=Decimal('0'))
+        orders = self.sync(token)['changes']['orders']
+        self.assertEqual([row['id'] for row in orders['upserted']], [mine.pk])
+        self.assertEqual(orders['upserted'][0]['items'], [])
+
+    def test_pages_follow_token(self):
+        token = self.sync()['token']
+        Product.objects.bulk_create(
+            Product(name=f'Lot {i}', price=Decimal('1.00'), stock=1) for i in range(5)
+        )
+        sync.record('products', Product.objects.values_list('pk', flat=True))
+        seen = []
+        while True:
+            page = self.sync(token, limit=2)
+            seen.extend(row['id'] for row in page['changes']['products']['upserted'])
+            token = page['token']
+            if not page['has_more']:
+                break
+        self.assertEqual(sorted(seen), sorted(Product.objects.values_list('pk', flat=True)))
+        self.assertEqual(self.client.get('/api/sync/', {'since': 'abc'}).status_code, 400)
+
+    def test_compact_keeps_latest_entry(self):
+        for _ in range(3):
+            self.product.save()
+        latest = ChangeLog.objects.filter(resource='products', object_id=self.product.pk).latest('id')
+        sync.compact()
+        self.assertEqual(
+            list(ChangeLog.objects.filter(resource='products', object_id=self.product.pk)),
+            [latest]
+        )
+
+
+@override_settings(DISTRIBUTEUR_LOCK_RETRIES=3, DISTRIBUTEUR_LOCK_RETRY_DELAY=0.001)
+class LockRetryTests(SimpleTestCase):
+    def setUp(self):
+        db.reset_stats()
+
+    def flaky(self, failures, message='database is locked'):
+        calls = []
+
+        def write():
+            calls.append(1)
+            if len(calls) <= failures:
+                raise OperationalError(message)
+            return len(calls)
+        return db.retry_on_lock(write)
+
+    def test_replays_until_lock_is_obtained(self):
+        self.assertEqual(self.flaky(2)(), 3)
+        self.assertEqual(db.stats(), {'retries': 2, 'exhausted': 0})
+
+    def test_bounded_attempts(self):
+        with self.assertRaises(db.DatabaseBusy):
+            self.flaky(3)()
+        self.assertEqual(db.stats(), {'retries': 2, 'exhausted': 1})
+
+    def test_other_errors_are_not_replayed(self):
+        with self.assertRaises(OperationalError):
+            self.flaky(1, 'no such table: distributeur_product')()
+        self.assertEqual(db.stats()['retries'], 0)
+
+
+class PerformanceMiddlewareTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_catalog(products=10, orders=2)
+        cls.user.is_staff = True
+        cls.user.save()
+
+    def setUp(self):
+        super().setUp()
+        perf.route_histograms.reset()
+
+    def test_server_timing_reports_queries_and_serialization(self):
+        response = self.client.get('/api/products/')
+        timing = dict(
+            metric.split(';', 1) for metric in response['Server-Timing'].split(', ')
+        )
+        self.assertEqual(set(timing), {'db', 'serialize', 'total', 'size'})
+        self.assertIn(f'desc="{QueryBudgetTests.BUDGETS["/api/products/"]} queries"', timing['db'])
+        self.assertIn(f'desc="{len(response.content)} B"', timing['size'])
+
+    def test_slow_requests_logged_with_repeated_queries(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log = os.path.join(directory, 'slow.jsonl')
+            with self.settings(DISTRIBUTEUR_SLOW_REQUEST_MS=0, DISTRIBUTEUR_SLOW_REQUEST_LOG=log):
+                self.client.get('/api/orders/')
+            with open(log, encoding='utf-8') as stream:
+                record, = [json.loads(line) for line in stream]
+        self.assertEqual(record['route'], 'GET order-list')
+        self.assertEqual(record['queries'], QueryBudgetTests.BUDGETS['/api/orders/'])
+
+        metrics = perf.RequestMetrics()
+        for pk in (1, 2, 3):
+            metrics(lambda *args: None, f"SELECT * FROM t WHERE id = {pk} AND name = 'x'", (), False, {})
+        metrics(lambda *args: None, 'SELECT * FROM t WHERE id IN (%s, %s)', (), False, {})
+        self.assertEqual(
+            [(row['sql'], row['count']) for row in metrics.duplicates()],
+            [('SELECT * FROM t WHERE id = ? AND name = ?', 3)]
+        )
+
+    def test_streamed_response_measured_until_read(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log = os.path.join(directory, 'slow.jsonl')
+            with self.settings(DISTRIBUTEUR_SLOW_REQUEST_MS=0, DISTRIBUTEUR_SLOW_REQUEST_LOG=log):
+                response = self.client.get('/api/orders/export/?output=ndjson')
+                self.assertFalse(os.path.exists(log))
+                content = b''.join(response.streaming_content)
+            with open(log, encoding='utf-8') as stream:
+                record, = [json.loads(line) for line in stream]
+        timing = response['Server-Timing']
+        self.assertEqual(record['bytes'], len(content))
+        self.assertGreater(record['queries'], int(timing.split('desc="', 1)[1].split(' ', 1)[0]))
+        self.assertEqual(perf.route_histograms.snapshot()['GET order-export']['count'], 1)
+
+    def test_slow_request_log_disabled_without_threshold(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log = os.path.join(directory, 'slow.jsonl')
+            with self.settings(DISTRIBUTEUR_SLOW_REQUEST_MS=None, DISTRIBUTEUR_SLOW_REQUEST_LOG=log):
+                self.assertEqual(self.client.get('/api/categories/').status_code, 200)
+            self.assertFalse(os.path.exists(log))
+
+    def test_metrics_aggregate_per_route(self):
+        for _ in range(3):
+            self.client.get('/api/categories/')
+        routes = self.client.get('/api/metrics/').data['routes']
+        self.assertEqual(routes['GET category-list']['count'], 3)
+        self.assertEqual(sum(routes['GET category-list']['buckets'].values()), 3)
+        self.client.force_authenticate(User.objects.create_user('client'))
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 403)
+
+
+class SeedingTests(TestCase):
+    def test_history_is_spread_and_rolled_up(self):
+        report = seeding.seed_catalog(products=30, users=3, orders=40, days=30, seed=7)
+        self.assertEqual(report['orders'], 40)
+        self.assertEqual(len(report['users']), 3)
+        oldest = Order.objects.order_by('created_at').first().created_at
+        self.assertGreaterEqual(oldest, timezone.now() - timedelta(days=30, minutes=1))
+        self.assertEqual(
+            DailySales.objects.aggregate(units=Sum('units'))['units'],
+            OrderItem.objects.exclude(order__status='cancelled').aggregate(units=Sum('quantity'))['units']
+        )
+        self.assertEqual(ledger.drift(), [])
+        self.assertEqual(ChangeLog.objects.filter(resource='products').count(), 30)
+        self.assertTrue(self.client.login(username='client0', password='client'))
+
+    def test_same_seed_same_catalog(self):
+        def catalog():
+            return list(
+                Product.objects.order_by('pk')
+                .values_list('reference', 'price', 'stock', 'supplier__name', 'category__name')
+            )
+
+        seeding.seed_catalog(products=20, orders=5, seed=3)
+        first = catalog()
+        Product.objects.all().delete()
+        Supplier.objects.all().delete()
+        Category.objects.all().delete()
+        seeding.seed_catalog(products=20, orders=5, username='other', seed=3)
+        self.assertEqual(catalog(), first)
+
+
+class LoadTestReportTests(SimpleTestCase):
+    def test_mix_and_percentiles(self):
+        self.assertEqual(loadtest.parse_mix('browse=3, checkout=1'), {'browse': 3, 'checkout': 1})
+        with self.assertRaises(ValueError):
+            loadtest.parse_mix('browse=1,refund=2')
+
+        results = loadtest.Results()
+        for ms in range(1, 101):
+            results.add('GET /api/products/', ms / 1000, 200 if ms <= 98 else 500)
+        report = results.report(elapsed=2)
+        route = report['routes']['GET /api/products/']
+        self.assertEqual((route['p50_ms'], route['p95_ms'], route['p99_ms']), (50.0, 95.0, 99.0))
+        self.assertEqual(route['error_rate'], 0.02)
+        self.assertEqual(report['throughput_rps'], 50)
+        self.assertEqual(report['p99_ms'], 99.0)
+
+
+class OrderTransitionTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_catalog(products=20, orders=0)
+        cls.admin = User.objects.create_user('ops', is_staff=True)
+        # Trois déclinaisons par produit
+        ProductStock.objects.update(stock=1000)
+        Product.objects.update(stock=3000, low_stock=False)
+
+    def place(self, count, quantity=2):
+        products = list(Product.objects.prefetch_related('formats').order_by('pk')[:3])
+        items = [
+            {'product_id': product.pk, 'product_format_id': product.formats.all()[0].pk, 'quantity': quantity}
+            for product in products
+        ]
+        orders = []
+        for _ in range(count):
+            response = self.client.post('/api/orders/', {'items': items}, format='json')
+            self.assertEqual(response.status_code, 201)
+            orders.append(response.data['id'])
+        return orders, [product.pk for product in products]
+
+    def stocks(self, pks):
+        return dict(Product.objects.filter(pk__in=pks).values_list('pk', 'stock'))
+
+    def test_cancel_restores_stock_and_sales(self):
+        before = self.stocks(Product.objects.values_list('pk', flat=True))
+        (order_id,), product_ids = self.place(1)
+        response = self.client.post(f'/api/orders/{order_id}/cancel/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stocks(product_ids), {pk: before[pk] for pk in product_ids})
+        self.assertEqual(DailySales.objects.aggregate(units=Sum('units'))['units'], 0)
+        self.assertEqual(self.client.post(f'/api/orders/{order_id}/cancel/').status_code, 400)
+
+    def test_bulk_cancel_takes_constant_queries(self):
+        before = self.stocks(Product.objects.values_list('pk', flat=True))
+        orders, product_ids = self.place(30, quantity=1)
+        Order.objects.filter(pk=orders[0]).update(status='completed')
+        self.client.force_authenticate(self.admin)
+        # savepoint, verrou et UPDATE des commandes, journal de synchronisation,
+        # agrégat des articles, verrou et UPDATE des produits, mouvements de
+        # stock, ventes journalières (lecture, insertion, décrément), journal
+        # des déclinaisons et des produits, fin du savepoint : indépendant du
+        # nombre de commandes
+        with self.assertNumQueries(14):
+            response = self.client.post(
+                '/api/orders/bulk_transition/',
+                {'status': 'cancelled', 'ids': orders + [0]},
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 29)
+        statuses = [result['status'] for result in response.data['orders']]
+        self.assertEqual(statuses, ['invalid'] + ['updated'] * 29 + ['not_found'])
+        self.assertEqual(
+            self.stocks(product_ids),
+            {pk: before[pk] - 1 for pk in product_ids}
+        )
+        self.assertEqual(
+            Order.objects.filter(pk__in=orders[1:], status='cancelled').count(), 29
+        )
+
+    def test_bulk_transition_by_age_is_staff_only(self):
+        orders, _ = self.place(3)
+        Order.objects.filter(pk=orders[0]).update(created_at=timezone.now() - timedelta(days=10))
+        body = {
+            'status': 'cancelled',
+            'from_status': 'pending',
+            'created_before': (timezone.now() - timedelta(days=1)).isoformat(),
+        }
+        self.assertEqual(self.client.post('/api/orders/bulk_transition/', body, format='json').status_code, 403)
+        self.client.force_authenticate(self.admin)
+        response = self.client.post('/api/orders/bulk_transition/', body, format='json')
+        self.assertEqual([result['id'] for result in response.data['orders']], [orders[0]])
+        self.assertEqual(
+            self.client.post('/api/orders/bulk_transition/', {'status': 'shipped', 'ids': orders}, format='json').status_code,
+            400
+        )
+
+
+class ProductStockTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('sku', password='sku')
+        cls.can = ProductFormat.objects.create(name='Canette', volume='33cl', price=1)
+        cls.bottle = ProductFormat.objects.create(name='Bouteille', volume='1L', price=1)
+        cls.product = Product.objects.create(name='Soda', price=Decimal('2.00'), stock=10)
+        cls.product.formats.add(cls.can, cls.bottle)
+
+    def skus(self):
+        return dict(self.product.skus.values_list('product_format_id', 'stock'))
+
+    def test_unallocated_stock_goes_to_first_format(self):
+        self.assertEqual(self.skus(), {self.can.pk: 10, self.bottle.pk: 0})
+        self.assertEqual(inventory.drift(), [])
+
+    def test_orders_and_reservations_move_sku_and_total(self):
+        line = {'product_id': self.product.pk, 'product_format_id': self.bottle.pk, 'quantity': 1}
+        response = self.client.post('/api/orders/', {'items': [line]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['stock_issues'][0]['product_format_id'], self.bottle.pk)
+
+        # format absent et ambigu : refusé plutôt que deviné
+        response = self.client.post(f'/api/products/{self.product.pk}/update_stock/', {'stock': 4}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            f'/api/products/{self.product.pk}/update_stock/',
+            {'stock': 4, 'product_format_id': self.bottle.pk},
+            format='json',
+        )
+        self.assertEqual((response.data['stock'], response.data['product_stock']), (4, 14))
+
+        self.assertEqual(self.client.post('/api/orders/', {'items': [line]}, format='json').status_code, 201)
+        line['quantity'] = 2
+        self.assertEqual(self.client.post('/api/reservations/', {'items': [line]}, format='json').status_code, 201)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved), (13, 2))
+        self.assertEqual(self.skus(), {self.can.pk: 10, self.bottle.pk: 3})
+        self.assertEqual(inventory.drift(), [])
+
+    def test_stale_instances_keep_totals_in_sync(self):
+        first = Product.objects.get(pk=self.product.pk)
+        second = Product.objects.get(pk=self.product.pk)
+        first.reduce_stock(3, self.can)
+        second.reduce_stock(2, self.can)
+        self.assertEqual(self.skus()[self.can.pk], 5)
+        self.assertEqual(second.stock, 5)
+
+        line = {'product_id': self.product.pk, 'product_format_id': self.can.pk, 'quantity': 2}
+        self.assertEqual(self.client.post('/api/reservations/', {'items': [line]}, format='json').status_code, 201)
+        first.restore_stock(1, self.can)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock, self.product.reserved), (6, 2))
+        self.assertEqual(inventory.drift(), [])
+        movements = StockMovement.objects.filter(
+            product=self.product, reason__in=[StockMovement.ORDER, StockMovement.CANCEL]
+        )
+        self.assertEqual(
+            list(movements.order_by('pk').values_list('product_format_id', 'quantity')),
+            [(self.can.pk, -3), (self.can.pk, -2), (self.can.pk, 1)]
+        )
+
+    def test_full_save_leaves_totals_to_skus(self):
+        stale = Product.objects.get(pk=self.product.pk)
+        self.product.reduce_stock(4, self.can)
+        stock = Product.objects.get(pk=self.product.pk).stock
+        events = LowStockEvent.objects.filter(product=self.product)
+        seen = events.count()
+
+        stale.name = 'Renommé'
+        stale.min_stock = stock
+        stale.save()
+        self.assertEqual((stale.stock, stale.low_stock), (stock, False))
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock, stock)
+        self.assertEqual(list(events.values_list('direction', 'stock')[seen:]), [(LowStockEvent.RECOVERED, stock)])
+
+        response = self.client.patch(f'/api/products/{self.product.pk}/', {'stock': 999}, format='json')
+        self.assertEqual(response.data['stock'], stock)
+        self.assertEqual(inventory.drift(), [])
+
+    def test_availability_is_a_single_lookup(self):
+        url = f'/api/products/{self.product.pk}/availability/'
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'product_format': self.can.pk})
+        self.assertEqual(response.data, {
+            'product_id': self.product.pk,
+            'product_format_id': self.can.pk,
+            'stock': 10,
+            'reserved': 0,
+            'available_stock': 10,
+        })
+        self.assertEqual(len(self.client.get(url).data['skus']), 2)
+        self.assertEqual(self.client.get('/api/products/0/availability/').status_code, 404)
+
+    def test_verify_stock_reports_and_fixes_drift(self):
+        from django.core.management import call_command
+        ProductStock.objects.filter(product=self.product, product_format=self.bottle).update(stock=5)
+
+        out = io.StringIO()
+        call_command('verify_stock', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['drift'], [{
+            'product_id': self.product.pk, 'stock': 10, 'sku_stock': 15, 'reserved': 0, 'sku_reserved': 0,
+        }])
+
+        call_command('verify_stock', '--fix', stdout=io.StringIO())
+        self.assertEqual(inventory.drift(), [])
+        self.assertEqual(Product.objects.get(pk=self.product.pk).stock, 15)
+        self.assertEqual(ledger.drift(), [])
+
+    def test_import_stock_targets_first_format(self):
+        admin = User.objects.create_user('catalogue', is_staff=True)
+        self.client.force_authenticate(admin)
+        upload = SimpleUploadedFile('catalogue.csv', (
+            'reference,name,supplier,price,stock,formats\n'
+            'R1,Jus,Fourn A,1.50,10,Bouteille:1L;Canette:33cl\n'
+        ).encode())
+        report = self.client.post('/api/products/import/', {'file': upload}, format='multipart').data
+        self.assertEqual((report['created'], report['failed']), (1, 0))
+        product = Product.objects.get(reference='R1')
+        self.assertEqual(
+            dict(product.skus.values_list('product_format_id', 'stock')),
+            {self.bottle.pk: 10, self.can.pk: 0}
+        )
+        self.assertEqual((product.stock, inventory.drift()), (10, []))
+
+
+@override_settings(DISTRIBUTEUR_READ_REPLICAS=['replica'])
+class ReadReplicaTests(DistributeurTestCase):
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_catalog(products=5, orders=0)
+        cls.sku = ProductStock.objects.filter(stock__gt=0).order_by('pk').first()
+
+    def setUp(self):
+        super().setUp()
+        # En test, la réplique est la même base en mémoire (TEST MIRROR) : elle
+        # doit lire la transaction non validée de TestCase
+        with connections['replica'].cursor() as cursor:
+            cursor.execute('PRAGMA read_uncommitted = 1')
+
+    def get(self, url):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return primary, replica
+
+    def catalog_queries(self, queries):
+        return [query for query in queries if 'distributeur_product' in query['sql']]
+
+    def test_catalog_reads_use_the_replica(self):
+        primary, replica = self.get('/api/products/')
+        self.assertTrue(self.catalog_queries(replica))
+        self.assertFalse(self.catalog_queries(primary))
+        # Tampon de version relu sur la base principale
+        self.assertFalse([query for query in replica if 'catalogversion' in query['sql']])
+
+        primary, replica = self.get('/api/orders/')
+        self.assertEqual(len(replica), 0)
+
+    def test_writer_is_pinned_to_the_primary(self):
+        response = self.client.post('/api/orders/', {'items': [{
+            'product_id': self.sku.product_id,
+            'product_format_id': self.sku.product_format_id,
+            'quantity': 1,
+        }]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('replica_pin', response.cookies)
+
+        primary, replica = self.get(f'/api/products/{self.sku.product_id}/')
+        self.assertEqual(len(replica), 0)
+        self.assertTrue(self.catalog_queries(primary))
+
+        # Épinglage expiré : retour sur la réplique
+        self.client.cookies['replica_pin'] = str(time.time() - 1)
+        primary, replica = self.get(f'/api/products/{self.sku.product_id}/availability/')
+        self.assertTrue(replica)
+
+    def test_router_keeps_writes_and_other_apps_on_the_primary(self):
+        self.assertEqual(Product.objects.all().db, 'default')
+        with routers.reading('replica'):
+            self.assertEqual(Product.objects.all().db, 'replica')
+            self.assertEqual(CatalogVersion.objects.all().db, 'default')
+            self.assertEqual(User.objects.all().db, 'default')
+            self.assertEqual(router.db_for_write(Product), 'default')
+        with self.assertRaises(ValueError):
+            db.sync_replicas(['default'])
+
+
+class AsyncCatalogViewTests(DistributeurTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed_catalog(products=12, orders=4)
+        cls.other = User.objects.create_user('autre')
+
+    async def test_product_pages_match_flat_viewset(self):
+        response = await sync_to_async(self.client.get)('/api/products/', {'flat': 1, 'page_size': 100})
+        expected = response.data['results']
+
+        rows, url = [], '/api/async/products/?page_size=5'
+        while url:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            # Requêtes de l'ORM asynchrone comptées dans la requête HTTP
+            self.assertNotIn('desc="0 queries"', response['Server-Timing'])
+            page = response.json()
+            self.assertLessEqual(len(page['results']), 5)
+            rows.extend(page['results'])
+            url = page['next']
+        self.assertEqual(rows, json.loads(json.dumps(expected, cls=JSONEncoder)))
+
+        product = await Product.objects.order_by('pk').afirst()
+        response = await self.async_client.get(f'/api/async/products/{product.pk}/')
+        self.assertEqual(response.json()['id'], product.pk)
+        self.assertEqual(response.json()['formats'], sorted(response.json()['formats']))
+        response = await self.async_client.get(
+            '/api/async/products/', {'supplier': product.supplier_id, 'fields': 'id,supplier'}
+        )
+        self.assertEqual({tuple(row) for row in response.json()['results']}, {('id', 'supplier')})
+        self.assertTrue(all(row['supplier'] == product.supplier_id for row in response.json()['results']))
+
+        self.assertEqual((await self.async_client.get('/api/async/products/0/')).status_code, 404)
+        self.assertEqual((await self.async_client.get('/api/async/products/', {'page_size': 'x'})).status_code, 400)
+        self.assertEqual((await self.async_client.get('/api/async/products/', {'supplier': 'x'})).status_code, 400)
+        self.assertEqual((await self.async_client.post('/api/async/products/')).status_code, 405)
+
+    async def test_catalog_validators_and_cache(self):
+        response = await self.async_client.get('/api/async/categories/')
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get('/api/async/categories/', headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        await self.async_client.get('/api/async/suppliers/')
+        await self.async_client.get('/api/async/suppliers/')
+        self.assertGreaterEqual(catalog_cache.stats()['hits'], 1)
+
+    async def test_orders_are_private_and_newest_first(self):
+        self.assertEqual((await self.async_client.get('/api/async/orders/')).status_code, 403)
+
+        await self.async_client.aforce_login(self.user)
+        rows, url = [], '/api/async/orders/?page_size=3'
+        while url:
+            page = (await self.async_client.get(url)).json()
+            rows.extend(page['results'])
+            url = page['next']
+        expected = [
+            pk async for pk in Order.objects.filter(user=self.user)
+            .order_by('-created_at', '-id').values_list('pk', flat=True)
+        ]
+        self.assertEqual([row['id'] for row in rows], expected)
+        self.assertTrue(all(row['items'] for row in rows))
+
+        response = await self.async_client.get(f'/api/async/orders/{expected[0]}/', {'fields': 'status'})
+        self.assertEqual(set(response.json()), {'status'})
+
+        await self.async_client.aforce_login(self.other)
+        self.assertEqual((await self.async_client.get(f'/api/async/orders/{expected[0]}/')).status_code, 404)
+        # Curseur pris dans les commandes d'un autre utilisateur, ou inconnu
+        for after in (expected[0], 0):
+            response = await self.async_client.get('/api/async/orders/', {'after': after})
+            self.assertEqual(response.status_code, 400)
+
+    async def test_orders_accept_token_authentication(self):
+        token = await Token.objects.acreate(user=self.user)
+        response = await self.async_client.get('/api/async/orders/', headers={'authorization': f'Token {token.key}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), await Order.objects.filter(user=self.user).acount())
+
+        response = await self.async_client.get('/api/async/orders/', headers={'authorization': 'Token inconnu'})
+        self.assertEqual(response.status_code, 401)
@@ -1,14 +1,35 @@
 # urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CategoryViewSet, SupplierViewSet, ProductViewSet, OrderViewSet
+from . import async_views
+from .views import (
+    CategoryViewSet, SupplierViewSet, ProductViewSet, OrderViewSet,
+    StockReservationViewSet, CatalogCacheStatsView, JobQueueStatsView,
+    SalesAnalyticsView, CatalogSnapshotView, SyncView, RequestMetricsView
+)
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet)
 router.register(r'suppliers', SupplierViewSet)
 router.register(r'products', ProductViewSet)
 router.register(r'orders', OrderViewSet)
+router.register(r'reservations', StockReservationViewSet)
 
 urlpatterns = [
+    path('sync/', SyncView.as_view(), name='sync'),
+    path('catalog/snapshot/', CatalogSnapshotView.as_view(), name='catalog-snapshot'),
+    path('catalog/cache/', CatalogCacheStatsView.as_view(), name='catalog-cache-stats'),
+    path('analytics/sales/', SalesAnalyticsView.as_view(), name='sales-analytics'),
+    path('metrics/', RequestMetricsView.as_view(), name='request-metrics'),
+    path('jobs/stats/', JobQueueStatsView.as_view(), name='job-queue-stats'),
+    # Lectures asynchrones (ASGI) : format ?flat=1, pagination par ?after=<id>
+    path('async/products/', async_views.product_list, name='async-product-list'),
+    path('async/products/<int:pk>/', async_views.product_detail, name='async-product-detail'),
+    path('async/categories/', async_views.category_list, name='async-category-list'),
+    path('async/categories/<int:pk>/', async_views.category_detail, name='async-category-detail'),
+    path('async/suppliers/', async_views.supplier_list, name='async-supplier-list'),
+    path('async/suppliers/<int:pk>/', async_views.supplier_detail, name='async-supplier-detail'),
+    path('async/orders/', async_views.order_list, name='async-order-list'),
+    path('async/orders/<int:pk>/', async_views.order_detail, name='async-order-detail'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,58 +1,173 @@
 # views.py
-from rest_framework import viewsets, permissions, status
+from rest_framework import mixins, viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db import transaction
-from django.core.exceptions import ValidationError
-from .models import Category, Supplier, Product, Order,OrderItem
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.dateparse import parse_datetime
+from .models import (
+    Category, Supplier, Product, Order,
+    StockMovement, StockReservation, LowStockEvent
+)
 from .serializers import (
     CategorySerializer, 
     SupplierSerializer, 
     ProductSerializer, 
-    OrderSerializer
+    OrderSerializer,
+    StockMovementSerializer,
+    StockReservationSerializer,
+    LowStockEventSerializer
+)
+from . import analytics, db, exports, imports, inventory, jobs, ledger, perf, search, snapshots, sync
+from .db import retry_on_lock
+from .cache import CachedCatalogMixin, ConditionalCatalogMixin, catalog_cache
+from .fieldsets import SparseFieldsetMixin
+from .pagination import AnalyticsPagination, OrderPagination, SearchPagination
+from .services import (
+    ORDER_TRANSITIONS, OrderPlacementError, adjust_stock, place_order, release_reservation,
+    reserve_stock, transition_orders
 )
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalCatalogMixin, CachedCatalogMixin, SparseFieldsetMixin,
+                        viewsets.ModelViewSet):
+    cache_resource = 'categories'
+    read_replica = True
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['name']
 
-class SupplierViewSet(viewsets.ModelViewSet):
+    def get_queryset(self):
+        return self.sparse_queryset(super().get_queryset())
+
+class SupplierViewSet(ConditionalCatalogMixin, CachedCatalogMixin, SparseFieldsetMixin,
+                        viewsets.ModelViewSet):
+    cache_resource = 'suppliers'
+    read_replica = True
     queryset = Supplier.objects.all()
     serializer_class = SupplierSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['name']
 
-class ProductViewSet(viewsets.ModelViewSet):
+    def get_queryset(self):
+        return self.sparse_queryset(super().get_queryset())
+
+class ProductViewSet(ConditionalCatalogMixin, CachedCatalogMixin, SparseFieldsetMixin,
+                     viewsets.ModelViewSet):
+    """
+    Catalogue des produits
+
+    ``?fields=id,name,supplier.name`` restreint les champs émis et les
+    colonnes lues ; ``?expand=supplier`` n'imbrique que les relations citées
+    (les autres sont rendues par leur identifiant) ; ``?flat=1`` sert la
+    liste sans imbrication ni sérialiseur.
+    """
+    cache_resource = 'products'
+    read_replica = True
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['name', 'category__name', 'supplier__name']
+    filterset_fields = ['name', 'category__name', 'supplier', 'supplier__name']
+
+    def get_queryset(self):
+        """Fournisseur et catégorie joints, formats préchargés, selon ``?fields=``/``?expand=``"""
+        return self.sparse_queryset(super().get_queryset())
 
     @action(detail=False, methods=['GET'])
     def low_stock(self, request):
-        """Récupérer les produits avec un stock inférieur au stock minimum"""
-        low_stock_products = Product.objects.filter(stock__lt=F('min_stock'))
-        serializer = self.get_serializer(low_stock_products, many=True)
-        return Response(serializer.data)
+        """
+        Récupérer les produits avec un stock inférieur au stock minimum
+
+        Lit l'indicateur ``low_stock`` via l'index partiel (fournisseur, id) ;
+        accepte les mêmes filtres que la liste (``?supplier=<id>``...).
+        """
+        low_stock_products = self.filter_queryset(self.get_queryset()).filter(low_stock=True)
+        page = self.paginate_queryset(low_stock_products)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['GET'])
+    def search(self, request):
+        """
+        Recherche plein texte : ``?q=creme bru`` trouve « Crème brûlée »
+
+        Porte sur le nom, le fournisseur, la catégorie et les formats, sans
+        tenir compte des accents ; le dernier mot est cherché en préfixe. Résultats
+        classés par pertinence (BM25 sous SQLite), paginés par ``limit``/``offset``.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not search.terms(query):
+            return Response(
+                {'error': "Paramètre 'q' requis"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        results = search.search(query, self.get_queryset())
+        paginator = SearchPagination()
+        page = paginator.paginate_queryset(results, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['GET'])
+    def low_stock_events(self, request):
+        """
+        Flux des passages sous le stock minimum et des retours au-dessus
+
+        ``?since=<id>`` ne renvoie que les événements postérieurs au dernier
+        reçu ; ``?supplier=<id>`` restreint à un fournisseur.
+        """
+        events = LowStockEvent.objects.all()
+        since = request.query_params.get('since')
+        supplier = request.query_params.get('supplier')
+        try:
+            if since:
+                events = events.filter(id__gt=int(since))
+            if supplier:
+                events = events.filter(product__supplier_id=int(supplier))
+        except ValueError:
+            return Response(
+                {'error': "'since' et 'supplier' doivent être des entiers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        page = self.paginate_queryset(events)
+        return self.get_paginated_response(
+            LowStockEventSerializer(page, many=True).data
+        )
 
     @action(detail=True, methods=['POST'])
+    @retry_on_lock
     def update_stock(self, request, pk=None):
-        """Mettre à jour le stock d'un produit"""
+        """
+        Mettre à jour le stock d'un produit
+
+        Corps : ``{"stock", "product_format_id"}`` ; le format peut être omis
+        lorsque le produit n'en propose qu'un seul.
+        """
         product = self.get_object()
         new_stock = request.data.get('stock')
         
         if new_stock is not None:
-            product.stock = new_stock
-            product.save()
+            result, = adjust_stock([{
+                'id': product.pk,
+                'product_format_id': request.data.get('product_format_id'),
+                'stock': new_stock,
+            }])
+            if result['status'] != 'updated':
+                return Response(
+                    {'error': result.get('error', 'Format inconnu pour ce produit')},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             return Response({
                 'status': 'stock updated', 
-                'stock': product.stock
+                'product_format_id': result['product_format_id'],
+                'stock': result['stock'],
+                'product_stock': result['product_stock']
             })
         
         return Response(
@@ -60,99 +175,203 @@ class ProductViewSet(viewsets.ModelViewSet):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.all()
-    serializer_class = OrderSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    @action(detail=False, methods=['POST'], permission_classes=[permissions.IsAdminUser])
+    @retry_on_lock
+    def bulk_stock(self, request):
+        """
+        Ajuster le stock de nombreuses déclinaisons en une transaction
 
-    def get_queryset(self):
-        """Utilisateurs ne voient que leurs propres commandes"""
-        return Order.objects.filter(user=self.request.user)
+        Corps : ``{"mode": "absolute"|"delta", "products": [{"id",
+        "product_format_id", "stock"|"delta"}]}``. Le stock des formats
+        n'existe plus en propre : il est porté par les déclinaisons.
+        """
+        mode = request.data.get('mode', 'absolute')
+        products = request.data.get('products', [])
 
-    @transaction.atomic
-    def create(self, request):
+        if mode not in ('absolute', 'delta'):
+            return Response(
+                {'error': "Le mode doit être 'absolute' ou 'delta'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if 'formats' in request.data:
+            return Response(
+                {'error': "'formats' n'est plus accepté : indiquez 'product_format_id' dans 'products'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not isinstance(products, list):
+            return Response(
+                {'error': "'products' doit être une liste"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = adjust_stock(products, mode)
+        updated = sum(result['status'] == 'updated' for result in results)
+        return Response({'mode': mode, 'updated': updated, 'products': results})
+
+    @action(detail=True, methods=['GET'])
+    def availability(self, request, pk=None):
         """
-        Création d'une commande avec gestion avancée du stock
+        Stock disponible des déclinaisons d'un produit, lu sur l'index
+        unique (produit, format) sans charger le produit
+
+        ``?product_format=<id>`` restreint la réponse à une déclinaison
+        (``?format=`` est réservé par DRF au choix du rendu).
         """
+        format_id = request.query_params.get('product_format')
         try:
-            # Validation des données de la commande
-            cart_items = request.data.get('items', [])
-            
-            if not cart_items:
-                return Response(
-                    {'error': 'Aucun article dans le panier'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+            product_id = int(pk)
+            format_id = int(format_id) if format_id not in (None, '') else None
+        except ValueError:
+            return Response(
+                {'error': 'Identifiant invalide'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        skus = inventory.availability(product_id, format_id)
+        if not skus:
+            return Response(
+                {'error': 'Aucune déclinaison pour ce produit'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if format_id is not None:
+            return Response({'product_id': product_id, **skus[0]})
+        return Response({'product_id': product_id, 'skus': skus})
 
-            # Vérification préalable du stock
-            stock_errors = []
-            for item in cart_items:
-                product = Product.objects.get(id=item['product_id'])
-                if not product.check_stock_availability(item['quantity']):
-                    stock_errors.append({
-                        'product_id': product.id,
-                        'product_name': product.name,
-                        'available_stock': product.stock,
-                        'requested_quantity': item['quantity']
-                    })
-
-            # Si des erreurs de stock sont détectées, retourner les détails
-            if stock_errors:
+    @action(detail=True, methods=['GET'])
+    def stock_history(self, request, pk=None):
+        """
+        Journal des mouvements de stock d'un produit
+
+        ``?at=<date ISO 8601>`` ajoute le stock du produit à cette date.
+        """
+        product = self.get_object()
+        summary = {
+            'product_id': product.pk,
+            'stock': product.stock,
+            'ledger_stock': ledger.ledger_stock([product.pk])[product.pk],
+        }
+        at = request.query_params.get('at')
+        if at:
+            when = parse_datetime(at)
+            if when is None:
                 return Response(
-                    {
-                        'error': 'Stocks insuffisants',
-                        'stock_issues': stock_errors
-                    }, 
+                    {'error': 'Date invalide'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            if timezone.is_naive(when):
+                when = timezone.make_aware(when)
+            summary['at'] = when
+            summary['stock_at'] = ledger.stock_at([product.pk], when)[product.pk]
 
-            # Calcul du montant total
-            total_amount = sum(
-                item['quantity'] * item['unit_price'] 
-                for item in cart_items
-            )
-
-            # Création de la commande
-            order = Order.objects.create(
-                user=request.user,
-                total_amount=total_amount,
-                status='pending'
-            )
-
-            # Création des items de commande et réduction du stock
-            order_items = []
-            for item in cart_items:
-                product = Product.objects.get(id=item['product_id'])
-                
-                # Réduire le stock
-                product.reduce_stock(item['quantity'])
-
-                # Créer l'item de commande
-                order_item = OrderItem.objects.create(
-                    order=order,
-                    product=product,
-                    quantity=item['quantity'],
-                    unit_price=item['unit_price']
-                )
-                order_items.append(order_item)
+        movements = StockMovement.objects.filter(product=product)
+        page = self.paginate_queryset(movements)
+        response = self.get_paginated_response(
+            StockMovementSerializer(page, many=True).data
+        )
+        response.data.update(summary)
+        return response
 
-            # Sérialisation et réponse
-            serializer = self.get_serializer(order)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+    @action(
+        detail=False,
+        methods=['POST'],
+        url_path='import',
+        permission_classes=[permissions.IsAdminUser]
+    )
+    def import_catalog(self, request):
+        """
+        Importer un catalogue fournisseur (CSV ou NDJSON) en upsert
 
-        except ValidationError as e:
-            # Gestion des erreurs de validation (stock insuffisant)
+        Le fichier est envoyé dans le champ ``file`` ; son format est déduit
+        de l'extension ou forcé via ``input`` (csv|ndjson).
+        """
+        uploaded = request.FILES.get('file')
+        if uploaded is None:
             return Response(
-                {'error': str(e)}, 
+                {'error': 'Fichier manquant (champ "file")'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        except Product.DoesNotExist:
+
+        input_format = request.data.get('input') or uploaded.name.rsplit('.', 1)[-1].lower()
+        if input_format == 'jsonl':
+            input_format = 'ndjson'
+        if input_format not in imports.IMPORT_FORMATS:
             return Response(
-                {'error': 'Produit non trouvé'}, 
-                status=status.HTTP_404_NOT_FOUND
+                {'error': "Le format doit être 'csv' ou 'ndjson'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = imports.read_rows(imports.open_upload(uploaded), input_format)
+        report = imports.CatalogImporter().run(rows)
+        return Response(report)
+
+class OrderViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
+    """
+    Commandes de l'utilisateur ; ``?fields=``, ``?expand=`` et ``?flat=1``
+    comme pour les produits (``?expand=items`` : articles sans produit imbriqué)
+    """
+    queryset = Order.objects.all()
+    serializer_class = OrderSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = OrderPagination
+
+    def get_queryset(self):
+        """Utilisateurs ne voient que leurs propres commandes"""
+        return self.sparse_queryset(Order.objects.filter(user=self.request.user))
+
+    @retry_on_lock
+    def create(self, request):
+        """
+        Création d'une commande avec gestion avancée du stock
+        """
+        try:
+            order = place_order(
+                request.user,
+                request.data.get('items', []),
+                reservation_ids=request.data.get('reservation_ids', [])
             )
+        except OrderPlacementError as e:
+            payload = {'error': e.message}
+            if e.issues:
+                payload['stock_issues'] = e.issues
+            return Response(payload, status=e.status_code)
+
+        serializer = self.get_serializer(self.get_queryset().get(pk=order.pk))
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['GET'])
+    def export(self, request):
+        """
+        Exporter les commandes et leurs articles en flux NDJSON ou CSV
+
+        Paramètres : ``output`` (ndjson|csv), ``since``, ``until``, ``status``
+        et, pour le personnel, ``user``. Les autres utilisateurs n'exportent
+        que leurs propres commandes.
+        """
+        output = request.query_params.get('output', 'ndjson')
+        if request.user.is_staff:
+            orders = Order.objects.all()
+        else:
+            orders = Order.objects.filter(user=request.user)
+
+        try:
+            orders = exports.filter_orders(
+                orders,
+                since=request.query_params.get('since'),
+                until=request.query_params.get('until'),
+                status=request.query_params.get('status'),
+                user=request.query_params.get('user'),
+            )
+            chunks = exports.render(exports.export_rows(orders), output)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        content_type = 'text/csv; charset=utf-8' if output == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        filename = f"commandes-{timezone.localdate():%Y%m%d}.{output}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
     @action(detail=True, methods=['POST'])
+    @retry_on_lock
     def cancel(self, request, pk=None):
         """
         Action personnalisée pour annuler une commande
@@ -166,10 +385,222 @@ class OrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Annuler la commande
-        order.cancel_order()
+        # Annuler la commande (le statut a pu changer depuis la lecture)
+        if not order.cancel_order():
+            return Response(
+                {'error': 'Cette commande ne peut pas être annulée'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response(
             {'message': 'Commande annulée avec succès'},
             status=status.HTTP_200_OK
-        )
\ No newline at end of file
+        )
+
+    @action(detail=False, methods=['POST'], permission_classes=[permissions.IsAdminUser])
+    @retry_on_lock
+    def bulk_transition(self, request):
+        """
+        Changer le statut de nombreuses commandes en une transaction
+
+        Corps : ``{"status": "cancelled", "ids": [...]}`` ou, pour viser les
+        commandes anciennes, ``{"status": "cancelled", "from_status": "pending",
+        "created_before": "2024-01-01T00:00:00Z"}``. Toutes les commandes sont
+        concernées, pas seulement celles de l'utilisateur.
+        """
+        new_status = request.data.get('status')
+        ids = request.data.get('ids')
+        from_status = request.data.get('from_status')
+        created_before = request.data.get('created_before')
+
+        if ids is None:
+            before = parse_datetime(created_before) if isinstance(created_before, str) else None
+            if from_status not in ORDER_TRANSITIONS or before is None:
+                return Response(
+                    {'error': "'ids', ou 'from_status' et 'created_before' (ISO 8601) requis"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            ids = list(
+                Order.objects.filter(status=from_status, created_at__lt=before)
+                .order_by('pk').values_list('pk', flat=True)
+            )
+        elif not isinstance(ids, list):
+            return Response(
+                {'error': "'ids' doit être une liste"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            results = transition_orders(ids, new_status)
+        except (TypeError, ValueError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        updated = sum(result['status'] == 'updated' for result in results)
+        return Response({'status': new_status, 'updated': updated, 'orders': results})
+
+class StockReservationViewSet(mixins.ListModelMixin,
+                              mixins.RetrieveModelMixin,
+                              mixins.DestroyModelMixin,
+                              viewsets.GenericViewSet):
+    """
+    Réservations temporaires de stock pour un panier
+
+    POST reprend le format du panier (``items``) avec une durée optionnelle
+    ``ttl`` en secondes ; DELETE libère la réservation. Les réservations
+    sont converties en passant ``reservation_ids`` à la création de commande.
+    """
+    queryset = StockReservation.objects.all()
+    serializer_class = StockReservationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        """Utilisateurs ne voient que leurs propres réservations actives"""
+        return StockReservation.objects.filter(
+            user=self.request.user,
+            status=StockReservation.ACTIVE,
+            expires_at__gt=timezone.now()
+        )
+
+    @retry_on_lock
+    def create(self, request):
+        try:
+            reservations = reserve_stock(
+                request.user,
+                request.data.get('items', []),
+                ttl=request.data.get('ttl')
+            )
+        except OrderPlacementError as e:
+            payload = {'error': e.message}
+            if e.issues:
+                payload['stock_issues'] = e.issues
+            return Response(payload, status=e.status_code)
+
+        serializer = self.get_serializer(reservations, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @retry_on_lock
+    def perform_destroy(self, instance):
+        release_reservation(instance)
+
+class JobQueueStatsView(APIView):
+    """Profondeur de la file de tâches et débit récent (``?window=`` secondes)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        try:
+            window = max(1, int(request.query_params.get('window', 60)))
+        except ValueError:
+            return Response(
+                {'error': "'window' doit être un entier"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(jobs.stats(window))
+
+class SalesAnalyticsView(APIView):
+    """
+    Ventes agrégées lues dans les tables de cumul journalier
+
+    Paramètres : ``since`` et ``until`` (AAAA-MM-JJ, 30 derniers jours par
+    défaut), ``group_by`` (day, week, month, product, product_format,
+    supplier, category, séparés par des virgules) et les filtres
+    ``product``, ``product_format``, ``supplier``, ``category``.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            (since, until), groups, rows, totals = analytics.sales(
+                since=params.get('since'),
+                until=params.get('until'),
+                group_by=params.get('group_by', 'day'),
+                **{name: params.get(name) for name in analytics.FILTERS}
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = AnalyticsPagination()
+        page = paginator.paginate_queryset(rows, request, view=self)
+        response = paginator.get_paginated_response(page)
+        response.data.update({
+            'since': since,
+            'until': until,
+            'group_by': groups,
+            'totals': totals,
+        })
+        return response
+
+class CatalogSnapshotView(APIView):
+    """
+    Catalogue complet normalisé, pour l'amorçage hors ligne
+
+    Les produits référencent fournisseurs, catégories et formats par leur
+    identifiant ; chacun n'est transmis qu'une fois. Le fichier gzip est
+    précalculé et servi tel quel tant que la version du catalogue ne change
+    pas (``ETag``, ``If-None-Match`` sans accès à la base).
+    """
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+
+    def get(self, request):
+        version, updated_at = snapshots.current_stamp()
+        etag = f'"catalog-{version}"'
+        last_modified = int(updated_at.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            path, version, _ = snapshots.current()
+            if snapshots.accepts_gzip(request):
+                response = FileResponse(open(path, 'rb'), content_type='application/json')
+                response['Content-Encoding'] = 'gzip'
+            else:
+                response = StreamingHttpResponse(
+                    snapshots.decompressed(path), content_type='application/json'
+                )
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ['Accept-Encoding'])
+        patch_cache_control(response, no_cache=True)
+        return response
+
+class SyncView(APIView):
+    """
+    Modifications du catalogue et des commandes depuis un jeton
+
+    ``?since=`` reprend le ``token`` de la réponse précédente (absent : tout
+    l'historique du journal). Par ressource, ``upserted`` porte les lignes
+    créées ou modifiées dans leur état courant et ``deleted`` les
+    identifiants supprimés. Tant que ``has_more`` est vrai, le client
+    rappelle avec le nouveau jeton.
+    """
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    max_limit = sync.SYNC_PAGE_SIZE
+
+    def get(self, request):
+        try:
+            since = sync.parse_token(request.query_params.get('since'))
+            limit = int(request.query_params.get('limit', self.max_limit))
+        except ValueError:
+            return Response(
+                {'error': "'since' et 'limit' doivent être des entiers positifs"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = min(max(limit, 1), self.max_limit)
+        return Response(sync.changes(request.user, since, limit, request))
+
+class CatalogCacheStatsView(APIView):
+    """Compteurs du cache du catalogue (succès, échecs, invalidations)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(catalog_cache.stats())
+
+class RequestMetricsView(APIView):
+    """
+    Histogrammes des durées et moyennes par route depuis le démarrage du
+    processus (``?reset=1`` les remet à zéro après lecture)
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        payload = {'routes': perf.route_histograms.snapshot(), 'database': db.stats()}
+        if request.query_params.get('reset') in ('1', 'true'):
+            perf.route_histograms.reset()
+        return Response(payload)
@@ -39,10 +39,12 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'distributeur',
     'rest_framework',
+    'rest_framework.authtoken',
     'django_filters',
 ]
 
 MIDDLEWARE = [
+    'distributeur.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,6 +52,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'distributeur.middleware.ReadReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'supply.urls'
@@ -81,21 +84,121 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
+    'DEFAULT_PAGINATION_CLASS': 'distributeur.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
 }
 
+# Taille de page maximale acceptée via ?page_size= (ou ?limit= en mode offset)
+DISTRIBUTEUR_MAX_PAGE_SIZE = 500
+
+# Durée par défaut et maximale des réservations de stock (secondes)
+DISTRIBUTEUR_RESERVATION_TTL = 900
+DISTRIBUTEUR_RESERVATION_MAX_TTL = 3600
+
+# Processus générant les déclinaisons d'images (0 : dans le processus web)
+DISTRIBUTEUR_IMAGE_WORKERS = 2
+
+# Fichiers gzip de /api/catalog/snapshot/, un par version du catalogue
+DISTRIBUTEUR_SNAPSHOT_DIR = BASE_DIR / 'catalog_snapshots'
+
+# Requêtes plus lentes que ce seuil (ms) journalisées en JSONL (None : aucun journal)
+DISTRIBUTEUR_SLOW_REQUEST_MS = 500
+DISTRIBUTEUR_SLOW_REQUEST_LOG = BASE_DIR / 'slow_requests.jsonl'
+
 WSGI_APPLICATION = 'supply.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# Profils SQLite. 'concurrent' : journal WAL (les lectures ne bloquent plus
+# l'écriture en cours), pragmas appliqués à chaque connexion, connexions
+# conservées entre les requêtes et transactions ouvertes en BEGIN IMMEDIATE :
+# le verrou d'écriture est pris dès le début du bloc atomic, l'attente se fait
+# dans busy_timeout au lieu d'échouer au milieu de la transaction. Tout bloc
+# atomic prend ce verrou, y compris en lecture seule.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,  # en Kio : 64 Mo par connexion
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+SQLITE_PROFILES = {
+    # Réglages par défaut de Django
+    'default': {
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {},
+    },
+    'concurrent': {
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 5,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+        },
+    },
+}
+
+SQLITE_PROFILE = 'concurrent'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        **SQLITE_PROFILES[SQLITE_PROFILE],
+    },
+    # Copie de lecture tenue à jour par `manage.py sync_replica` (tâche
+    # périodique) ; en test, la base principale tient lieu de réplique
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        **SQLITE_PROFILES[SQLITE_PROFILE],
+        # Lue seulement : BEGIN IMMEDIATE y prendrait le verrou d'écriture pour rien
+        'OPTIONS': {
+            name: value for name, value in SQLITE_PROFILES[SQLITE_PROFILE]['OPTIONS'].items()
+            if name != 'transaction_mode'
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['distributeur.routers.ReadReplicaRouter']
+
+# Alias servant les GET/HEAD du catalogue (vide : tout sur 'default'). À
+# renseigner une fois la réplique copiée par `sync_replica`.
+DISTRIBUTEUR_READ_REPLICAS = []
+# Durée (secondes) pendant laquelle un client qui vient d'écrire lit sur 'default'
+DISTRIBUTEUR_REPLICA_PIN_SECONDS = 5
+
+# Écritures refusées par le verrou de SQLite : nombre d'essais et attente de
+# base (secondes, doublée à chaque essai, tirée au hasard sous ce plafond)
+DISTRIBUTEUR_LOCK_RETRIES = 4
+DISTRIBUTEUR_LOCK_RETRY_DELAY = 0.05
+DISTRIBUTEUR_LOCK_RETRY_MAX_DELAY = 1.0
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# L'alias 'catalog' peut pointer vers un backend partagé (Redis, Memcached)
+# en production ; locmem suffit pour le développement et les tests.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+DISTRIBUTEUR_CATALOG_CACHE_ALIAS = 'catalog'
+DISTRIBUTEUR_CATALOG_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators